@@ -0,0 +1,132 @@
+import collections
+import random
+import time
+
+from config import BASELINE_BENCH_FILE_PATH
+from constraints_evaluation import compile_constraint
+from ipc_utilities import AnnotatedMovement
+from modes_finder import select_mode
+from net_structure import build_transitions_relations
+from benchmark_utilities.nets_generator import load_from_file
+
+
+class EnabledSet:
+    """
+    Set of enabled transitions with O(1) insertion, removal and uniformly random choice
+    """
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        position = self.positions.pop(item, None)
+        if position is None:
+            return
+        last_item = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last_item
+            self.positions[last_item] = position
+
+    def choice(self):
+        return self.items[random.randrange(len(self.items))]
+
+
+class IncrementalSimulation:
+    """
+    Sequential simulation keeping the set of enabled transitions incrementally:
+    after the firing only transitions with changed input places (consuming and concurrent relations)
+    and transitions with constraints on the fired one are re-checked, next transition is chosen in O(1).
+    Marking of the net is changed in place during the simulation
+    """
+
+    def __init__(self, net, constraint_formula=None):
+        self.net = net
+        self.constraint = compile_constraint(constraint_formula) if constraint_formula else None
+
+        consuming, concurrent = build_transitions_relations(net)
+        self.affected_transitions = {name: consuming[name] | concurrent[name] for name in consuming}
+        # transitions which validity may be changed by the first firing of the transition
+        self.formula_affected_transitions = {}
+
+        self.enabled = EnabledSet()
+        self.movements = {}
+        self.fired_transitions = set()
+        self.trace = []
+
+        # Statistics info
+        self.events_count = 0
+        self.events_distribution = collections.defaultdict(int)
+        self.simulation_time = None
+
+    def _calculate_movement(self, transition):
+        mode = select_mode(transition)
+        if mode is None:
+            return None
+        if self.constraint is not None:
+            # We need to check only for occurrence of specific names in the trace
+            if not self.constraint.is_valid(self.fired_transitions, transition.name):
+                return None
+        return AnnotatedMovement(*transition.flow(mode))
+
+    def _update(self, transition_name):
+        movement = self._calculate_movement(self.net.transition(transition_name))
+        if movement is None:
+            self.movements.pop(transition_name, None)
+            self.enabled.discard(transition_name)
+        else:
+            self.movements[transition_name] = movement
+            self.enabled.add(transition_name)
+
+    def _get_formula_affected_transitions(self, transition_name):
+        if transition_name not in self.formula_affected_transitions:
+            self.formula_affected_transitions[transition_name] = set(
+                self.constraint.get_possibly_enabled_transitions(transition_name) +
+                self.constraint.get_possibly_disabled_transitions(transition_name))
+        return self.formula_affected_transitions[transition_name]
+
+    def _fire(self, transition_name):
+        movement = self.movements[transition_name]
+        for place_name, tokens in movement.start_places.items():
+            self.net.place(place_name).remove(tokens)
+        for place_name, tokens in movement.end_places.items():
+            self.net.place(place_name).add(tokens)
+        self.trace.append(transition_name)
+        self.events_count += 1
+        self.events_distribution[transition_name] += 1
+
+        affected_transitions = self.affected_transitions[transition_name]
+        if self.constraint is not None and transition_name not in self.fired_transitions:
+            self.fired_transitions.add(transition_name)
+            affected_transitions = affected_transitions | self._get_formula_affected_transitions(transition_name)
+        for affected_transition in affected_transitions:
+            self._update(affected_transition)
+
+    def run(self, timeout=None, max_events=None):
+        simulation_start = time.time()
+        for transition in self.net.transition():
+            self._update(transition.name)
+        while len(self.enabled) > 0:
+            if max_events is not None and self.events_count >= max_events:
+                break
+            if timeout is not None and time.time() - simulation_start >= timeout:
+                break
+            self._fire(self.enabled.choice())
+        self.simulation_time = time.time() - simulation_start
+        return self
+
+
+def run_baseline_simulation(timeout: int, constraint_formula: str = None):
+    net = load_from_file('nets.pnml')
+    simulation = IncrementalSimulation(net, constraint_formula).run(timeout=timeout)
+    # generally it is used for benchmarks only
+    with open(BASELINE_BENCH_FILE_PATH, 'a') as f:
+        f.write(f'{simulation.events_count / simulation.simulation_time}\n')
@@ -1,7 +1,7 @@
 import time
 
 from config import BASELINE_BENCH_FILE_PATH
-from constraints_evaluation import CheckActivationValidity, constraint_parser
+from constraints_evaluation import compile_constraint
 from ipc_utilities import AnnotatedMovement
 from benchmark_utilities.nets_generator import load_from_file
 
@@ -15,10 +15,7 @@ def run_baseline_simulation(constraint_formula: str, timeout: int):
             return None
 
         # We need to check only for occurrence of specific names in the trace, can use set for O(1) search
-        validator = CheckActivationValidity(set(trace), _transition.name)
-        tree = constraint_parser.parse(constraint_formula)
-        is_valid_to_fire = validator.transform(tree)
-        if not is_valid_to_fire:
+        if not compile_constraint(constraint_formula).is_valid(set(trace), _transition.name):
             return None
 
         return movements[0]
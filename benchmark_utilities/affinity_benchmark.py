@@ -0,0 +1,41 @@
+import random
+import sys
+
+from benchmark_utilities.nets_generator import NetsGenerator
+from benchmark_utilities.results_store import save_run
+from simulation import Simulation, get_workers_manager
+
+# Benchmark of routing of calculations to workers depending on the number of workers:
+# FIFO queue of free pipes and affinity routing of transitions clusters to home workers with work stealing
+# Runs are saved to the store as "affinity_fifo" and "affinity_routing", so they can be compared by results_store
+REPEATS_AMOUNT = 5
+SIMULATION_DURATION = 5
+NETS_AMOUNT = 16
+NET_LENGTH = 100
+TOKENS_AMOUNT = 3
+EDGE_DENSITY = 0.3
+
+
+if __name__ == "__main__":
+    workers_counts = [int(workers) for workers in sys.argv[1:]] or [8, 12, 16]
+    random.seed(0)
+    nets_generator = NetsGenerator(tokens=TOKENS_AMOUNT, length=NET_LENGTH, edge_density=EDGE_DENSITY,
+                                   nets_amount=NETS_AMOUNT)
+    nets_generator.build()
+
+    runs = {name: {"param": [], "events_per_second": [], "stolen_count": []} for name in ("fifo", "routing")}
+    for workers in workers_counts:
+        for _ in range(REPEATS_AMOUNT):
+            # routings alternate, so they are equally affected by the state of the machine
+            for name, affinity_routing in (("fifo", False), ("routing", True)):
+                pipes_pool = get_workers_manager(False, workers).pipes_queue
+                stolen_count = pipes_pool.stolen_count
+                result = Simulation(nets_generator.nets, workers=workers, timeout=SIMULATION_DURATION,
+                                    affinity_routing=affinity_routing).run()
+                runs[name]["param"].append(workers)
+                runs[name]["events_per_second"].append(result.events_per_second)
+                runs[name]["stolen_count"].append(pipes_pool.stolen_count - stolen_count)
+                print(f"{workers} workers, {name}: {result.events_per_second} events per second")
+
+    for name, columns in runs.items():
+        print(f"Results are saved to {save_run(f'affinity_{name}', columns)}")
@@ -10,16 +10,27 @@ def generate_formula(variables, length):
 
 
 def generate_subformula(k, variables):
-    """ Generating subformula """
-    if k == 1:
-        first_name = random.choice(variables)
-        second_name = random.choice(variables)
-        op = random.choice(['◁', '~◁'])
-        return f"{first_name} {op} {second_name}"
-    else:
-        left_subtree_size = random.randint(1, k - 1)
-        right_subtree_size = k - left_subtree_size
-        left = generate_subformula(left_subtree_size, variables)
-        right = generate_subformula(right_subtree_size, variables)
-        op = random.choice(['∨', '∧'])
-        return f"({left}) {op} ({right})"
+    """
+    Generating subformula without recursion, random choices are made in the same order as by recursive generation
+    (left subtree, right subtree, then operation), so formulas are the same for the same seed
+    """
+    # tasks are subtree sizes to generate and None to combine two last generated subtrees
+    tasks = [k]
+    subformulas = []
+    while tasks:
+        task = tasks.pop()
+        if task is None:
+            right = subformulas.pop()
+            left = subformulas.pop()
+            op = random.choice(['∨', '∧'])
+            subformulas.append(f"({left}) {op} ({right})")
+        elif task == 1:
+            first_name = random.choice(variables)
+            second_name = random.choice(variables)
+            op = random.choice(['◁', '~◁'])
+            subformulas.append(f"{first_name} {op} {second_name}")
+        else:
+            left_subtree_size = random.randint(1, task - 1)
+            right_subtree_size = task - left_subtree_size
+            tasks.extend([None, right_subtree_size, left_subtree_size])
+    return subformulas[0]
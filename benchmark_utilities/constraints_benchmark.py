@@ -0,0 +1,52 @@
+import random
+import sys
+import time
+
+from config import CONSTRAINTS_BENCH_FILE_PATH
+from constraints_evaluation import CheckActivationValidity, CompiledConstraint, constraint_parser
+from benchmark_utilities.constraint_generator import generate_formula
+
+# Benchmark of parsing and evaluation of constraint formulas depending on their length:
+# recursive Transformer on the Lark tree and iterative evaluation of the flattened formula with short-circuit
+TRANSITIONS_AMOUNT = 100
+EVALUATIONS_AMOUNT = 100
+
+
+def measure(length, transitions_names):
+    formula = generate_formula(transitions_names, length)
+
+    parse_start = time.perf_counter()
+    tree = constraint_parser.parse(formula)
+    parse_time = time.perf_counter() - parse_start
+
+    compile_start = time.perf_counter()
+    constraint = CompiledConstraint(formula)
+    compile_time = time.perf_counter() - compile_start
+
+    traces = [set(random.sample(transitions_names, random.randint(0, len(transitions_names))))
+              for _ in range(EVALUATIONS_AMOUNT)]
+    fired_transitions = [random.choice(transitions_names) for _ in range(EVALUATIONS_AMOUNT)]
+
+    try:
+        transform_start = time.perf_counter()
+        for trace, transition_name in zip(traces, fired_transitions):
+            CheckActivationValidity(trace, transition_name).transform(tree)
+        transform_time = (time.perf_counter() - transform_start) / EVALUATIONS_AMOUNT
+    except RecursionError:
+        transform_time = None
+
+    evaluation_start = time.perf_counter()
+    for trace, transition_name in zip(traces, fired_transitions):
+        constraint.is_valid(trace, transition_name)
+    evaluation_time = (time.perf_counter() - evaluation_start) / EVALUATIONS_AMOUNT
+    return parse_time, compile_time, transform_time, evaluation_time
+
+
+if __name__ == "__main__":
+    lengths = [int(length) for length in sys.argv[1:]] or [10, 100, 1000, 10000, 20000]
+    transitions_names = [f"t{i}" for i in range(TRANSITIONS_AMOUNT)]
+    with open(CONSTRAINTS_BENCH_FILE_PATH, 'a') as f:
+        f.write('length parse compile transform evaluation\n')
+        for length in lengths:
+            results = measure(length, transitions_names)
+            f.write(f'{length} {" ".join(str(result) for result in results)}\n')
@@ -0,0 +1,70 @@
+import sys
+import time
+
+from base_proposed_algorithm import calculate_movement_in_net
+from benchmark_utilities.results_store import save_run
+from expressions_compiler import compile_net
+from modes_finder import set_selection_policy
+
+from snakes.nets import *   # noqa
+
+# Benchmark of the worker-side calculation of movements on colored nets with heavy guards and arc expressions
+# depending on the number of tokens per place: generic evaluation of SNAKES and compiled expressions.
+# All modes are enumerated by the random selection policy, so the guard is evaluated on every binding
+# Runs are saved to the store as "guards_generic" and "guards_compiled"
+TRANSITIONS_AMOUNT = 20
+ACTIVATIONS_AMOUNT = 20
+
+
+def build_guarded_net(tokens_amount):
+    net = PetriNet('guarded')
+    net.globals.declare('import math')
+    for i in range(TRANSITIONS_AMOUNT):
+        net.add_place(Place(f'p{i}', list(range(tokens_amount))))
+    for i in range(TRANSITIONS_AMOUNT):
+        guard = Expression(f"x + y > {tokens_amount // 2} and (x * y) % 7 != 3 and math.fabs(x - y) < {i + 3}")
+        net.add_transition(Transition(f't{i}', guard))
+        net.add_input(f'p{i}', f't{i}', Variable('x'))
+        net.add_input(f'p{(i + 1) % TRANSITIONS_AMOUNT}', f't{i}', Variable('y'))
+        net.add_output(f'p{i}', f't{i}', Expression(f"(x + y) % {tokens_amount}"))
+        net.add_output(f'p{(i + 1) % TRANSITIONS_AMOUNT}', f't{i}', Expression(f"abs(x - y) % {tokens_amount}"))
+    return net
+
+
+def measure(net):
+    marking_repr = repr(net.get_marking())
+    transitions_reprs = [repr(transition.name) for transition in net.transition()]
+    activations_start = time.perf_counter()
+    for _ in range(ACTIVATIONS_AMOUNT):
+        for transition_repr in transitions_reprs:
+            calculate_movement_in_net(net, transition_repr, marking_repr)
+    return (time.perf_counter() - activations_start) / (ACTIVATIONS_AMOUNT * len(transitions_reprs))
+
+
+if __name__ == "__main__":
+    tokens_amounts = [int(tokens_amount) for tokens_amount in sys.argv[1:]] or [5, 10, 20, 40]
+    runs = {name: {"param": [], "activation_time": []} for name in ("generic", "compiled")}
+    for tokens_amount in tokens_amounts:
+        generic_net = build_guarded_net(tokens_amount)
+        compiled_net = build_guarded_net(tokens_amount)
+        compile_net(compiled_net)
+
+        # compiled expressions give the same movements
+        set_selection_policy("first")
+        for transition in generic_net.transition():
+            generic_movements, = calculate_movement_in_net(generic_net, repr(transition.name),
+                                                           repr(generic_net.get_marking()))
+            compiled_movements, = calculate_movement_in_net(compiled_net, repr(transition.name),
+                                                            repr(compiled_net.get_marking()))
+            assert [str(movement) for movement in generic_movements] == \
+                [str(movement) for movement in compiled_movements]
+
+        set_selection_policy("random")
+        for name, net in (("generic", generic_net), ("compiled", compiled_net)):
+            activation_time = measure(net)
+            runs[name]["param"].append(tokens_amount)
+            runs[name]["activation_time"].append(activation_time)
+            print(f"{tokens_amount} tokens, {name}: {activation_time * 1e6:.1f}us per activation")
+
+    for name, columns in runs.items():
+        print(f"Results are saved to {save_run(f'guards_{name}', columns)}")
@@ -0,0 +1,230 @@
+import argparse
+import json
+import random
+import statistics
+import time
+
+import numpy as np
+
+from base_proposed_algorithm import SimulationManager, calculate_movement_in_net, use_net
+from benchmark_utilities.constraint_generator import generate_formula
+from benchmark_utilities.nets_generator import NetsGenerator
+from benchmark_utilities.results_store import get_git_commit, get_machine_info, save_run
+from constraints_evaluation import CheckActivationValidity, constraint_parser
+from ipc_utilities import AnnotatedMovement, deserialize_base_movements, deserialize_workflow_movements, \
+    serialize_base_movements, serialize_workflow_movements
+from modes_finder import set_selection_policy
+from nets_cache import load_net_into_workers
+from simulation import get_workers_manager
+
+from snakes.nets import *   # noqa
+
+# Micro-benchmarks of the primitives on the hot path of simulations, measured in isolation from each other.
+# Every case is called WARMUP_AMOUNT times, then REPEATS_AMOUNT repeats are timed, a repeat calls the case
+# as many times as needed to last MIN_REPEAT_TIME at least (timer resolution does not matter then).
+# Times of one call in every repeat are saved to the store as "micro_<case>" runs (column "time")
+WARMUP_AMOUNT = 10
+REPEATS_AMOUNT = 20
+MIN_REPEAT_TIME = 0.01
+# sizes of movements (places), nets (places) and formulas (atomic constraints and operations)
+MOVEMENT_SIZES = [1, 10, 100]
+NET_SIZES = [10, 100, 1000]
+FORMULA_LENGTHS = [10, 100, 1000]
+EDGE_DENSITY = 0.3
+
+
+def measure(function, warmup=WARMUP_AMOUNT, repeats=REPEATS_AMOUNT, min_repeat_time=MIN_REPEAT_TIME):
+    """
+    Returns times of one call of the function in every repeat and the number of calls per repeat
+    """
+    for _ in range(warmup):
+        function()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_repeat_time:
+            break
+        number *= 2
+    times = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    return times, number
+
+
+def get_stats(times):
+    return {
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "min": min(times),
+        "p25": float(np.percentile(times, 25)),
+        "p75": float(np.percentile(times, 75)),
+    }
+
+
+def build_movement(size):
+    return AnnotatedMovement(Marking({f"p[{i}]": MultiSet([dot]) for i in range(size)}),
+                             Marking({f"p[{i + size}]": MultiSet([dot]) for i in range(size)}))
+
+
+def build_net(size):
+    # components of 10 places, so the number of transitions grows linearly with the size
+    nets_generator = NetsGenerator(tokens=size // 2, length=size, edge_density=EDGE_DENSITY,
+                                   nets_amount=max(size // 10, 1))
+    nets_generator.build()
+    return nets_generator.nets
+
+
+def get_enabled_transition(net):
+    for transition in net.transition():
+        if transition.modes():
+            return transition
+    return next(iter(net.transition()))
+
+
+def bench_serialize_base(size):
+    movements = [build_movement(size)]
+    return lambda: serialize_base_movements(movements)
+
+
+def bench_deserialize_base(size):
+    movements_repr, = serialize_base_movements([build_movement(size)])
+    return lambda: deserialize_base_movements(movements_repr)
+
+
+def bench_serialize_workflow(size):
+    movements = [build_movement(size)]
+    transitions_names = [f"t[{i}]" for i in range(size)]
+    return lambda: serialize_workflow_movements(movements, transitions_names, transitions_names)
+
+
+def bench_deserialize_workflow(size):
+    transitions_names = [f"t[{i}]" for i in range(size)]
+    message = serialize_workflow_movements([build_movement(size)], transitions_names, transitions_names)
+    return lambda: deserialize_workflow_movements(*message)
+
+
+def bench_marking_eval(size):
+    marking_repr = repr(build_net(size).get_marking())
+    return lambda: eval(marking_repr)
+
+
+def bench_set_marking(size):
+    net = build_net(size)
+    marking = net.get_marking()
+    return lambda: net.set_marking(marking)
+
+
+def bench_modes(size):
+    transition = get_enabled_transition(build_net(size))
+    return lambda: transition.modes()
+
+
+def bench_flow(size):
+    transition = get_enabled_transition(build_net(size))
+    mode = (transition.modes() or [Substitution()])[0]
+    return lambda: transition.flow(mode)
+
+
+def bench_calculate_movement(size):
+    net = build_net(size)
+    transition_repr, marking_repr = repr(get_enabled_transition(net).name), repr(net.get_marking())
+    return lambda: calculate_movement_in_net(net, transition_repr, marking_repr)
+
+
+def bench_parse(length):
+    formula = generate_formula([f"t{i}" for i in range(100)], length)
+    return lambda: constraint_parser.parse(formula)
+
+
+def bench_transform(length):
+    transitions_names = [f"t{i}" for i in range(100)]
+    tree = constraint_parser.parse(generate_formula(transitions_names, length))
+    trace = set(random.sample(transitions_names, 50))
+    return lambda: CheckActivationValidity(trace, random.choice(transitions_names)).transform(tree)
+
+
+def bench_perform_movement(size):
+    simulation_manager = SimulationManager(None, build_net(size * 2))
+    movement = build_movement(size)
+    simulation_manager.current_marking = movement.start_places
+    reverse_movement = AnnotatedMovement(movement.end_places, movement.start_places)
+
+    def perform_movements():
+        # the movement and the reverse one keep the marking the same for every call
+        simulation_manager.perform_movement("t", movement)
+        simulation_manager.perform_movement("t", reverse_movement)
+    return perform_movements
+
+
+def bench_process_task(size):
+    net = build_net(size)
+    workers_manager = get_workers_manager(False, 1)
+    load_net_into_workers(workers_manager, use_net, net)
+    transition_repr, marking_repr = repr(get_enabled_transition(net).name), repr(net.get_marking())
+    return lambda: workers_manager.process_task(transition_repr, marking_repr)
+
+
+# name: (builder of the case by the sweep point, sweep points)
+CASES = {
+    "serialize_base": (bench_serialize_base, MOVEMENT_SIZES),
+    "deserialize_base": (bench_deserialize_base, MOVEMENT_SIZES),
+    "serialize_workflow": (bench_serialize_workflow, MOVEMENT_SIZES),
+    "deserialize_workflow": (bench_deserialize_workflow, MOVEMENT_SIZES),
+    "marking_eval": (bench_marking_eval, NET_SIZES),
+    "set_marking": (bench_set_marking, NET_SIZES),
+    "modes": (bench_modes, NET_SIZES),
+    "flow": (bench_flow, NET_SIZES),
+    "calculate_movement": (bench_calculate_movement, NET_SIZES),
+    "parse": (bench_parse, FORMULA_LENGTHS),
+    "transform": (bench_transform, FORMULA_LENGTHS),
+    "perform_movement": (bench_perform_movement, MOVEMENT_SIZES),
+    "process_task": (bench_process_task, NET_SIZES),
+}
+
+
+def run_cases(names, warmup=WARMUP_AMOUNT, repeats=REPEATS_AMOUNT, is_saving=True):
+    """
+    Runs cases by names, returns results of all sweep points with statistics of the time of one call in seconds
+    """
+    random.seed(0)
+    set_selection_policy("first")
+    results = []
+    for name in names:
+        build_case, params = CASES[name]
+        columns = {"param": [], "time": []}
+        for param in params:
+            times, number = measure(build_case(param), warmup, repeats)
+            columns["param"].extend([param] * len(times))
+            columns["time"].extend(times)
+            stats = get_stats(times)
+            results.append({"case": name, "param": param, "number": number, "repeats": repeats, **stats})
+            print(f"{name} {param}: {stats['median'] * 1e6:.2f}us median, {stats['stdev'] * 1e6:.2f}us stdev")
+        if is_saving:
+            save_run(f"micro_{name}", columns)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of hot path primitives")
+    parser.add_argument("cases", nargs="*", help=f"cases to run (all by default): {', '.join(CASES)}")
+    parser.add_argument("--warmup", type=int, default=WARMUP_AMOUNT)
+    parser.add_argument("--repeats", type=int, default=REPEATS_AMOUNT)
+    parser.add_argument("--output", help="JSON file for results of all cases")
+    parser.add_argument("--no-save", action="store_true", help="do not save runs to the results store")
+    args = parser.parse_args()
+    unknown_cases = set(args.cases) - set(CASES)
+    if unknown_cases:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown_cases))}")
+
+    micro_results = run_cases(args.cases or list(CASES), args.warmup, args.repeats, not args.no_save)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"commit": get_git_commit(), "machine": get_machine_info(), "results": micro_results}, f,
+                      indent=1)
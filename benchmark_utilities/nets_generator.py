@@ -7,6 +7,7 @@ import networkx as nx
 import snakes.nets as snakes
 
 from config import IS_DEBUG
+from pnml_loader import load_pnml
 
 
 class NetsGenerator:
@@ -104,9 +105,7 @@ def save_to_file(net, filename):
 
 
 def load_from_file(filename):
-    with open(filename, 'r') as f:
-        pnml_string = f.read()
-    return snakes.loads(pnml_string)
+    return load_pnml(filename)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+
+import numpy as np
+
+import config
+from config import RESULTS_STORE_PATH, REGRESSION_THRESHOLD
+
+# Store of benchmark results: one JSON file per run with columns of equal length
+# (sweep point and measured values), tagged with git commit, config constants and machine info
+
+
+def get_git_commit():
+    try:
+        # commit of the simulation sources, benchmarks are usually run from another directory
+        sources_path = os.path.dirname(os.path.abspath(config.__file__))
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=sources_path, stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_machine_info():
+    return {
+        "node": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def get_config():
+    return {name: getattr(config, name) for name in dir(config) if name.isupper()}
+
+
+def parse_text_results(lines, columns_names=("events_per_second",)):
+    """
+    Parses results in the text format of benchmarks ("----- <sweep point>" followed by lines of values
+    separated by ", ") into columns
+    """
+    columns = {"param": []}
+    columns.update({name: [] for name in columns_names})
+    current_param = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith('-----'):
+            current_param = int(line.split()[-1])
+        elif line and current_param is not None:
+            values = line.split(', ')
+            if len(values) != len(columns_names):
+                # other logged lines (statistics, warnings) are not results
+                continue
+            try:
+                values = [float(value) for value in values]
+            except ValueError:
+                continue
+            columns["param"].append(current_param)
+            for name, value in zip(columns_names, values):
+                columns[name].append(value)
+    return columns
+
+
+def save_run(name, columns, store_path=RESULTS_STORE_PATH):
+    """
+    Saves columns of the run with metadata, returns filename of the run
+    """
+    created = datetime.datetime.now()
+    commit = get_git_commit()
+    run = {
+        "name": name,
+        "created": created.isoformat(),
+        "commit": commit,
+        "config": get_config(),
+        "machine": get_machine_info(),
+        "columns": columns,
+    }
+    os.makedirs(store_path, exist_ok=True)
+    run_id = f"{created.strftime('%Y%m%d_%H%M%S%f')}_{(commit or 'unknown')[:8]}"
+    filename = os.path.join(store_path, f"{name}_{run_id}.json")
+    with open(filename, 'w') as f:
+        json.dump(run, f)
+    return filename
+
+
+def load_run(run, store_path=RESULTS_STORE_PATH):
+    """
+    Loads the run by filename or the latest run by name
+    """
+    if not os.path.exists(run):
+        runs = find_runs(run, store_path)
+        if not runs:
+            raise FileNotFoundError(f"No runs {run} in {store_path}")
+        run = runs[-1]
+    with open(run, 'r') as f:
+        return json.load(f)
+
+
+def find_runs(name, store_path=RESULTS_STORE_PATH):
+    # timestamp in filenames keeps runs of the same name ordered by creation
+    run_pattern = re.compile(rf"{re.escape(name)}_\d{{8}}_\d{{12}}_\w+\.json")
+    return sorted(os.path.join(store_path, filename) for filename in os.listdir(store_path)
+                  if run_pattern.fullmatch(filename)) if os.path.isdir(store_path) else []
+
+
+def group_by_param(run, column):
+    grouped = {}
+    for param, value in zip(run["columns"]["param"], run["columns"][column]):
+        grouped.setdefault(param, []).append(value)
+    return grouped
+
+
+def prepare_stats(grouped):
+    params = sorted(grouped.keys())
+    means = [np.mean(grouped[param]) for param in params]
+    p25 = [np.percentile(grouped[param], 25) for param in params]
+    p75 = [np.percentile(grouped[param], 75) for param in params]
+    return params, means, p25, p75
+
+
+def compare_runs(baseline, current, column="events_per_second", threshold=REGRESSION_THRESHOLD):
+    """
+    Compares mean and percentiles of the column per sweep point, returns rows of comparison
+    and sweep points, where the mean dropped more than the threshold (relative)
+    """
+    baseline_grouped = group_by_param(baseline, column)
+    current_grouped = group_by_param(current, column)
+    rows = []
+    regressions = []
+    for param in sorted(set(baseline_grouped) & set(current_grouped)):
+        row = {"param": param}
+        for stat, function in (("mean", np.mean), ("p50", np.median),
+                               ("p25", lambda values: np.percentile(values, 25)),
+                               ("p75", lambda values: np.percentile(values, 75))):
+            baseline_value = float(function(baseline_grouped[param]))
+            current_value = float(function(current_grouped[param]))
+            row[stat] = (baseline_value, current_value,
+                         (current_value - baseline_value) / baseline_value if baseline_value else None)
+        rows.append(row)
+        delta = row["mean"][2]
+        if delta is not None and delta < -threshold:
+            regressions.append(param)
+    return rows, regressions
+
+
+def print_comparison(rows, regressions):
+    print(f"{'param':>8} {'stat':>5} {'baseline':>14} {'current':>14} {'delta':>9}")
+    for row in rows:
+        for stat in ("mean", "p25", "p50", "p75"):
+            baseline_value, current_value, delta = row[stat]
+            delta_str = f"{delta:+.2%}" if delta is not None else "-"
+            print(f"{row['param']:>8} {stat:>5} {baseline_value:>14.3f} {current_value:>14.3f} {delta_str:>9}")
+    if regressions:
+        print(f"Throughput regression at {', '.join(str(param) for param in regressions)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark results store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = subparsers.add_parser("compare", help="compare run with the baseline run, "
+                                                           "fails on throughput regression")
+    compare_parser.add_argument("baseline", help="filename of the run or name of the run (the latest is used)")
+    compare_parser.add_argument("current", help="filename of the run or name of the run (the latest is used)")
+    compare_parser.add_argument("--column", default="events_per_second")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                                help="allowed relative drop of the mean")
+
+    import_parser = subparsers.add_parser("import", help="import results in the text format into the store")
+    import_parser.add_argument("name")
+    import_parser.add_argument("filename")
+    import_parser.add_argument("columns", nargs="*", default=["events_per_second"])
+
+    list_parser = subparsers.add_parser("list", help="list runs")
+    list_parser.add_argument("name", nargs="?", default="")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        comparison_rows, regression_params = compare_runs(load_run(args.baseline), load_run(args.current),
+                                                          args.column, args.threshold)
+        print_comparison(comparison_rows, regression_params)
+        sys.exit(1 if regression_params else 0)
+    elif args.command == "import":
+        with open(args.filename, 'r') as f:
+            print(save_run(args.name, parse_text_results(f, args.columns)))
+    else:
+        for run_filename in sorted(glob.glob(os.path.join(RESULTS_STORE_PATH, f"{args.name}*.json"))):
+            print(run_filename)
@@ -1,6 +1,19 @@
+import os
 import subprocess
 
 from config import BASELINE_BENCH_FILE_PATH, PROPOSED_BENCH_FILE_PATH
+from benchmark_utilities.results_store import parse_text_results, save_run
+
+
+def read_appended_lines(filename, offset):
+    with open(filename, 'r') as f:
+        f.seek(offset)
+        return f.readlines()
+
+
+# results are appended to the text files, only the part written by this benchmark is saved to the store
+offsets = {filename: os.path.getsize(filename) if os.path.exists(filename) else 0
+           for filename in (BASELINE_BENCH_FILE_PATH, PROPOSED_BENCH_FILE_PATH)}
 
 for i in range(1, 41, 1):
     with open(BASELINE_BENCH_FILE_PATH, 'a') as f:
@@ -18,3 +31,9 @@ for i in range(1, 41, 1):
         except subprocess.TimeoutExpired:
             print("Main process did not terminate gracefully, forcing exit")
             main_process.kill()
+
+for name, filename in (("workflow_proposed", PROPOSED_BENCH_FILE_PATH),
+                       ("workflow_baseline", BASELINE_BENCH_FILE_PATH)):
+    columns = parse_text_results(read_appended_lines(filename, offsets[filename]))
+    if columns["param"]:
+        print(f"Results are saved to {save_run(name, columns)}")
@@ -1,8 +1,56 @@
 BASELINE_BENCH_FILE_PATH = "benchs/data/experiment_baseline.txt"
 PROPOSED_BENCH_FILE_PATH = "benchs/data/experiment_proposed.txt"
 IS_DEBUG = False
+IS_TRACING = False
+TRACE_FILE_PATH = "benchs/data/trace.json"
+CONSTRAINTS_BENCH_FILE_PATH = "benchs/data/experiment_constraints.txt"
+RESULTS_STORE_PATH = "benchs/store"
+# allowed relative drop of mean throughput per sweep point, when comparing with the baseline run
+REGRESSION_THRESHOLD = 0.1
 IS_BENCHMARKING = True
 IS_COMPARING_WITH_BASELINE_ALGORITHM = False
+# incremental enabled-set sequential algorithm is used for comparison instead of the classic one
+IS_INCREMENTAL_BASELINE = False
 SIMULATION_TIMEOUT = 1.2
+CHECKPOINT_INTERVAL = 60
+# interval of live samples (seconds), samples are streamed only if the output is given to the simulation
+SAMPLER_INTERVAL = 1
+# constraints of workflow nets are checked incrementally on the coordinator instead of workers (see constraint_monitor)
+IS_CONSTRAINT_MONITOR = False
+# idle workers calculate movements of consumers of transitions in flight ahead of time (base algorithm only)
+IS_SPECULATIVE = False
+# guards and arc expressions of colored nets are compiled to closures once per net in every worker
+IS_COMPILING_EXPRESSIONS = True
+# PNML is parsed incrementally by pnml_loader, the whole DOM of large nets is not kept in memory
+IS_STREAMING_PNML = True
 WORKERS_NUM = 10
-
+# nets cached by content hash in every worker and in the daemon (LRU)
+WORKER_NETS_CACHE_SIZE = 8
+DAEMON_NETS_CACHE_SIZE = 32
+# the socket is created in the private directory (0700), as clients of the daemon are trusted
+DAEMON_SOCKET_PATH = "/tmp/petri_nets_simulation/daemon.sock"
+# relations of transitions are built in parallel chunks on workers for nets with at least this many transitions
+PARALLEL_BUILD_MIN_TRANSITIONS = 100000
+# selection of the binding for colored nets: "first" or "random" (see modes_finder)
+MODE_SELECTION_POLICY = "first"
+# calculations of transitions are routed to home workers of their clusters (see affinity), a request is stolen
+# by another worker, when at least this many requests are waiting for the home worker
+IS_AFFINITY_ROUTING = False
+AFFINITY_STEAL_THRESHOLD = 2
+AFFINITY_VIRTUAL_NODES = 64
+# reachability exploration: markings expanded by every worker per round, frontier markings kept in memory per worker
+# before spilling to disk (if spill directory is given) and deadlock markings kept as examples
+EXPLORATION_BATCH_SIZE = 200
+EXPLORATION_SPILL_THRESHOLD = 100000
+REPORTED_DEADLOCKS_COUNT = 10
+# conformance checking: cases of the event log replayed by a worker per request
+CONFORMANCE_BATCH_SIZE = 50
+# multi-case workflow simulation: cases calculated for one transition by a worker per request
+MULTICASE_BATCH_SIZE = 100
+# ordinary nets are reduced by liveness and boundedness preserving rules before simulation (see net_reduction),
+# fired macro transitions are expanded back in the trace and statistics
+IS_REDUCING_NET = False
+# dead transitions (never enabled by structure) and never marked places are pruned before simulation
+# (see structural_analysis), minimal unmarked siphons are searched in connected parts up to this size
+IS_PRUNING_DEAD_TRANSITIONS = True
+MINIMAL_SIPHONS_MAX_PLACES = 100
@@ -0,0 +1,253 @@
+import argparse
+import collections
+import csv
+import json
+import time
+import xml.etree.ElementTree as ElementTree
+
+import gevent.pool
+
+import base_proposed_algorithm
+from base_proposed_algorithm import use_net, calculate_movement
+from benchmark_utilities.nets_generator import load_from_file
+from config import WORKERS_NUM, CONFORMANCE_BATCH_SIZE
+from constraints_evaluation import compile_constraint
+from ipc_utilities import WorkersManager, WorkerCommand, serialize_base_movements, deserialize_base_movements
+from logging_manager import logger
+from modes_finder import select_mode
+from nets_cache import load_net_into_workers
+
+from snakes.nets import *   # noqa
+
+# Recorded cases of the event log are replayed on the net in batches on workers (token-based replay):
+# every event fires its transition in the mode selected as in simulation and is checked by the constraint formula.
+# When the transition is not enabled, missing tokens are created (ordinary arcs only) and the transition is fired,
+# so the rest of the case is still replayed. Fitness of the case is 1/2 (1 - missing / consumed) +
+# 1/2 (1 - remaining / produced), remaining tokens are counted only if the final marking is given
+
+XES_NAME_KEY = "concept:name"
+XES_LIFECYCLE_KEY = "lifecycle:transition"
+
+
+def _get_local_tag(element):
+    # XES files usually declare the default namespace
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _get_xes_attribute(element, key):
+    for child in element:
+        if _get_local_tag(child) == "string" and child.get("key") == key:
+            return child.get("value")
+    return None
+
+
+def iter_xes_cases(filename):
+    """
+    Yields (case id, activities) of traces of the XES log, traces are parsed one by one and dropped after,
+    only completed events (or events without lifecycle) are activities
+    """
+    for _, element in ElementTree.iterparse(filename):
+        if _get_local_tag(element) != "trace":
+            continue
+        activities = [_get_xes_attribute(event, XES_NAME_KEY) for event in element
+                      if _get_local_tag(event) == "event"
+                      and _get_xes_attribute(event, XES_LIFECYCLE_KEY) in (None, "complete")]
+        yield _get_xes_attribute(element, XES_NAME_KEY), activities
+        element.clear()
+
+
+def iter_csv_cases(filename, case_column="case:concept:name", activity_column="concept:name"):
+    """
+    Yields (case id, activities) of the CSV log in the order of first events of cases, events of different cases
+    may be interleaved (logs are usually sorted by time), so only names of activities are kept until the end
+    """
+    cases = {}
+    with open(filename, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            cases.setdefault(row[case_column], []).append(row[activity_column])
+    yield from cases.items()
+
+
+def iter_cases(filename, case_column="case:concept:name", activity_column="concept:name"):
+    if filename.lower().endswith(".xes"):
+        return iter_xes_cases(filename)
+    return iter_csv_cases(filename, case_column, activity_column)
+
+
+def _force_enabling(transition):
+    # creates missing tokens for arcs without variables, returns their number, or None, if the mode is not known
+    missing_tokens = {}
+    for place, label in transition.input():
+        if label.vars():
+            return None
+        required_tokens = label.flow(Substitution())
+        for token in set(required_tokens):
+            missing_count = required_tokens(token) - place.tokens(token)
+            if missing_count > 0:
+                missing_tokens.setdefault(place, []).extend([token] * missing_count)
+    for place, tokens in missing_tokens.items():
+        place.add(tokens)
+    return sum(len(tokens) for tokens in missing_tokens.values())
+
+
+def _count_tokens(marking):
+    return sum(len(tokens) for tokens in marking.values())
+
+
+def replay_case(net_, case_id, activities, initial_marking, constraint, final_marking):
+    """
+    Replays the case on the net, returns the dict of fitness, tokens counts and violations
+    (position of the event, activity and kind: "unknown_activity", "constraint" or "not_enabled")
+    """
+    net_.set_marking(initial_marking)
+    produced = _count_tokens(initial_marking)
+    consumed = missing = 0
+    trace = set()
+    violations = []
+    for position, activity in enumerate(activities):
+        if not net_.has_transition(activity):
+            violations.append((position, activity, "unknown_activity"))
+            continue
+        transition = net_.transition(activity)
+        if constraint is not None and not constraint.is_valid(trace, activity):
+            violations.append((position, activity, "constraint"))
+        trace.add(activity)
+        mode = select_mode(transition)
+        if mode is None:
+            violations.append((position, activity, "not_enabled"))
+            missing_count = _force_enabling(transition)
+            if missing_count is None:
+                # colored arcs: the transition is skipped, every input arc misses a token
+                missing += len(transition.input())
+                continue
+            missing += missing_count
+            mode = Substitution()
+        start_places, end_places = transition.flow(mode)
+        for place, tokens in start_places.items():
+            net_.place(place).remove(tokens)
+        for place, tokens in end_places.items():
+            net_.place(place).add(tokens)
+        consumed += _count_tokens(start_places)
+        produced += _count_tokens(end_places)
+
+    remaining = 0
+    if final_marking is not None:
+        # tokens of the final marking are consumed by the environment
+        for place in net_.place():
+            expected_tokens = final_marking(place.name)
+            for token in set(place.tokens) | set(expected_tokens):
+                difference = place.tokens(token) - expected_tokens(token)
+                remaining += max(difference, 0)
+                missing += max(-difference, 0)
+        consumed += _count_tokens(final_marking)
+    fitness = 0.5 * (1 - missing / consumed if consumed else 1) + 0.5 * (1 - remaining / produced if produced else 1)
+    return {"case": case_id, "events": len(activities), "fitness": fitness, "missing": missing, "consumed": consumed,
+            "remaining": remaining, "produced": produced, "violations": violations}
+
+
+def replay_cases(cases, initial_marking_repr, constraint_formula, final_marking_repr):
+    """
+    Replays the batch of cases on the current net of the worker (see base_proposed_algorithm.use_net)
+    """
+    initial_marking = eval(initial_marking_repr)
+    final_marking = eval(final_marking_repr) if final_marking_repr is not None else None
+    constraint = compile_constraint(constraint_formula) if constraint_formula else None
+    return [replay_case(base_proposed_algorithm.net, case_id, activities, initial_marking, constraint, final_marking)
+            for case_id, activities in cases]
+
+
+class ConformanceSummary:
+    """
+    Aggregated results of cases: fitting cases have fitness 1 and no violations
+    """
+
+    def __init__(self):
+        self.cases_count = 0
+        self.events_count = 0
+        self.fitting_cases_count = 0
+        self.fitness_sum = 0
+        self.violations_counts = collections.Counter()
+        self.checking_time = None
+
+    def add(self, case_result):
+        self.cases_count += 1
+        self.events_count += case_result["events"]
+        self.fitness_sum += case_result["fitness"]
+        if case_result["fitness"] == 1 and not case_result["violations"]:
+            self.fitting_cases_count += 1
+        self.violations_counts.update(kind for _, _, kind in case_result["violations"])
+
+    @property
+    def mean_fitness(self):
+        return self.fitness_sum / self.cases_count if self.cases_count else None
+
+    def __str__(self):
+        return (f"{self.cases_count} cases ({self.events_count} events) in {self.checking_time}s, "
+                f"{self.fitting_cases_count} fitting, mean fitness {self.mean_fitness}, "
+                f"violations: {dict(self.violations_counts)}")
+
+
+def check_conformance(workers_manager, net, cases, constraint_formula=None, final_marking=None, output=None,
+                      batch_size=CONFORMANCE_BATCH_SIZE):
+    """
+    Replays cases (iterable of (case id, activities), e.g. iter_cases) on workers of the base algorithm,
+    batches are sent to free workers while the log is read, results of cases are written to the output
+    as JSON lines (in the order of completion of batches), returns the summary
+    """
+    load_net_into_workers(workers_manager, use_net, net)
+    initial_marking_repr = repr(net.get_marking())
+    final_marking_repr = repr(final_marking) if final_marking is not None else None
+    summary = ConformanceSummary()
+    checking_start = time.time()
+
+    def replay_batch(batch):
+        for case_result in workers_manager.execute(WorkerCommand(replay_cases, batch, initial_marking_repr,
+                                                                 constraint_formula, final_marking_repr)):
+            summary.add(case_result)
+            if output is not None:
+                output.write(json.dumps(case_result) + '\n')
+
+    # spawning waits for a free slot, so the log is read only as fast as workers replay it
+    batches_pool = gevent.pool.Pool(len(workers_manager.procs_with_pipes))
+    batch = []
+    for case in cases:
+        batch.append(case)
+        if len(batch) == batch_size:
+            batches_pool.spawn(replay_batch, batch)
+            batch = []
+    if batch:
+        batches_pool.spawn(replay_batch, batch)
+    batches_pool.join(raise_error=True)
+    summary.checking_time = time.time() - checking_start
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conformance checking of the event log against the net")
+    parser.add_argument("log", help="XES or CSV event log")
+    parser.add_argument("--net", default="nets.pnml")
+    parser.add_argument("--formula", default=None, help="constraint formula of the workflow net")
+    parser.add_argument("--final-place", default=None, help="place with one token in the final marking")
+    parser.add_argument("--case-column", default="case:concept:name")
+    parser.add_argument("--activity-column", default="concept:name")
+    parser.add_argument("--output", default=None, help="JSON lines file for results of cases")
+    parser.add_argument("--batch-size", type=int, default=CONFORMANCE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS_NUM)
+    args = parser.parse_args()
+
+    checked_net = load_from_file(args.net)
+    expected_marking = Marking({args.final_place: MultiSet([dot])}) if args.final_place is not None else None
+    workers_manager = WorkersManager(calculate_movement_fun=calculate_movement,
+                                     serialization_fun=serialize_base_movements,
+                                     deserialization_fun=deserialize_base_movements)
+    workers_manager.create_pool(args.workers)
+    output_file = open(args.output, 'w') if args.output is not None else None
+    try:
+        conformance_summary = check_conformance(workers_manager, checked_net,
+                                                iter_cases(args.log, args.case_column, args.activity_column),
+                                                args.formula, expected_marking, output_file, args.batch_size)
+        logger.info(conformance_summary)
+    finally:
+        workers_manager.destroy_pool()
+        if output_file is not None:
+            output_file.close()
@@ -0,0 +1,173 @@
+from constraints_evaluation import compile_constraint, AND_OPERATION, PRECEDES, NOT_PRECEDES
+
+AND_NODE = 0
+OR_NODE = 1
+
+
+class ConstraintMonitor:
+    """
+    Coordinator-side evaluation of the constraint formula for all transitions at once.
+    Atom "a ◁ x" (or "a ~◁ x") restricts only the firing of x, for other transitions it is true,
+    so for every transition the formula is reduced to the tree of its own atoms (other atoms are dropped,
+    "∨" with a dropped atom is always true). Each atom depends on the single "has fired" flag,
+    inner nodes keep counters of true children, so the first firing of the transition updates only
+    the atoms on it and their ancestors, and the check of the transition is an O(1) lookup
+    """
+
+    def __init__(self, constraint_formula, transitions_names):
+        self.transitions_indices = {name: index for index, name in enumerate(transitions_names)}
+        # "has fired" flags by transition indices, byte per transition for O(1) access
+        self.fired = bytearray(len(self.transitions_indices))
+
+        # inner nodes of reduced trees, stored by columns
+        self.nodes_kinds = []
+        self.nodes_parents = []
+        self.nodes_children_count = []
+        self.nodes_true_count = []
+        # transition, which reduced tree the root node belongs to
+        self.roots_transitions = {}
+
+        # atoms are leaves of reduced trees: parent node and whether the atom is negated (~◁)
+        self.atoms_parents = []
+        self.atoms_negations = []
+        self.atoms_by_preceding = {}
+        # transitions, which formula is the single atom
+        self.atoms_transitions = {}
+
+        # transitions without atoms of their own are always allowed
+        self.forbidden = set()
+        self._compile(compile_constraint(constraint_formula).root)
+
+    def _reduce(self, root):
+        """
+        Builds reduced trees for all transitions in one bottom-up pass (without recursion, formulas may be deep),
+        reduced tree of the subtree is kept only for transitions having atoms in the subtree, it is true for others
+        """
+        if root is None:
+            return {}
+        reduced = {}
+        stack = [(root, False)]
+        while stack:
+            node, is_visited = stack.pop()
+            if node[0] in (PRECEDES, NOT_PRECEDES):
+                kind, preceding, succeeding = node
+                reduced[id(node)] = {succeeding: ('atom', preceding, kind == NOT_PRECEDES)}
+            elif not is_visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node[1])
+            else:
+                operation, children = node
+                children = [reduced.pop(id(child)) for child in children]
+                kind = AND_NODE if operation == AND_OPERATION else OR_NODE
+                names = set().union(*children)
+                if kind == OR_NODE:
+                    # the other operands are true for the transition without atoms in them
+                    names = names.intersection(*children)
+                node_reduced = {}
+                for name in names:
+                    operands = []
+                    for child in children:
+                        if name in child:
+                            operand = child[name]
+                            # nested nodes of the same operation (after the reduction) are flattened
+                            operands.extend(operand[1] if operand[0] == kind else [operand])
+                    node_reduced[name] = operands[0] if len(operands) == 1 else (kind, operands)
+                reduced[id(node)] = node_reduced
+        return reduced[id(root)]
+
+    def _compile(self, root):
+        for transition_name, reduced_tree in self._reduce(root).items():
+            if transition_name not in self.transitions_indices:
+                # constraint on the transition absent in the net
+                continue
+            stack = [(reduced_tree, None)]
+            while stack:
+                node, parent = stack.pop()
+                if parent is not None:
+                    self.nodes_children_count[parent] += 1
+                if node[0] == 'atom':
+                    _, preceding, is_negated = node
+                    self.atoms_by_preceding.setdefault(preceding, []).append(len(self.atoms_parents))
+                    self.atoms_parents.append(parent)
+                    self.atoms_negations.append(is_negated)
+                    if parent is None:
+                        # formula for the transition is the single atom
+                        self.atoms_transitions[len(self.atoms_parents) - 1] = transition_name
+                        if not is_negated:
+                            self.forbidden.add(transition_name)
+                    elif is_negated:
+                        self.nodes_true_count[parent] += 1
+                    continue
+                node_index = len(self.nodes_kinds)
+                self.nodes_kinds.append(node[0])
+                self.nodes_parents.append(parent)
+                self.nodes_children_count.append(0)
+                self.nodes_true_count.append(0)
+                if parent is None:
+                    self.roots_transitions[node_index] = transition_name
+                stack.extend((child, node_index) for child in node[1])
+
+        # nodes are numbered before their children, so values are propagated from the last node to the first one
+        for node_index in range(len(self.nodes_kinds) - 1, -1, -1):
+            if self._node_value(node_index):
+                parent = self.nodes_parents[node_index]
+                if parent is None:
+                    continue
+                self.nodes_true_count[parent] += 1
+            elif self.nodes_parents[node_index] is None:
+                self.forbidden.add(self.roots_transitions[node_index])
+
+    def _node_value(self, node_index):
+        if self.nodes_kinds[node_index] == AND_NODE:
+            return self.nodes_true_count[node_index] == self.nodes_children_count[node_index]
+        return self.nodes_true_count[node_index] > 0
+
+    def is_allowed(self, transition_name):
+        return transition_name not in self.forbidden
+
+    def is_fired(self, transition_name):
+        index = self.transitions_indices.get(transition_name)
+        return index is not None and bool(self.fired[index])
+
+    def fire(self, transition_name):
+        """
+        Updates the atoms on the fired transition, returns transitions which became allowed and forbidden
+        """
+        if self.is_fired(transition_name) or transition_name not in self.transitions_indices:
+            return [], []
+        self.fired[self.transitions_indices[transition_name]] = 1
+
+        # transitions, which roots changed, with their previous values
+        changed = {}
+        for atom_index in self.atoms_by_preceding.get(transition_name, ()):
+            # value of the atom flips: "◁" becomes true, "~◁" becomes false
+            is_true = not self.atoms_negations[atom_index]
+            node_index = self.atoms_parents[atom_index]
+            if node_index is None:
+                self._set_allowed(self.atoms_transitions[atom_index], is_true, changed)
+                continue
+            while node_index is not None:
+                old_value = self._node_value(node_index)
+                self.nodes_true_count[node_index] += 1 if is_true else -1
+                is_true = self._node_value(node_index)
+                if is_true == old_value:
+                    break
+                if self.nodes_parents[node_index] is None:
+                    self._set_allowed(self.roots_transitions[node_index], is_true, changed)
+                node_index = self.nodes_parents[node_index]
+
+        # root of the transition may change twice by different atoms, so only the result is reported
+        newly_allowed = [name for name, was_allowed in changed.items() if not was_allowed and self.is_allowed(name)]
+        newly_forbidden = [name for name, was_allowed in changed.items() if was_allowed and not self.is_allowed(name)]
+        return newly_allowed, newly_forbidden
+
+    def _set_allowed(self, transition_name, is_allowed, changed):
+        changed.setdefault(transition_name, self.is_allowed(transition_name))
+        if is_allowed:
+            self.forbidden.discard(transition_name)
+        else:
+            self.forbidden.add(transition_name)
+
+    def restore(self, trace):
+        for transition_name in trace:
+            self.fire(transition_name)
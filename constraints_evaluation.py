@@ -1,4 +1,6 @@
-from lark import Transformer, v_args, Lark
+import functools
+
+from lark import Token, Transformer, v_args, Lark
 
 constraint_grammar = """
     ?start: logic_formula?
@@ -50,3 +52,121 @@ class CheckActivationValidity(Transformer):
 
 
 constraint_parser = Lark(constraint_grammar, parser='lalr')
+
+AND_OPERATION = 0
+OR_OPERATION = 1
+PRECEDES = 2
+NOT_PRECEDES = 3
+
+# amount of compiled formulas kept by every process, simulations usually use one formula at a time
+COMPILED_CONSTRAINTS_CACHE_SIZE = 8
+
+
+def flatten_constraint_tree(tree):
+    """
+    Converts the parse tree into n-ary form without recursion: nested "∧" (and "∨") are merged into one node.
+    Nodes are tuples (AND_OPERATION or OR_OPERATION, children) and (PRECEDES or NOT_PRECEDES, preceding, succeeding),
+    empty formula is None
+    """
+    if tree.data == 'start':
+        # start rule is inlined into the formula, unless the formula is empty
+        return None
+    flattened = {}
+    stack = [(tree, False)]
+    while stack:
+        node, is_visited = stack.pop()
+        if node.data in ('precedes', 'not_precedes'):
+            preceding, succeeding = (str(name) for name in node.children)
+            flattened[id(node)] = (PRECEDES if node.data == 'precedes' else NOT_PRECEDES, preceding, succeeding)
+        elif not is_visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children)
+        else:
+            operation = AND_OPERATION if node.data == 'and_' else OR_OPERATION
+            children = []
+            for child in node.children:
+                child_node = flattened.pop(id(child))
+                children.extend(child_node[1] if child_node[0] == operation else [child_node])
+            flattened[id(node)] = (operation, children)
+    return flattened[id(tree)]
+
+
+class CompiledConstraint:
+    """
+    Constraint formula parsed once and flattened, evaluated iteratively with short-circuit.
+    Transitions, which may become enabled or disabled by the firing of the transition, are indexed at compile time
+    """
+
+    def __init__(self, constraint_formula):
+        self.root = flatten_constraint_tree(constraint_parser.parse(constraint_formula))
+        # only atoms "a ◁ x" and "a ~◁ x" can be false for x, formula is true for other transitions
+        self.constrained_transitions = set()
+        self.possibly_enabled_transitions = {}
+        self.possibly_disabled_transitions = {}
+
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node[0] in (AND_OPERATION, OR_OPERATION):
+                stack.extend(node[1])
+                continue
+            kind, preceding, succeeding = node
+            self.constrained_transitions.add(succeeding)
+            index = self.possibly_enabled_transitions if kind == PRECEDES else self.possibly_disabled_transitions
+            index.setdefault(preceding, [])
+            if succeeding not in index[preceding]:
+                index[preceding].append(succeeding)
+
+    def is_valid(self, trace_to_check, transition_to_fire):
+        if transition_to_fire not in self.constrained_transitions:
+            return True
+        value = True
+        # frames are [node, index of the next child]
+        stack = [[self.root, 0]]
+        while stack:
+            frame = stack[-1]
+            node, child_index = frame
+            if node[0] == PRECEDES or node[0] == NOT_PRECEDES:
+                _, preceding, succeeding = node
+                if succeeding != transition_to_fire:
+                    value = True
+                elif node[0] == PRECEDES:
+                    value = preceding in trace_to_check
+                else:
+                    value = preceding not in trace_to_check
+                stack.pop()
+                continue
+            operation, children = node
+            if child_index > 0 and value == (operation == OR_OPERATION):
+                # short-circuit: false child of "∧" or true child of "∨" decides the node
+                stack.pop()
+                continue
+            if child_index == len(children):
+                # all children were evaluated, the node has the value of the last one
+                stack.pop()
+                continue
+            frame[1] += 1
+            stack.append([children[child_index], 0])
+        return value
+
+    def get_possibly_enabled_transitions(self, transition_name):
+        return self.possibly_enabled_transitions.get(transition_name, [])
+
+    def get_possibly_disabled_transitions(self, transition_name):
+        return self.possibly_disabled_transitions.get(transition_name, [])
+
+
+def get_constraint_transitions(constraint_formula):
+    """
+    Names of transitions mentioned in the formula
+    """
+    tree = constraint_parser.parse(constraint_formula)
+    return {str(token) for token in tree.scan_values(lambda value: isinstance(value, Token))}
+
+
+@functools.lru_cache(maxsize=COMPILED_CONSTRAINTS_CACHE_SIZE)
+def compile_constraint(constraint_formula):
+    """
+    Compiles the formula once per process, workers receive the same formula string with every calculation
+    """
+    return CompiledConstraint(constraint_formula)
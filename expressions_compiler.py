@@ -0,0 +1,122 @@
+import ast
+import builtins
+import functools
+
+from snakes.nets import *   # noqa
+
+# SNAKES evaluates guards and arc expressions by eval of the code object with the binding dict as locals,
+# so every name is looked up in dicts and the binding is changed and restored on every evaluation.
+# Compiled expression is a closure with variables of the binding unpacked into fast local slots once per call,
+# compiled enabling check of the transition does not build multisets for arcs of single variables and values
+
+
+def get_loaded_names(source):
+    """
+    Names read by the expression, except names bound inside it (e.g. by comprehensions), vars() of the expression
+    is not used, as it skips names of globals, which are shadowed by variables of the binding
+    """
+    nodes = [node for node in ast.walk(ast.parse(source.strip(), mode='eval')) if isinstance(node, ast.Name)]
+    stored_names = {node.id for node in nodes if not isinstance(node.ctx, ast.Load)}
+    return sorted({node.id for node in nodes if isinstance(node.ctx, ast.Load)} - stored_names)
+
+
+def compile_expression(expression):
+    """
+    Replaces bind of the expression by the compiled closure, returns False, if the expression is kept as is.
+    Closure falls back to the generic evaluation, when the binding misses variables of the expression
+    or binds names of globals and builtins (then the generic evaluation gives the same result or error)
+    """
+    if expression._true or '__binding__' in expression._str:
+        return False
+    env = expression.globals._env
+    local_names = []
+    shadowed_names = []
+    for name in get_loaded_names(expression._str):
+        (shadowed_names if name in env or hasattr(builtins, name) else local_names).append(name)
+
+    lines = ["def make_bind(__Token, __generic_bind):",
+             "    def bind(__binding):",
+             "        __env = __binding._dict"]
+    lines.extend(f"        if {name!r} in __env: return __generic_bind(__binding)" for name in shadowed_names)
+    if local_names:
+        lines.extend(["        try:",
+                      f"            {', '.join(local_names)}, = {', '.join(f'__env[{name!r}]' for name in local_names)},",
+                      "        except KeyError:",
+                      "            return __generic_bind(__binding)"])
+    lines.extend(["        return __Token((",
+                  expression._str,
+                  "        ))",
+                  "    return bind"])
+    namespace = {}
+    # globals of the closure are the namespace of the net, so declared imports and functions are visible
+    exec(compile('\n'.join(lines), f"<expression {expression._str!r}>", "exec"), env, namespace)
+    expression.bind = namespace["make_bind"](Token, functools.partial(Expression.bind, expression))
+    return True
+
+
+def compile_transition(transition):
+    """
+    Replaces enabled of the transition by the check equal to the generic one (guard, tokens, types of tokens),
+    where arcs of single variables and values are checked by counts of tokens without building multisets
+    and types are checked only for places, which do not allow all tokens
+    """
+    guard = transition.guard
+    variables_arcs = []
+    values_arcs = []
+    other_arcs = []
+    for place, label in transition.input():
+        if type(label) is Variable:
+            variables_arcs.append((place, label.name))
+        elif type(label) is Value:
+            values_arcs.append((place, label.value))
+        else:
+            other_arcs.append((place, label))
+    typed_arcs = [(place, label) for place, label in transition.input() if place._check is not tAll]
+    typed_arcs.extend((place, label) for place, label in transition.output() if place._check is not tAll)
+
+    def enabled(binding):
+        if not guard._true and not guard(binding):
+            return False
+        for place, name in variables_arcs:
+            if not place.tokens(binding[name]):
+                return False
+        for place, value in values_arcs:
+            if not place.tokens(value):
+                return False
+        for place, label in other_arcs:
+            if not label.check(binding, place.tokens):
+                return False
+        for place, label in typed_arcs:
+            try:
+                place.check(token.value for token in iterate(label.bind(binding)))
+            except ValueError:
+                return False
+        return True
+
+    transition.enabled = enabled
+
+
+def _iter_expressions(annotation):
+    if isinstance(annotation, Expression):
+        yield annotation
+    for component in getattr(annotation, '_components', ()):
+        yield from _iter_expressions(component)
+    if hasattr(annotation, '_annotation'):
+        yield from _iter_expressions(annotation._annotation)
+
+
+def compile_net(net):
+    """
+    Compiles guards, arc expressions and enabling checks of transitions of the net, is done once per net
+    in every worker after loading, returns the number of compiled expressions
+    """
+    compiled_count = 0
+    for transition in net.transition():
+        compile_transition(transition)
+        annotations = [transition.guard]
+        annotations.extend(label for _, label in transition.input())
+        annotations.extend(label for _, label in transition.output())
+        for annotation in annotations:
+            for expression in _iter_expressions(annotation):
+                compiled_count += compile_expression(expression)
+    return compiled_count
@@ -1,9 +1,69 @@
+import collections
+import os
+import time
 import typing
 
-import gevent.queue
+import gevent.event
 from gipc import gipc
 from snakes.nets import *   # noqa
 
+from config import AFFINITY_STEAL_THRESHOLD
+from tracing import tracer
+
+
+class PipesPool:
+    """
+    Free pipes of workers (indexed in the order they are added). Requests without home worker get pipes in FIFO order.
+    Request with home worker waits for its pipe, unless at least steal threshold requests are waiting for it already,
+    then any free pipe is taken. Released worker without own waiting requests serves requests without home,
+    then it steals the oldest request of the longest queue of home requests, if the queue is that long
+    """
+
+    def __init__(self, steal_threshold=AFFINITY_STEAL_THRESHOLD):
+        self.steal_threshold = steal_threshold
+        self.indices = {}
+        self.free_pipes = collections.OrderedDict()
+        self.waiting = collections.deque()
+        self.home_waiting = collections.defaultdict(collections.deque)
+        self.stolen_count = 0
+
+    def qsize(self):
+        return len(self.free_pipes)
+
+    def get(self, home=None):
+        if home is not None and home in self.free_pipes:
+            return self.free_pipes.pop(home)
+        if self.free_pipes and (home is None or len(self.home_waiting[home]) >= self.steal_threshold):
+            if home is not None:
+                self.stolen_count += 1
+            return self.free_pipes.popitem(last=False)[1]
+        waiter = gevent.event.AsyncResult()
+        waiters = self.waiting if home is None else self.home_waiting[home]
+        waiters.append(waiter)
+        try:
+            return waiter.get()
+        except BaseException:
+            # waiting greenlet is killed, the pipe given to it meanwhile is returned
+            if waiter.ready():
+                self.put(waiter.value)
+            else:
+                waiters.remove(waiter)
+            raise
+
+    def put(self, pipe):
+        index = self.indices.setdefault(pipe, len(self.indices))
+        if self.home_waiting.get(index):
+            self.home_waiting[index].popleft().set(pipe)
+        elif self.waiting:
+            self.waiting.popleft().set(pipe)
+        else:
+            longest_waiting = max(self.home_waiting.values(), key=len, default=())
+            if len(longest_waiting) >= self.steal_threshold:
+                self.stolen_count += 1
+                longest_waiting.popleft().set(pipe)
+            else:
+                self.free_pipes[index] = pipe
+
 
 class WorkersManager:
     """
@@ -16,7 +76,11 @@ class WorkersManager:
         self.calculate_movement_fun = calculate_movement_fun
 
         self.procs_with_pipes = []
-        self.pipes_queue = gevent.queue.UnboundQueue()
+        self.pipes_queue = PipesPool()
+        # home workers of transitions by names, tasks are routed by affinity if it is set (see affinity)
+        self.affinity = {}
+        # total time of tasks in flight (from sending to receiving), for the busy fraction of workers
+        self.busy_time = 0
 
     def create_pool(self, count):
         for worker_num in range(count):
@@ -36,10 +100,59 @@ class WorkersManager:
             except:
                 pass
 
-    def process_task(self, *args, **kwargs):
+    def broadcast(self, command):
+        """
+        Executes command on every worker, taking all pipes first, so no calculation is in flight meanwhile
+        """
+        return self.scatter([command] * len(self.procs_with_pipes))
+
+    def scatter(self, commands):
+        """
+        Executes commands[i] on the worker i (workers are ordered as they were created), taking all pipes first,
+        returns results in the order of commands
+        """
+        pipes = [self.pipes_queue.get() for _ in range(len(self.procs_with_pipes))]
+        try:
+            workers_pipes = [pipe for _, pipe in self.procs_with_pipes[:len(commands)]]
+            for pipe, command in zip(workers_pipes, commands):
+                pipe.put(command)
+            results = [pipe.get() for pipe in workers_pipes]
+        finally:
+            for pipe in pipes:
+                self.pipes_queue.put(pipe)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def execute(self, command):
+        """
+        Executes command on any free worker
+        """
         pipe = self.pipes_queue.get()
-        pipe.put((args, kwargs))
-        resp = self.deserialization_fun(*pipe.get())
+        try:
+            pipe.put(command)
+            result = pipe.get()
+        finally:
+            self.pipes_queue.put(pipe)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def process_task(self, *args, home=None, **kwargs):
+        pipe = self.pipes_queue.get(home)
+        task_start = time.perf_counter()
+        if tracer.enabled:
+            ipc_start = tracer.now()
+        # tracing flag is passed with every task, so workers do not depend on the state they were forked with
+        pipe.put((args, kwargs, tracer.enabled))
+        resp = pipe.get()
+        self.busy_time += time.perf_counter() - task_start
+        if tracer.enabled:
+            resp, (worker_pid, calculation_start, calculation_end) = resp
+            tracer.span("ipc", "ipc", ipc_start, worker=worker_pid)
+            tracer.worker_span("calculation", worker_pid, calculation_start, calculation_end)
+        resp = self.deserialization_fun(*resp)
         self.pipes_queue.put(pipe)
         if isinstance(resp, Exception):
             return []
@@ -54,17 +167,41 @@ def work(task_function, serialize_function, pipe):
     """
     while True:
         try:
-            l, k = pipe.get()
+            message = pipe.get()
         except EOFError:
             break
+        if isinstance(message, WorkerCommand):
+            try:
+                resp = message.function(*message.args)
+            except Exception as exc:
+                resp = exc
+            pipe.put(resp)
+            continue
+        l, k, is_tracing = message
+        if is_tracing:
+            calculation_start = tracer.now()
         try:
             resp = task_function(*l, **k)
         except Exception as exc:
             resp = exc
-        pipe.put(serialize_function(*resp))
+        if is_tracing:
+            pipe.put((serialize_function(*resp), (os.getpid(), calculation_start, tracer.now())))
+        else:
+            pipe.put(serialize_function(*resp))
     pipe.close()
 
 
+class WorkerCommand:
+    """
+    Command for workers, which is not a calculation, e.g. loading a net into the warm workers
+    Function must be importable by name (not a lambda or a closure) to be passed through the pipe
+    """
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+
 class AnnotatedMovement:
     """
     Annotation for movements for ease of working with it and logging
@@ -95,7 +232,8 @@ def deserialize_base_movements(movements_from_pipe: typing.List[str]):
 
 def request_base_movement_calculation(workers_manager_, transition, marking):
     # SNAKES library is made for different sorts of Petri nets with possibly many movements and thus return list
-    movements = workers_manager_.process_task(repr(transition), repr(marking))
+    movements = workers_manager_.process_task(repr(transition), repr(marking),
+                                              home=workers_manager_.affinity.get(transition))
     if len(movements) == 0:
         return None
     # For purposes of compatibility
@@ -120,8 +258,8 @@ def deserialize_workflow_movements(movements_from_pipe: typing.List[str],
 
 def request_workflow_movement_calculation(workers_manager_, transition, marking, trace, constraint_formula_):
     # SNAKES library is made for different sorts of Petri nets with possibly many movements and thus return list
-    movements, possibly_enabled, possible_disabled = workers_manager_.process_task(repr(transition), repr(marking),
-                                                                                   trace, constraint_formula_)
+    movements, possibly_enabled, possible_disabled = workers_manager_.process_task(
+        repr(transition), repr(marking), trace, constraint_formula_, home=workers_manager_.affinity.get(transition))
     if len(movements) == 0:
         # in this case these two lists should be empty, as check for possible movement is done before filling them
         return None, possibly_enabled, possible_disabled
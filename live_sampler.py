@@ -0,0 +1,98 @@
+import collections
+import json
+import os
+import resource
+import time
+
+import gevent
+import gevent.socket
+
+
+def get_rss():
+    """
+    Resident set size of the coordinator process in bytes, peak RSS is used where /proc is not available
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_samples_stream(output):
+    """
+    Opens stream for samples: "unix:<path>" connects to the local socket, any other output is a file (appended)
+    """
+    if output.startswith("unix:"):
+        connection = gevent.socket.socket(gevent.socket.AF_UNIX, gevent.socket.SOCK_STREAM)
+        connection.connect(output[len("unix:"):])
+        return connection.makefile('w')
+    return open(output, 'a')
+
+
+class LiveSampler:
+    """
+    Samples the running simulation in the coordinator greenlet and streams samples as JSON lines:
+    events count and throughput since the previous sample, handlers counts by states,
+    busy fraction of workers and RSS of the coordinator
+    """
+
+    def __init__(self, manager, output, interval):
+        self.manager = manager
+        self.output = output
+        self.interval = interval
+        self.stream = None
+        self.previous_time = None
+        self.previous_events_count = 0
+        self.previous_busy_time = 0
+
+    def sample(self):
+        now = time.time()
+        workers_manager = self.manager.calculation_manager
+        elapsed = now - self.previous_time
+        busy_time = workers_manager.busy_time
+        workers_count = len(workers_manager.procs_with_pipes)
+        # step semantics has no handlers
+        handlers_states = collections.Counter(handler.state.name
+                                              for handler in getattr(self.manager, 'transition_handlers', ()))
+        sample = {
+            "time": now,
+            "events_count": self.manager.events_count,
+            "events_per_second": (self.manager.events_count - self.previous_events_count) / elapsed
+            if elapsed > 0 else 0,
+            "handlers_states": dict(handlers_states),
+            # tasks are accounted on completion, so the fraction of a short interval may exceed 1 otherwise
+            "workers_busy_fraction": min((busy_time - self.previous_busy_time) / (elapsed * workers_count), 1)
+            if elapsed > 0 and workers_count else 0,
+            "rss": get_rss(),
+        }
+        self.previous_time = now
+        self.previous_events_count = self.manager.events_count
+        self.previous_busy_time = busy_time
+        self.stream.write(json.dumps(sample) + '\n')
+        self.stream.flush()
+        return sample
+
+    def _run(self):
+        while True:
+            gevent.sleep(self.interval)
+            self.sample()
+
+    def start(self):
+        self.stream = open_samples_stream(self.output)
+        self.previous_time = time.time()
+        self.previous_events_count = self.manager.events_count
+        self.previous_busy_time = self.manager.calculation_manager.busy_time
+        # sampler is not in handlers group, otherwise the group would never become empty on deadlock
+        return gevent.spawn(self._run)
+
+    def stop(self, sampler_coroutine):
+        """
+        Stops sampling, the last sample is taken at the end of the simulation
+        """
+        sampler_coroutine.kill()
+        try:
+            self.sample()
+        finally:
+            self.stream.close()
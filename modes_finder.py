@@ -0,0 +1,124 @@
+import random
+
+from snakes.nets import *   # noqa
+
+from config import MODE_SELECTION_POLICY
+
+
+class IndexedModesFinder:
+    """
+    Modes finder for colored nets: instead of the cross product of all input arcs bindings (as t.modes() does),
+    bindings of every arc are indexed by values of variables shared with previously joined arcs (hash join),
+    so only consistent partial bindings are combined. Modes are yielded lazily, one by one
+    """
+
+    def __init__(self, transition):
+        self.transition = transition
+
+    def _arcs_bindings(self):
+        arcs_bindings = []
+        for place, label in self.transition.input():
+            try:
+                modes = label.modes(place.tokens)
+            except ModeError:
+                return None
+            # variables bound to equal tokens give equal bindings, multiplicities are checked by enabled() later
+            unique_bindings = {tuple(sorted(mode.items())): dict(mode.items()) for mode in modes}
+            arcs_bindings.append((set(label.vars()), list(unique_bindings.values())))
+        # the most selective arcs are joined first
+        arcs_bindings.sort(key=lambda arc: len(arc[1]))
+        return arcs_bindings
+
+    def iter_modes(self):
+        # transitions without input arcs have no modes, as in t.modes() of SNAKES, so they never fire
+        if not self.transition.input():
+            return
+        arcs_bindings = self._arcs_bindings()
+        if arcs_bindings is None:
+            return
+
+        bound_vars = set()
+        join_steps = []
+        for arc_vars, bindings in arcs_bindings:
+            key_vars = tuple(sorted(arc_vars & bound_vars))
+            index = {}
+            for binding in bindings:
+                index.setdefault(tuple(binding.get(var) for var in key_vars), []).append(binding)
+            join_steps.append((key_vars, index))
+            bound_vars |= arc_vars
+
+        # depth-first join with explicit stack, so the first mode is found without enumerating the others
+        stack = [(0, {})]
+        while stack:
+            step, partial_binding = stack.pop()
+            if step == len(join_steps):
+                mode = Substitution(partial_binding)
+                try:
+                    if self.transition.enabled(mode):
+                        yield mode
+                except DomainError:
+                    pass
+                continue
+            key_vars, index = join_steps[step]
+            candidates = index.get(tuple(partial_binding[var] for var in key_vars), ())
+            # reversed, so candidates are popped in the order of arcs tokens
+            for binding in reversed(candidates):
+                extended_binding = dict(partial_binding)
+                extended_binding.update(binding)
+                stack.append((step + 1, extended_binding))
+
+
+def select_first(modes):
+    return next(modes, None)
+
+
+def select_random(modes):
+    # reservoir sampling: uniformly random mode without materializing all of them
+    selected = None
+    for seen, mode in enumerate(modes, start=1):
+        if random.randrange(seen) == 0:
+            selected = mode
+    return selected
+
+
+class WeightedSelection:
+    """
+    Selection of the mode with probability proportional to weight_function(mode) (weighted reservoir sampling)
+    Weight function must be importable by name to be passed to workers
+    """
+
+    def __init__(self, weight_function):
+        self.weight_function = weight_function
+
+    def __call__(self, modes):
+        selected = None
+        selected_key = -1
+        for mode in modes:
+            weight = self.weight_function(mode)
+            if weight <= 0:
+                continue
+            key = random.random() ** (1 / weight)
+            if key > selected_key:
+                selected, selected_key = mode, key
+        return selected
+
+
+SELECTION_POLICIES = {
+    "first": select_first,
+    "random": select_random,
+}
+
+# selection policy of the worker process, can be changed for warm workers by set_selection_policy command
+selection_policy = SELECTION_POLICIES[MODE_SELECTION_POLICY]
+
+
+def set_selection_policy(policy):
+    """
+    Sets selection policy by name ("first", "random") or as callable, e.g. WeightedSelection
+    """
+    global selection_policy
+    selection_policy = SELECTION_POLICIES[policy] if isinstance(policy, str) else policy
+
+
+def select_mode(transition):
+    return selection_policy(IndexedModesFinder(transition).iter_modes())
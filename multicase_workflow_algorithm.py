@@ -0,0 +1,312 @@
+import collections
+import functools
+import itertools
+import sys
+import time
+
+import gevent
+import gevent.pool
+import numpy as np
+import numpy.random as random
+
+import workflow_proposed_algorithm
+from benchmark_utilities.constraint_generator import generate_formula
+from benchmark_utilities.nets_generator import load_from_file
+from config import SIMULATION_TIMEOUT, WORKERS_NUM, IS_BENCHMARKING, MULTICASE_BATCH_SIZE, IS_PRUNING_DEAD_TRANSITIONS
+from ipc_utilities import WorkersManager, WorkerCommand, serialize_workflow_movements, deserialize_workflow_movements
+from logging_manager import logger
+from nets_cache import load_net_into_workers
+from net_structure import build_transitions_adjacency
+from simulation_control import StopReasons, run_until_stopped
+from structural_analysis import prune_net
+
+from snakes.nets import *   # noqa
+
+# Many cases of the same workflow net are simulated concurrently: tokens of every case are kept in its own marking
+# (as if tokens carried case ids and transitions synchronized tokens of one case only), every case has its own trace,
+# so constraints are checked per case. Handlers are shared by all cases: a handler keeps cases, for which
+# its transition is to be calculated, and one worker request calculates the transition for a batch of them.
+# A case is completed, when no handler has it pending anymore (none of its transitions can fire)
+
+
+def calculate_movements_of_cases(transition_repr, cases, constraint_formula_):
+    """
+    Calculates movements of the transition for the batch of cases (marking repr and trace of every case)
+    on the current net of the workflow algorithm in the worker
+    """
+    return [serialize_workflow_movements(*workflow_proposed_algorithm.calculate_movement_in_workflow_net(
+        transition_repr, marking_repr, trace, constraint_formula_)) for marking_repr, trace in cases]
+
+
+class Case:
+    """
+    Marking, trace and statistics of one case, version is bumped on every movement of the case,
+    so calculations made on the previous marking are detected
+    """
+    __slots__ = ('case_id', 'marking', 'trace', 'version', 'disabling_versions', 'pending_count', 'start_time',
+                 'completion_time')
+
+    def __init__(self, case_id, marking):
+        self.case_id = case_id
+        self.marking = marking
+        self.trace = []
+        self.version = 0
+        # versions of the last firings possibly disabling transitions by constraints
+        self.disabling_versions = {}
+        # number of handlers having the case pending or in flight
+        self.pending_count = 0
+        self.start_time = time.time()
+        self.completion_time = None
+
+
+class SimulationManager:
+    """
+    Simulation manager of the multi-case simulation keeps cases and handlers shared by them
+    """
+
+    def __init__(self, calculation_manager, net_, constraint_formula_, cases_count, max_events=None,
+                 arrival_interval=None, batch_size=MULTICASE_BATCH_SIZE):
+        self.net = net_
+        self.calculation_manager = calculation_manager
+        self.constraint_formula = constraint_formula_
+        self.cases_count = cases_count
+        # cases are started at once or one by one with the interval
+        self.arrival_interval = arrival_interval
+        self.batch_size = batch_size
+        self.cases = []
+        # cases have their own markings
+        self.current_marking = None
+
+        # handlers coroutines are spawned in this group, when they get pending cases, it becomes empty,
+        # when every case is completed
+        self.handlers_coroutines = gevent.pool.Group()
+        self.transition_handlers = []
+        self.adjacency = None
+
+        self.max_events = max_events
+        self.is_stopped = False
+        self.stop_reason = None
+
+        # Statistics info
+        self.events_count = 0
+        self.events_distribution = collections.defaultdict(int)
+        self.completed_cases_count = 0
+        self.stale_calculations_count = 0
+        self.requests_count = 0
+        # report of pruning of dead transitions before simulation (see structural_analysis)
+        self.pruning_report = None
+        self.building_start = time.time()
+        self.build_time = None
+        self.simulation_start = None
+        self.simulation_end = None
+
+    def build(self):
+        build_start = time.time()
+        self.adjacency = build_transitions_adjacency(
+            self.net, self.calculation_manager,
+            functools.partial(WorkerCommand, workflow_proposed_algorithm.calculate_relations_chunk))
+        self.transition_handlers = [TransitionHandler(index, name, self)
+                                    for index, name in enumerate(self.adjacency.names)]
+        self.build_time = time.time() - build_start
+        return self.transition_handlers
+
+    def startup(self, transitions):
+        self.simulation_start = time.time()
+        self.handlers_coroutines.spawn(self.start_cases, list(transitions))
+        self.handlers_coroutines.join()
+        # the group becomes empty without stop only when every case is completed
+        self.request_stop(StopReasons.CASES_COMPLETED)
+
+    def start_cases(self, transitions):
+        initial_marking = self.net.get_marking()
+        for case_id in range(self.cases_count):
+            if self.is_stopped:
+                return
+            case = Case(case_id, initial_marking.copy())
+            self.cases.append(case)
+            random.shuffle(transitions)
+            for handler in transitions:
+                handler.enqueue(case)
+            if self.arrival_interval:
+                gevent.sleep(self.arrival_interval)
+
+    def request_stop(self, reason):
+        """
+        Stops the simulation without killing coroutines: new calculations are not requested anymore
+        """
+        if not self.is_stopped:
+            self.is_stopped = True
+            self.stop_reason = reason
+            self.simulation_end = time.time()
+
+    def drain(self):
+        """
+        Awaits calculations in flight after the stop, so workers pipes are left consistent for the next simulation
+        """
+        self.handlers_coroutines.join()
+
+    def perform_movement(self, handler, case, movement, possibly_enabled_transitions, possibly_disabled_transitions):
+        case.marking = case.marking - movement.start_places + movement.end_places
+        case.version += 1
+        for transition_name in possibly_disabled_transitions:
+            case.disabling_versions[transition_name] = case.version
+        case.trace.append(handler.name)
+        self.events_count += 1
+        self.events_distribution[handler.name] += 1
+
+        # the transition itself, consumers of its output places and transitions possibly enabled by constraints
+        # are calculated for the case again
+        handler.enqueue(case)
+        for index in self.adjacency.get_consuming(handler.index):
+            self.transition_handlers[index].enqueue(case)
+        for index in self.adjacency.get_indices(possibly_enabled_transitions):
+            self.transition_handlers[index].enqueue(case)
+
+        if self.max_events is not None and self.events_count >= self.max_events:
+            self.request_stop(StopReasons.EVENTS_BUDGET)
+
+    def release_case(self, case):
+        case.pending_count -= 1
+        if case.pending_count == 0:
+            case.completion_time = time.time()
+            self.completed_cases_count += 1
+
+    def get_cases_latencies(self):
+        """
+        Completion latencies of completed cases by case ids
+        """
+        return {case.case_id: case.completion_time - case.start_time for case in self.cases
+                if case.completion_time is not None}
+
+    def get_simulation_time(self):
+        return (self.simulation_end or time.time()) - self.simulation_start
+
+    def print_stats(self):
+        simulation_time = self.get_simulation_time()
+        latencies = list(self.get_cases_latencies().values())
+        logger.info(f"{self.build_time}s building of handlers and relations")
+        logger.info(f"Constraint formula: {self.constraint_formula}")
+        logger.info(f"{self.completed_cases_count} of {len(self.cases)} cases completed in {simulation_time}s, "
+                    f"{self.events_count / simulation_time} events per second, "
+                    f"{self.completed_cases_count / simulation_time} cases per second")
+        if latencies:
+            logger.info(f"Cases latency: mean {np.mean(latencies)}s, p50 {np.percentile(latencies, 50)}s, "
+                        f"p95 {np.percentile(latencies, 95)}s, max {max(latencies)}s")
+        logger.info(f"Transition handlers distribution: {self.events_distribution}")
+        logger.info(f"Worker requests: {self.requests_count}, stale calculations: {self.stale_calculations_count}")
+
+    def print_stats_for_benchmarks(self):
+        simulation_time = self.get_simulation_time()
+        logger.info(f"{self.events_count / simulation_time}")
+        return self.events_count / simulation_time
+
+
+class TransitionHandler:
+    """
+    Handler of the transition shared by all cases, its coroutine runs while the handler has pending cases
+    """
+    __slots__ = ('index', 'name', 'simulation_manager', 'pending_cases', 'is_running')
+
+    def __init__(self, index, name, simulation_manager):
+        self.index = index
+        self.name = name
+        self.simulation_manager = simulation_manager
+        # pending cases by ids in the order of enqueuing
+        self.pending_cases = {}
+        self.is_running = False
+
+    def __repr__(self):
+        return f"TransitionHandler({self.name})"
+
+    def enqueue(self, case):
+        if case.case_id in self.pending_cases:
+            return
+        self.pending_cases[case.case_id] = case
+        case.pending_count += 1
+        if not self.is_running:
+            self.is_running = True
+            self.simulation_manager.handlers_coroutines.spawn(self.activate_transition)
+
+    def activate_transition(self):
+        manager = self.simulation_manager
+        try:
+            while self.pending_cases and not manager.is_stopped:
+                batch = [self.pending_cases.pop(case_id)
+                         for case_id in list(itertools.islice(self.pending_cases, manager.batch_size))]
+                versions = [case.version for case in batch]
+                released_count = 0
+                try:
+                    results = manager.calculation_manager.execute(WorkerCommand(
+                        calculate_movements_of_cases, repr(self.name),
+                        [(repr(case.marking), case.trace) for case in batch], manager.constraint_formula))
+                    manager.requests_count += 1
+                    for case, version, result in zip(batch, versions, results):
+                        self._apply_result(case, version, result)
+                        # the case is released after enqueuing, so it is not completed in between
+                        manager.release_case(case)
+                        released_count += 1
+                finally:
+                    # if the calculation or a movement failed, the rest of the batch is released anyway,
+                    # so other cases are not kept pending forever
+                    for case in batch[released_count:]:
+                        manager.release_case(case)
+        except Exception:
+            # the coroutine of the handler fails, its pending cases are released the same way
+            while self.pending_cases:
+                manager.release_case(self.pending_cases.popitem()[1])
+            raise
+        finally:
+            self.is_running = False
+
+    def _apply_result(self, case, version, result):
+        manager = self.simulation_manager
+        movements, possibly_enabled_transitions, possibly_disabled_transitions = deserialize_workflow_movements(*result)
+        if not movements or manager.is_stopped:
+            # transitions, which are not enabled, are enqueued again by firings enabling them
+            return
+        if case.version == version or (movements[0].start_places <= case.marking
+                                       and case.disabling_versions.get(self.name, -1) < version):
+            # tokens of the movement are still in the marking and the transition was not possibly
+            # disabled by constraints, so the movement is valid even if the case was changed meanwhile
+            manager.perform_movement(self, case, movements[0], possibly_enabled_transitions,
+                                     possibly_disabled_transitions)
+        else:
+            manager.stale_calculations_count += 1
+            self.enqueue(case)
+
+
+def run_simulation(workers_manager_, net_, constraint_formula_, cases_count, timeout=None, max_events=None,
+                   arrival_interval=None, batch_size=MULTICASE_BATCH_SIZE, is_pruning=IS_PRUNING_DEAD_TRANSITIONS):
+    """
+    Runs the multi-case simulation of the workflow net on the (possibly warm) workers of the workflow algorithm,
+    returns manager with statistics
+    """
+    pruning_report = None
+    if is_pruning:
+        net_, pruning_report = prune_net(net_, constraint_formula_)
+    load_net_into_workers(workers_manager_, workflow_proposed_algorithm.use_net, net_)
+    manager = SimulationManager(workers_manager_, net_, constraint_formula_, cases_count, max_events,
+                                arrival_interval, batch_size)
+    manager.pruning_report = pruning_report
+    transition_handlers = manager.build()
+    return run_until_stopped(manager, transition_handlers, timeout)
+
+
+if __name__ == "__main__":
+    simulated_net = load_from_file('nets.pnml')
+    cases_amount = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    constraint_formula = generate_formula([t for t in simulated_net.transition()], length)
+
+    workers_manager = WorkersManager(
+        calculate_movement_fun=workflow_proposed_algorithm.calculate_movement_in_workflow_net,
+        serialization_fun=serialize_workflow_movements, deserialization_fun=deserialize_workflow_movements)
+    workers_manager.create_pool(WORKERS_NUM)
+    try:
+        manager = run_simulation(workers_manager, simulated_net, constraint_formula, cases_amount, SIMULATION_TIMEOUT)
+        if IS_BENCHMARKING:
+            manager.print_stats_for_benchmarks()
+        else:
+            manager.print_stats()
+    finally:
+        workers_manager.destroy_pool()
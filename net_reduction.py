@@ -0,0 +1,260 @@
+import collections
+
+import numpy.random as random
+
+from logging_manager import logger
+
+from snakes.nets import *   # noqa
+
+# Reduction rules preserving liveness and boundedness (Murata) are applied to ordinary nets (black tokens, arcs of
+# weight 1, no guards) before simulation, so serial chains and duplicates do not get their own handlers:
+# fusion of series transitions - t1 is the only producer and t2 is the only consumer of the unmarked place p,
+#   which is the only input place of t2, then t1 and t2 are fused into the macro transition firing both
+# parallel places - places with the same producers and consumers, the place with more tokens is removed
+# parallel transitions - transitions with the same input and output places, one of them is kept
+# Fired macro transitions are expanded back into the original transitions in the trace and events distribution
+# by expansion trees: leaves are names of original transitions, series nodes fire all their children in order
+# and parallel nodes fire one of their children
+
+SERIES = "series"
+PARALLEL = "parallel"
+
+
+def combine_nodes(kind, first, second):
+    # nested nodes of the same kind are merged, so trees of chains and groups of duplicates stay flat
+    children = []
+    for node in (first, second):
+        if isinstance(node, tuple) and node[0] == kind:
+            children.extend(node[1])
+        else:
+            children.append(node)
+    return kind, children
+
+
+class NetReduction:
+    """
+    Reduced net and the mapping of its transitions and places back to the original net
+    """
+
+    def __init__(self, net, expansions, removed_places, rules_counts):
+        self.net = net
+        # expansion trees of reduced transitions, which are not original ones
+        self.expansions = expansions
+        # removed places in the order of removal with the kept parallel place (None for fused places) and
+        # the difference of their tokens
+        self.removed_places = removed_places
+        self.rules_counts = rules_counts
+
+    def expand_transition(self, transition_name):
+        expanded_transitions = []
+        nodes = [self.expansions.get(transition_name, transition_name)]
+        while nodes:
+            node = nodes.pop()
+            if not isinstance(node, tuple):
+                expanded_transitions.append(node)
+            elif node[0] == SERIES:
+                nodes.extend(reversed(node[1]))
+            else:
+                # duplicates were equally enabled, so the fired one is chosen uniformly
+                nodes.append(node[1][random.randint(len(node[1]))])
+        return expanded_transitions
+
+    def expand_trace(self, trace):
+        expanded_trace = []
+        for transition_name in trace:
+            expanded_trace.extend(self.expand_transition(transition_name))
+        return expanded_trace
+
+    def expand_distribution(self, events_distribution):
+        expanded_distribution = collections.defaultdict(int)
+        nodes = [(self.expansions.get(transition_name, transition_name), count)
+                 for transition_name, count in events_distribution.items()]
+        while nodes:
+            node, count = nodes.pop()
+            if not isinstance(node, tuple):
+                expanded_distribution[node] += count
+            elif node[0] == SERIES:
+                nodes.extend((child, count) for child in node[1])
+            else:
+                children_counts = random.multinomial(count, [1 / len(node[1])] * len(node[1]))
+                nodes.extend((child, int(child_count)) for child, child_count in zip(node[1], children_counts))
+        return expanded_distribution
+
+    def expand_marking(self, marking):
+        tokens = {place: len(marking(place)) for place in marking}
+        # places are restored in the reverse order of removal, so kept places are restored before removed ones
+        for place, kept_place, tokens_difference in reversed(self.removed_places):
+            tokens[place] = (tokens.get(kept_place, 0) if kept_place is not None else 0) + tokens_difference
+        return Marking({place: MultiSet([dot] * count) for place, count in tokens.items() if count})
+
+    def expand_predicate(self, stop_predicate):
+        """
+        Predicate on markings of the reduced net calling the predicate with markings of the original net
+        """
+        if stop_predicate is None:
+            return None
+        return lambda marking: stop_predicate(self.expand_marking(marking))
+
+    def expand_manager(self, manager):
+        """
+        Replaces statistics of the manager (after the simulation of the reduced net) with the ones of the original net
+        """
+        if hasattr(manager, 'trace'):
+            manager.trace = self.expand_trace(manager.trace)
+            manager.events_distribution = collections.defaultdict(int, collections.Counter(manager.trace))
+        else:
+            manager.events_distribution = self.expand_distribution(manager.events_distribution)
+        manager.events_count = sum(manager.events_distribution.values())
+        manager.current_marking = self.expand_marking(manager.current_marking)
+
+
+def is_ordinary(net):
+    for place in net.place():
+        if any(token != dot for token in place.tokens):
+            return False
+    for transition in net.transition():
+        if not transition.guard._true:
+            return False
+        for _, label in transition.input() + transition.output():
+            if label != Value(dot):
+                return False
+    return True
+
+
+class _Structure:
+    # input and output places of transitions and tokens counts of places, which are changed by reduction rules
+
+    def __init__(self, net):
+        self.pre = {transition.name: set(transition.pre) for transition in net.transition()}
+        self.post = {transition.name: set(transition.post) for transition in net.transition()}
+        self.tokens = {place.name: len(place.tokens) for place in net.place()}
+        self.expansions = {name: name for name in self.pre}
+        self.removed_places = []
+
+    def get_neighbours(self):
+        producers = {place: set() for place in self.tokens}
+        consumers = {place: set() for place in self.tokens}
+        for transition_name, places in self.pre.items():
+            for place in places:
+                consumers[place].add(transition_name)
+        for transition_name, places in self.post.items():
+            for place in places:
+                producers[place].add(transition_name)
+        return producers, consumers
+
+    def remove_transition(self, transition_name):
+        del self.pre[transition_name]
+        del self.post[transition_name]
+        del self.expansions[transition_name]
+
+    def remove_place(self, place, kept_place, tokens_difference):
+        del self.tokens[place]
+        self.removed_places.append((place, kept_place, tokens_difference))
+
+    def remove_parallel_transitions(self, excluded):
+        kept = {}
+        removed_count = 0
+        for transition_name in list(self.pre):
+            if transition_name in excluded:
+                continue
+            key = (frozenset(self.pre[transition_name]), frozenset(self.post[transition_name]))
+            if key not in kept:
+                kept[key] = transition_name
+                continue
+            self.expansions[kept[key]] = combine_nodes(PARALLEL, self.expansions[kept[key]],
+                                                       self.expansions[transition_name])
+            self.remove_transition(transition_name)
+            removed_count += 1
+        return removed_count
+
+    def remove_parallel_places(self):
+        producers, consumers = self.get_neighbours()
+        kept = {}
+        removed_count = 0
+        for place in list(self.tokens):
+            key = (frozenset(producers[place]), frozenset(consumers[place]))
+            if key not in kept:
+                kept[key] = place
+                continue
+            kept_place = kept[key]
+            if self.tokens[place] < self.tokens[kept_place]:
+                # the place with less tokens limits firings of consumers, so it is kept
+                kept[key], kept_place, place = place, place, kept_place
+            self.remove_place(place, kept_place, self.tokens[place] - self.tokens[kept_place])
+            for transition_name in producers[place]:
+                self.post[transition_name].discard(place)
+            for transition_name in consumers[place]:
+                self.pre[transition_name].discard(place)
+            removed_count += 1
+        return removed_count
+
+    def fuse_series_transitions(self, excluded, names):
+        producers, consumers = self.get_neighbours()
+        # transitions are fused once per pass, as their neighbourhoods are changed by the fusion
+        fused = set()
+        fused_count = 0
+        for place in list(self.tokens):
+            if self.tokens[place] or len(producers[place]) != 1 or len(consumers[place]) != 1:
+                continue
+            first, = producers[place]
+            second, = consumers[place]
+            if first == second or first in excluded or second in excluded or first in fused or second in fused \
+                    or self.pre[second] != {place} or (self.post[first] - {place}) & self.post[second]:
+                continue
+            macro_name = get_macro_name(first, second, names)
+            self.pre[macro_name] = self.pre[first]
+            self.post[macro_name] = (self.post[first] - {place}) | self.post[second]
+            self.expansions[macro_name] = combine_nodes(SERIES, self.expansions[first], self.expansions[second])
+            self.remove_transition(first)
+            self.remove_transition(second)
+            self.remove_place(place, None, 0)
+            fused.update((first, second, macro_name))
+            fused_count += 1
+        return fused_count
+
+
+def get_macro_name(first, second, names):
+    macro_name = f"{first}+{second}"
+    suffix = 0
+    while macro_name in names:
+        suffix += 1
+        macro_name = f"{first}+{second}#{suffix}"
+    names.add(macro_name)
+    return macro_name
+
+
+def reduce_net(net, excluded=()):
+    """
+    Reduces the ordinary net until no rule applies, excluded transitions (e.g. mentioned in constraints)
+    are neither fused nor removed, returns None if the net is not ordinary
+    """
+    if not is_ordinary(net):
+        logger.info(f"Net {net.name} is not reduced, as it is not ordinary")
+        return None
+    excluded = set(excluded)
+    structure = _Structure(net)
+    names = set(structure.pre) | set(structure.tokens)
+    rules_counts = collections.Counter()
+    while True:
+        counts = {
+            "parallel_transitions": structure.remove_parallel_transitions(excluded),
+            "parallel_places": structure.remove_parallel_places(),
+            "series_transitions": structure.fuse_series_transitions(excluded, names),
+        }
+        rules_counts.update(counts)
+        if not any(counts.values()):
+            break
+
+    reduced_net = PetriNet(net.name)
+    for place, tokens_count in structure.tokens.items():
+        reduced_net.add_place(Place(place, [dot] * tokens_count))
+    for transition_name in structure.pre:
+        reduced_net.add_transition(Transition(transition_name))
+        for place in structure.pre[transition_name]:
+            reduced_net.add_input(place, transition_name, Value(dot))
+        for place in structure.post[transition_name]:
+            reduced_net.add_output(place, transition_name, Value(dot))
+    expansions = {name: node for name, node in structure.expansions.items() if node != name}
+    logger.info(f"Net {net.name} is reduced from {len(net.transition())} to {len(reduced_net.transition())} "
+                f"transitions and from {len(net.place())} to {len(reduced_net.place())} places: {dict(rules_counts)}")
+    return NetReduction(reduced_net, expansions, structure.removed_places, rules_counts)
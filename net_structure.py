@@ -0,0 +1,111 @@
+import array
+
+import gevent
+
+from config import PARALLEL_BUILD_MIN_TRANSITIONS
+
+
+def scan_arcs(net):
+    """
+    Scans arcs of the net once: names of transitions (their positions are transitions ids),
+    input and output places of every transition and consumers (transitions ids) of every place
+    """
+    transitions = list(net.transition())
+    names = [transition.name for transition in transitions]
+    input_places = [tuple(transition.pre) for transition in transitions]
+    output_places = [tuple(transition.post) for transition in transitions]
+    return names, input_places, output_places, get_places_consumers(input_places)
+
+
+def get_places_consumers(input_places):
+    # consumers (transitions ids) of every place by input places of transitions
+    places_consumers = {}
+    for index, places in enumerate(input_places):
+        for place in places:
+            places_consumers.setdefault(place, []).append(index)
+    return places_consumers
+
+
+def build_relations_from_arcs(input_places, output_places, places_consumers, start, end):
+    """
+    Builds relations of transitions with ids from start to end in CSR form (offsets start from 0) by scanned arcs:
+    consuming - transitions consuming tokens from the output places of the transition
+    concurrent - transitions sharing input places with the transition (including itself)
+    """
+    relations = []
+    for transitions_places in (output_places, input_places):
+        offsets = array.array('i', [0])
+        targets = array.array('i')
+        for index in range(start, min(end, len(transitions_places))):
+            related = set()
+            for place in transitions_places[index]:
+                related.update(places_consumers.get(place, ()))
+            targets.extend(sorted(related))
+            offsets.append(len(targets))
+        relations.append((offsets, targets))
+    return relations
+
+
+class TransitionsAdjacency:
+    """
+    Relations between transitions by dense integer ids (positions in names) in CSR form:
+    transitions related to the transition i are targets[offsets[i]:offsets[i + 1]]
+    """
+
+    def __init__(self, names, input_places, chunks):
+        self.names = names
+        self.indices = {name: index for index, name in enumerate(self.names)}
+        self.input_places = input_places
+        self.consuming_offsets, self.consuming_targets = array.array('i', [0]), array.array('i')
+        self.concurrent_offsets, self.concurrent_targets = array.array('i', [0]), array.array('i')
+        # chunks are concatenated in the order of transitions ids
+        for (consuming_offsets, consuming_targets), (concurrent_offsets, concurrent_targets) in chunks:
+            self._append_chunk(self.consuming_offsets, self.consuming_targets, consuming_offsets, consuming_targets)
+            self._append_chunk(self.concurrent_offsets, self.concurrent_targets, concurrent_offsets,
+                               concurrent_targets)
+
+    @staticmethod
+    def _append_chunk(offsets, targets, chunk_offsets, chunk_targets):
+        base = len(targets)
+        offsets.extend(base + offset for offset in chunk_offsets[1:])
+        targets.extend(chunk_targets)
+
+    def get_indices(self, names):
+        # constraints may name transitions, which are not in the net (e.g. dead transitions pruned before simulation)
+        return [self.indices[name] for name in names if name in self.indices]
+
+    def get_consuming(self, index):
+        return self.consuming_targets[self.consuming_offsets[index]:self.consuming_offsets[index + 1]]
+
+    def get_concurrent(self, index):
+        return self.concurrent_targets[self.concurrent_offsets[index]:self.concurrent_offsets[index + 1]]
+
+
+def build_transitions_adjacency(net, workers_manager=None, chunk_command=None):
+    """
+    Builds adjacency of transitions in time linear in the number of arcs (for bounded number of consumers of places)
+    For large nets relations are built in parallel chunks on workers: chunk_command(start, end) is the WorkerCommand
+    calculating build_relations_from_arcs by the arcs scan of the net loaded into workers (see NetsCache.get_arcs_scan)
+    """
+    names, input_places, output_places, places_consumers = scan_arcs(net)
+    if workers_manager is None or chunk_command is None or len(names) < PARALLEL_BUILD_MIN_TRANSITIONS:
+        return TransitionsAdjacency(names, input_places, [
+            build_relations_from_arcs(input_places, output_places, places_consumers, 0, len(names))])
+
+    chunks_count = len(workers_manager.procs_with_pipes)
+    chunk_size = -(-len(names) // chunks_count)
+    chunks = [gevent.spawn(workers_manager.execute, chunk_command(start, start + chunk_size))
+              for start in range(0, len(names), chunk_size)]
+    gevent.joinall(chunks, raise_error=True)
+    return TransitionsAdjacency(names, input_places, [chunk.value for chunk in chunks])
+
+
+def build_transitions_relations(net):
+    """
+    Builds relations between transitions by their names (see build_relations_from_arcs)
+    """
+    adjacency = build_transitions_adjacency(net)
+    names = adjacency.names
+    consuming = {name: set(names[i] for i in adjacency.get_consuming(index)) for index, name in enumerate(names)}
+    concurrent = {name: set(names[i] for i in adjacency.get_concurrent(index)) for index, name in enumerate(names)}
+    return consuming, concurrent
@@ -0,0 +1,77 @@
+import collections
+import hashlib
+
+from snakes.nets import *   # noqa
+
+from config import IS_COMPILING_EXPRESSIONS
+from expressions_compiler import compile_net
+from ipc_utilities import WorkerCommand
+from net_structure import scan_arcs
+from pnml_loader import load_pnml
+
+
+def get_net_hash(pnml_string):
+    return hashlib.sha256(pnml_string.encode()).hexdigest()
+
+
+def load_net(pnml_string):
+    """
+    Loads the net in the worker, guards and arc expressions are compiled once per loading (see expressions_compiler)
+    """
+    net = load_pnml(pnml_string)
+    if IS_COMPILING_EXPRESSIONS:
+        compile_net(net)
+    return net
+
+
+class NetsCache:
+    """
+    Nets by content hash with LRU eviction, arcs of every net are scanned once, when they are needed first
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.nets = collections.OrderedDict()
+        self.arcs_scans = {}
+
+    def __contains__(self, net_hash):
+        return net_hash in self.nets
+
+    def __len__(self):
+        return len(self.nets)
+
+    def get(self, net_hash):
+        net = self.nets.get(net_hash)
+        if net is not None:
+            self.nets.move_to_end(net_hash)
+        return net
+
+    def put(self, net_hash, net):
+        self.nets[net_hash] = net
+        self.nets.move_to_end(net_hash)
+        while len(self.nets) > self.capacity:
+            evicted_hash, _ = self.nets.popitem(last=False)
+            self.arcs_scans.pop(evicted_hash, None)
+
+    def get_arcs_scan(self, net_hash):
+        """
+        Returns the scan of arcs of the cached net (see net_structure.scan_arcs)
+        """
+        arcs_scan = self.arcs_scans.get(net_hash)
+        if arcs_scan is None:
+            arcs_scan = self.arcs_scans[net_hash] = scan_arcs(self.nets[net_hash])
+        return arcs_scan
+
+
+def load_net_into_workers(workers_manager, use_net_function, net, pnml_string=None):
+    """
+    Makes every worker use the net (use_net_function of the algorithm, e.g. base_proposed_algorithm.use_net),
+    the net is sent only if some worker does not have it cached, returns the hash of the net
+    """
+    pnml_string = pnml_string or dumps(net)
+    # home workers are assigned per net by the algorithm, if affinity routing is used
+    workers_manager.affinity = {}
+    net_hash = get_net_hash(pnml_string)
+    if not all(workers_manager.broadcast(WorkerCommand(use_net_function, net_hash))):
+        workers_manager.broadcast(WorkerCommand(use_net_function, net_hash, pnml_string))
+    return net_hash
@@ -0,0 +1,237 @@
+import array
+import io
+import xml.etree.ElementTree as ElementTree
+
+from snakes.pnml import Tree
+
+from config import IS_STREAMING_PNML
+from net_structure import TransitionsAdjacency, build_relations_from_arcs, get_places_consumers
+
+from snakes.nets import *   # noqa
+
+# PNML of large nets is parsed incrementally: places, transitions and arcs are built as soon as their elements end
+# and the elements are removed from the document, so the whole DOM is never kept in memory
+
+NET_ELEMENTS = ("declare", "global", "place", "transition", "arc")
+
+
+class UnsupportedPnmlError(Exception):
+    """
+    PNML, which is not supported by the streaming loader (e.g. with SNAKES plugins), it is loaded by SNAKES instead
+    """
+
+
+def _open_source(source):
+    # PNML is given as a filename, an opened file or the PNML string itself
+    if hasattr(source, 'read') or not source.lstrip().startswith('<'):
+        return source
+    return io.StringIO(source)
+
+
+def iter_net_elements(source):
+    """
+    Yields net attributes (as the "net" element without children) and then elements of the net (and its pages)
+    in the document order, every element is removed from the document after it is processed
+    """
+    parents = []
+    for event, element in ElementTree.iterparse(_open_source(source), events=('start', 'end')):
+        if event == 'start':
+            if element.tag == "snakes":
+                raise UnsupportedPnmlError("PNML with SNAKES plugins is not supported by the streaming loader")
+            if element.tag == "net":
+                yield element
+            parents.append(element)
+            continue
+        parents.pop()
+        if element.tag in NET_ELEMENTS and parents and parents[-1].tag in ("net", "page"):
+            yield element
+            parents[-1].remove(element)
+
+
+def _element_to_tree(element, tag2obj):
+    # the same as Tree.from_dom of SNAKES, so objects are built by their own __pnmlload__
+    tree = Tree(element.tag, None, **element.attrib)
+    tree._tag2obj = tag2obj
+    if element.text:
+        tree.add_data(element.text)
+    for child in element:
+        tree.add_child(_element_to_tree(child, tag2obj))
+        if child.tail:
+            tree.add_data(child.tail)
+    return tree
+
+
+def _get_arc_label(arc_tree):
+    # labels of arcs are read as by PetriNet.__pnmlload__
+    if not arc_tree.has_child("inscription"):
+        return Value(dot)
+    inscription = arc_tree.child("inscription")
+    if not inscription.has_child("text"):
+        return inscription.child().to_obj()
+    weight = int(inscription.child("text").data)
+    if weight == 0:
+        return None
+    return Value(dot) if weight == 1 else MultiArc([Value(dot)] * weight)
+
+
+def load_net(source):
+    """
+    Loads the SNAKES net from PNML (filename, file or string) incrementally
+    """
+    # mapping of PNML tags to SNAKES classes is the one of the SNAKES loader
+    tag2obj = Tree.from_pnml("<pnml/>")._tag2obj
+    net = None
+    arcs = []
+    for element in iter_net_elements(source):
+        if element.tag == "net":
+            net = PetriNet(element.get("id"))
+            continue
+        tree = _element_to_tree(element, tag2obj)
+        if element.tag == "declare":
+            net.declare(tree.data)
+        elif element.tag == "global":
+            net.globals[tree["name"]] = tree.child().to_obj()
+        elif element.tag == "place":
+            net.add_place(tree.to_obj())
+        elif element.tag == "transition":
+            net.add_transition(tree.to_obj())
+        elif net.has_place(tree["source"]) and net.has_transition(tree["target"]):
+            label = _get_arc_label(tree)
+            if label is not None:
+                net.add_input(tree["source"], tree["target"], label)
+        elif net.has_transition(tree["source"]) and net.has_place(tree["target"]):
+            label = _get_arc_label(tree)
+            if label is not None:
+                net.add_output(tree["target"], tree["source"], label)
+        else:
+            # nodes of the arc are not loaded yet
+            arcs.append(tree)
+    for tree in arcs:
+        label = _get_arc_label(tree)
+        if label is None:
+            continue
+        if net.has_place(tree["source"]):
+            net.add_input(tree["source"], tree["target"], label)
+        else:
+            net.add_output(tree["target"], tree["source"], label)
+    return net
+
+
+def load_pnml(source, is_streaming=IS_STREAMING_PNML):
+    """
+    Loads the SNAKES net from PNML (filename, file or string) by the streaming loader, if streaming is on,
+    PNML not supported by it is loaded by SNAKES
+    """
+    if is_streaming:
+        try:
+            return load_net(source)
+        except UnsupportedPnmlError:
+            pass
+    source = _open_source(source)
+    if not hasattr(source, 'read'):
+        with open(source, 'r') as f:
+            return loads(f.read())
+    # the file may be partially read by the streaming loader
+    source.seek(0)
+    return loads(source.read())
+
+
+class CompactNet:
+    """
+    Place/transition net as arrays: tokens counts of places and weighted arcs of transitions in CSR form,
+    places of input arcs of the transition i are input_places[input_offsets[i]:input_offsets[i + 1]]
+    (weights are in input_weights at the same positions), output arcs are stored the same way
+    """
+
+    def __init__(self, name, places_names, tokens, transitions_names, input_arcs, output_arcs):
+        self.name = name
+        self.places_names = places_names
+        self.tokens = tokens
+        self.transitions_names = transitions_names
+        self.input_offsets, self.input_places, self.input_weights = self._to_csr(input_arcs)
+        self.output_offsets, self.output_places, self.output_weights = self._to_csr(output_arcs)
+
+    @staticmethod
+    def _to_csr(transitions_arcs):
+        offsets, places, weights = array.array('i', [0]), array.array('i'), array.array('i')
+        for arcs in transitions_arcs:
+            for place, weight in arcs:
+                places.append(place)
+                weights.append(weight)
+            offsets.append(len(places))
+        return offsets, places, weights
+
+    def get_input_places(self, index):
+        return self.input_places[self.input_offsets[index]:self.input_offsets[index + 1]]
+
+    def get_output_places(self, index):
+        return self.output_places[self.output_offsets[index]:self.output_offsets[index + 1]]
+
+    def to_adjacency(self):
+        """
+        Relations of transitions (see net_structure) built without the SNAKES net
+        """
+        input_places = [tuple(self.places_names[place] for place in self.get_input_places(index))
+                        for index in range(len(self.transitions_names))]
+        output_places = [tuple(self.places_names[place] for place in self.get_output_places(index))
+                         for index in range(len(self.transitions_names))]
+        chunk = build_relations_from_arcs(input_places, output_places, get_places_consumers(input_places), 0,
+                                          len(input_places))
+        return TransitionsAdjacency(self.transitions_names, input_places, [chunk])
+
+
+def _get_tokens_count(place_element):
+    count = 0
+    for item in place_element.iterfind("initialMarking/multiset/item"):
+        if item.find("value/token") is None:
+            raise ValueError(f"Place {place_element.get('id')} has colored tokens, compact net is for P/T nets only")
+        count += int(item.findtext("multiplicity", "1"))
+    return count
+
+
+def _get_arc_weight(arc_element):
+    inscription = arc_element.find("inscription")
+    if inscription is None:
+        return 1
+    if inscription.find("text") is not None:
+        return int(inscription.findtext("text"))
+    if inscription.find("value/token") is not None:
+        return 1
+    if inscription.find("multiarc") is not None and \
+            all(label.tag == "value" and label.find("token") is not None for label in inscription.find("multiarc")):
+        return len(inscription.find("multiarc"))
+    raise ValueError(f"Arc {arc_element.get('id')} is colored, compact net is for P/T nets only")
+
+
+def load_compact_net(source):
+    """
+    Loads the P/T net from PNML (filename, file or string) incrementally right into the compact arrays
+    """
+    name = None
+    places_indices = {}
+    tokens = array.array('i')
+    transitions_indices = {}
+    input_arcs = []
+    output_arcs = []
+    arcs = []
+    for element in iter_net_elements(source):
+        if element.tag == "net":
+            name = element.get("id")
+        elif element.tag == "place":
+            places_indices[element.get("id")] = len(places_indices)
+            tokens.append(_get_tokens_count(element))
+        elif element.tag == "transition":
+            transitions_indices[element.get("id")] = len(transitions_indices)
+            input_arcs.append([])
+            output_arcs.append([])
+        elif element.tag == "arc":
+            # arcs are added after all nodes, as they may precede their nodes
+            arcs.append((element.get("source"), element.get("target"), _get_arc_weight(element)))
+    for source_id, target_id, weight in arcs:
+        if weight == 0:
+            continue
+        if source_id in places_indices:
+            input_arcs[transitions_indices[target_id]].append((places_indices[source_id], weight))
+        else:
+            output_arcs[transitions_indices[source_id]].append((places_indices[target_id], weight))
+    return CompactNet(name, list(places_indices), tokens, list(transitions_indices), input_arcs, output_arcs)
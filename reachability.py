@@ -0,0 +1,346 @@
+import argparse
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import base_proposed_algorithm
+from base_proposed_algorithm import use_net, calculate_movement
+from benchmark_utilities.nets_generator import load_from_file
+from config import WORKERS_NUM, EXPLORATION_BATCH_SIZE, EXPLORATION_SPILL_THRESHOLD, REPORTED_DEADLOCKS_COUNT
+from ipc_utilities import WorkersManager, WorkerCommand, serialize_base_movements, deserialize_base_movements
+from logging_manager import logger
+from modes_finder import IndexedModesFinder
+from nets_cache import load_net_into_workers
+from net_structure import scan_arcs
+
+from snakes.nets import *   # noqa
+
+# State space is partitioned by hashes of markings: every worker owns markings with hash % workers == its index,
+# keeps their visited set and expands them. Coordinator routes successors to their owners, so there is no shared
+# visited set. Visited sets keep 64 bit hashes of markings only (hash compaction): a collision may cut off a part of
+# the state space, its probability is negligible for state spaces much smaller than 2 ** 32
+
+# visited set and structure of the net of the running exploration, they are kept in every worker process
+# until the exploration ends
+visited = set()
+structure = None
+
+
+def get_marking_hash(marking):
+    """
+    Hash of the marking independent of the order of places and tokens, equal in all processes
+    """
+    canonical = sorted((place, sorted(repr(token) for token in tokens)) for place, tokens in marking.items() if tokens)
+    return int.from_bytes(hashlib.blake2b(repr(canonical).encode(), digest_size=8).digest(), 'little')
+
+
+class ExplorationStructure:
+    """
+    Transitions of the net with input places, consumers and producers of places for successors calculation
+    """
+
+    def __init__(self, net):
+        self.net = net
+        names, self.input_places, output_places, self.places_consumers = scan_arcs(net)
+        self.transitions = [net.transition(name) for name in names]
+        self.places_producers = {}
+        for index, places in enumerate(output_places):
+            for place in places:
+                self.places_producers.setdefault(place, []).append(index)
+
+    def get_stubborn_set(self, marking, enabled):
+        """
+        Deadlock-preserving stubborn set, returns its enabled transitions. It is the closure of some enabled
+        transition: for the enabled transition transitions sharing its input places are added (they may disable it),
+        for the disabled one producers of its empty input place are added (nothing else can enable it),
+        producers of all its input places are added, if none of them is empty
+        """
+        stubborn = {min(enabled)}
+        stack = list(stubborn)
+        while stack:
+            index = stack.pop()
+            places = self.input_places[index]
+            if index in enabled:
+                related = [self.places_consumers[place] for place in places]
+            else:
+                empty_places = [place for place in places if not marking.get(place)]
+                related = [self.places_producers.get(place, ()) for place in (empty_places[:1] or places)]
+            for transitions_ids in related:
+                for related_index in transitions_ids:
+                    if related_index not in stubborn:
+                        stubborn.add(related_index)
+                        stack.append(related_index)
+        return sorted(index for index in stubborn if index in enabled)
+
+    def get_successors(self, marking, is_stubborn):
+        self.net.set_marking(marking)
+        enabled = {index for index, transition in enumerate(self.transitions)
+                   if next(IndexedModesFinder(transition).iter_modes(), None) is not None}
+        fired = self.get_stubborn_set(marking, enabled) if is_stubborn and enabled else sorted(enabled)
+        successors = []
+        for index in fired:
+            transition = self.transitions[index]
+            for mode in IndexedModesFinder(transition).iter_modes():
+                start_places, end_places = transition.flow(mode)
+                successors.append(marking - start_places + end_places)
+        return successors
+
+
+def reset_exploration():
+    global visited, structure
+    visited = set()
+    structure = ExplorationStructure(base_proposed_algorithm.net)
+    return True
+
+
+def clear_exploration():
+    # visited set and structure are released after the exploration, so warm workers do not keep them
+    global visited, structure
+    visited = set()
+    structure = None
+    return True
+
+
+def explore_markings(markings, is_stubborn):
+    """
+    Expands markings owned by the worker, which are not visited yet,
+    returns statistics of new states and successors with their hashes
+    """
+    new_states_count = 0
+    edges_count = 0
+    deadlocks = []
+    places_bounds = {}
+    successors = []
+    for marking_hash, marking_repr in markings:
+        if marking_hash in visited:
+            continue
+        visited.add(marking_hash)
+        new_states_count += 1
+        marking = eval(marking_repr)
+        for place, tokens in marking.items():
+            places_bounds[place] = max(places_bounds.get(place, 0), len(tokens))
+        marking_successors = structure.get_successors(marking, is_stubborn)
+        if not marking_successors:
+            deadlocks.append(marking_repr)
+        edges_count += len(marking_successors)
+        successors.extend((get_marking_hash(successor), repr(successor)) for successor in marking_successors)
+    return new_states_count, edges_count, deadlocks, places_bounds, successors
+
+
+class Frontier:
+    """
+    Markings waiting for expansion: FIFO for breadth-first and LIFO for depth-first exploration.
+    If spill directory is given, markings over the threshold are written to chunk files
+    and read back, when markings in memory are exhausted, the order is preserved
+    """
+
+    def __init__(self, is_depth_first=False, spill_directory=None, spill_threshold=EXPLORATION_SPILL_THRESHOLD):
+        self.is_depth_first = is_depth_first
+        self.spill_directory = spill_directory
+        self.spill_threshold = spill_threshold
+        self.markings = collections.deque()
+        # breadth-first: markings -> chunks -> tail, depth-first: chunks are below markings
+        self.chunks = collections.deque()
+        self.tail = []
+        self.spilled_count = 0
+
+    def __len__(self):
+        return len(self.markings) + len(self.tail) + self.spilled_count
+
+    def _spill(self, markings):
+        file_descriptor, filename = tempfile.mkstemp(suffix='.jsonl', dir=self.spill_directory)
+        with os.fdopen(file_descriptor, 'w') as f:
+            for marking in markings:
+                f.write(json.dumps(marking) + '\n')
+        self.chunks.append((filename, len(markings)))
+        self.spilled_count += len(markings)
+
+    def _load(self, filename, count):
+        with open(filename, 'r') as f:
+            markings = [tuple(json.loads(line)) for line in f]
+        os.remove(filename)
+        self.spilled_count -= count
+        return markings
+
+    def push(self, markings):
+        if self.spill_directory is None:
+            self.markings.extend(markings)
+        elif self.is_depth_first:
+            self.markings.extend(markings)
+            if len(self.markings) > self.spill_threshold:
+                bottom = [self.markings.popleft() for _ in range(len(self.markings) - self.spill_threshold // 2)]
+                self._spill(bottom)
+        elif not self.chunks and not self.tail and len(self.markings) + len(markings) <= self.spill_threshold:
+            self.markings.extend(markings)
+        else:
+            self.tail.extend(markings)
+            if len(self.tail) >= self.spill_threshold:
+                self._spill(self.tail)
+                self.tail = []
+
+    def pop(self, count):
+        if not self.markings:
+            if self.is_depth_first and self.chunks:
+                self.markings.extend(self._load(*self.chunks.pop()))
+            elif self.chunks:
+                self.markings.extend(self._load(*self.chunks.popleft()))
+            else:
+                self.markings.extend(self.tail)
+                self.tail = []
+        count = min(count, len(self.markings))
+        if self.is_depth_first:
+            return [self.markings.pop() for _ in range(count)]
+        return [self.markings.popleft() for _ in range(count)]
+
+    def clear(self):
+        for filename, _ in self.chunks:
+            os.remove(filename)
+        self.chunks.clear()
+        self.markings.clear()
+        self.tail = []
+        self.spilled_count = 0
+
+
+class ExplorationResult:
+    """
+    Statistics of the explored state space, deadlock freedom and bounds of places are proved
+    only if the exploration is complete (state limit is not reached)
+    With stubborn sets the reduced state space is explored: deadlocks are preserved, bounds may be lower
+    """
+
+    def __init__(self, states_count, edges_count, deadlocks_count, deadlocks, places_bounds, is_complete,
+                 exploration_time):
+        self.states_count = states_count
+        self.edges_count = edges_count
+        self.deadlocks_count = deadlocks_count
+        self.deadlocks = deadlocks
+        self.places_bounds = places_bounds
+        self.is_complete = is_complete
+        self.exploration_time = exploration_time
+
+    @property
+    def is_deadlock_free(self):
+        # a deadlock found before the limit is a deadlock anyway
+        if self.deadlocks_count:
+            return False
+        return True if self.is_complete else None
+
+    @property
+    def bound(self):
+        return max(self.places_bounds.values(), default=0) if self.is_complete else None
+
+    def __str__(self):
+        return (f"{self.states_count} states, {self.edges_count} edges in {self.exploration_time}s, "
+                f"{self.deadlocks_count} deadlocks, "
+                f"{'complete' if self.is_complete else 'incomplete (state limit reached)'}, "
+                f"bound {self.bound}")
+
+
+class ReachabilityExplorer:
+    """
+    Parallel exploration of markings reachable from the initial one, rounds are synchronous: every worker expands
+    a batch of its frontier, then successors are routed to the frontiers of their owners
+    """
+
+    def __init__(self, workers_manager, net, is_depth_first=False, is_stubborn=False, max_states=None,
+                 spill_directory=None, batch_size=EXPLORATION_BATCH_SIZE, spill_threshold=EXPLORATION_SPILL_THRESHOLD):
+        self.workers_manager = workers_manager
+        self.net = net
+        self.is_stubborn = is_stubborn
+        self.max_states = max_states
+        self.batch_size = batch_size
+        self.frontiers = [Frontier(is_depth_first, spill_directory, spill_threshold)
+                          for _ in range(len(workers_manager.procs_with_pipes))]
+
+        self.states_count = 0
+        self.edges_count = 0
+        self.deadlocks_count = 0
+        self.deadlocks = []
+        self.places_bounds = {place.name: 0 for place in net.place()}
+        self.rounds_count = 0
+
+    def _route(self, markings):
+        workers_count = len(self.frontiers)
+        routed = [[] for _ in range(workers_count)]
+        for marking_hash, marking_repr in markings:
+            routed[marking_hash % workers_count].append((marking_hash, marking_repr))
+        for frontier, frontier_markings in zip(self.frontiers, routed):
+            if frontier_markings:
+                frontier.push(frontier_markings)
+
+    def _process_results(self, results):
+        successors = {}
+        for new_states_count, edges_count, deadlocks, places_bounds, worker_successors in results:
+            self.states_count += new_states_count
+            self.edges_count += edges_count
+            self.deadlocks_count += len(deadlocks)
+            self.deadlocks.extend(deadlocks[:REPORTED_DEADLOCKS_COUNT - len(self.deadlocks)])
+            for place, bound in places_bounds.items():
+                self.places_bounds[place] = max(self.places_bounds.get(place, 0), bound)
+            # successors reached from many markings of the round are routed once
+            successors.update(worker_successors)
+        return successors.items()
+
+    def explore(self):
+        exploration_start = time.time()
+        load_net_into_workers(self.workers_manager, use_net, self.net)
+        self.workers_manager.broadcast(WorkerCommand(reset_exploration))
+        initial_marking = self.net.get_marking()
+        self._route([(get_marking_hash(initial_marking), repr(initial_marking))])
+        try:
+            while any(self.frontiers):
+                if self.max_states is not None and self.states_count >= self.max_states:
+                    break
+                batch_size = self.batch_size
+                if self.max_states is not None:
+                    # markings of the batch may be new, so the limit is not exceeded much
+                    batch_size = min(batch_size, -(-(self.max_states - self.states_count) // len(self.frontiers)))
+                batches = [frontier.pop(batch_size) for frontier in self.frontiers]
+                results = self.workers_manager.scatter([WorkerCommand(explore_markings, batch, self.is_stubborn)
+                                                        for batch in batches])
+                self._route(self._process_results(results))
+                self.rounds_count += 1
+            is_complete = not any(self.frontiers)
+        finally:
+            for frontier in self.frontiers:
+                frontier.clear()
+            self.workers_manager.broadcast(WorkerCommand(clear_exploration))
+        return ExplorationResult(self.states_count, self.edges_count, self.deadlocks_count, self.deadlocks,
+                                 self.places_bounds, is_complete, time.time() - exploration_start)
+
+
+def explore(workers_manager, net, is_depth_first=False, is_stubborn=False, max_states=None, spill_directory=None):
+    """
+    Explores reachable markings of the net on workers of the base algorithm (see ReachabilityExplorer)
+    """
+    return ReachabilityExplorer(workers_manager, net, is_depth_first, is_stubborn, max_states,
+                                spill_directory).explore()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reachability graph exploration")
+    parser.add_argument("filename", nargs="?", default="nets.pnml")
+    parser.add_argument("--dfs", action="store_true", help="depth-first order instead of breadth-first")
+    parser.add_argument("--stubborn", action="store_true", help="deadlock-preserving stubborn sets reduction")
+    parser.add_argument("--max-states", type=int, default=None)
+    parser.add_argument("--spill-directory", default=None, help="directory for frontier markings spilled to disk")
+    parser.add_argument("--workers", type=int, default=WORKERS_NUM)
+    args = parser.parse_args()
+
+    explored_net = load_from_file(args.filename)
+    workers_manager = WorkersManager(calculate_movement_fun=calculate_movement,
+                                     serialization_fun=serialize_base_movements,
+                                     deserialization_fun=deserialize_base_movements)
+    workers_manager.create_pool(args.workers)
+    try:
+        result = explore(workers_manager, explored_net, args.dfs, args.stubborn, args.max_states,
+                         args.spill_directory)
+        logger.info(result)
+        logger.info(f"Places bounds: {result.places_bounds}")
+        for deadlock in result.deadlocks:
+            logger.info(f"Deadlock: {deadlock}")
+    finally:
+        workers_manager.destroy_pool()
@@ -0,0 +1,196 @@
+import atexit
+
+import base_proposed_algorithm
+import multicase_workflow_algorithm
+import step_proposed_algorithm
+import timed_proposed_algorithm
+import workflow_proposed_algorithm
+from config import SIMULATION_TIMEOUT, WORKERS_NUM, CHECKPOINT_INTERVAL, MODE_SELECTION_POLICY, IS_CONSTRAINT_MONITOR, \
+    SAMPLER_INTERVAL, IS_SPECULATIVE, IS_AFFINITY_ROUTING, IS_REDUCING_NET, IS_PRUNING_DEAD_TRANSITIONS
+from ipc_utilities import WorkersManager, WorkerCommand, serialize_base_movements, deserialize_base_movements, \
+    serialize_workflow_movements, deserialize_workflow_movements
+from modes_finder import set_selection_policy
+
+# Warm workers pools shared by all simulations of the process, keyed by algorithm and amount of workers
+_workers_managers = {}
+
+
+def get_workers_manager(is_workflow, workers):
+    """
+    Returns warm workers pool, creating it on the first request only
+    """
+    key = (is_workflow, workers)
+    if key not in _workers_managers:
+        if is_workflow:
+            workers_manager = WorkersManager(
+                calculate_movement_fun=workflow_proposed_algorithm.calculate_movement_in_workflow_net,
+                serialization_fun=serialize_workflow_movements,
+                deserialization_fun=deserialize_workflow_movements)
+        else:
+            workers_manager = WorkersManager(calculate_movement_fun=base_proposed_algorithm.calculate_movement,
+                                             serialization_fun=serialize_base_movements,
+                                             deserialization_fun=deserialize_base_movements)
+        workers_manager.create_pool(workers)
+        _workers_managers[key] = workers_manager
+    return _workers_managers[key]
+
+
+def shutdown():
+    """
+    Terminates all warm workers pools, is called automatically at the interpreter exit
+    """
+    for workers_manager in _workers_managers.values():
+        workers_manager.destroy_pool()
+    _workers_managers.clear()
+
+
+atexit.register(shutdown)
+
+
+class SimulationResult:
+    """
+    Statistics of the finished simulation
+    """
+
+    def __init__(self, manager):
+        self.events_count = manager.events_count
+        self.events_distribution = dict(manager.events_distribution)
+        self.final_marking = manager.current_marking
+        # trace is kept by workflow simulation only
+        self.trace = getattr(manager, 'trace', None)
+        self.building_time = manager.simulation_start - manager.building_start
+        # build of handlers and relations only, it is a part of the building time
+        self.build_time = getattr(manager, 'build_time', None)
+        self.simulation_time = manager.get_simulation_time()
+        self.stop_reason = manager.stop_reason
+        # optimistic validation statistics, are not kept by step semantics
+        self.validations_by_versions = getattr(manager, 'validations_by_versions', None)
+        self.retries_count = getattr(manager, 'retries_count', None)
+        self.avoided_retries_count = getattr(manager, 'avoided_retries_count', None)
+        # speculation statistics, are kept by the base algorithm only
+        self.speculations_count = getattr(manager, 'speculations_count', None)
+        self.speculation_hits = getattr(manager, 'speculation_hits', None)
+        self.speculation_wasted = getattr(manager, 'speculation_wasted', None)
+        # simulated time statistics, are kept by timed simulation only
+        self.simulated_time = getattr(manager, 'simulated_time', None)
+        self.places_occupancy = manager.get_places_occupancy() if hasattr(manager, 'get_places_occupancy') else None
+        self.transitions_throughput = manager.get_transitions_throughput() \
+            if hasattr(manager, 'get_transitions_throughput') else None
+        # dead transitions and never marked places pruned before simulation (see structural_analysis)
+        self.pruning_report = getattr(manager, 'pruning_report', None)
+        # completion latencies of cases by case ids, are kept by multi-case simulation only
+        self.cases_latencies = manager.get_cases_latencies() if hasattr(manager, 'get_cases_latencies') else None
+
+    @property
+    def events_per_second(self):
+        return self.events_count / self.simulation_time
+
+    @property
+    def cases_per_second(self):
+        return len(self.cases_latencies) / self.simulation_time if self.cases_latencies is not None else None
+
+    def __str__(self):
+        return (f"{self.events_count} events in {self.simulation_time}s "
+                f"({self.events_per_second} events per second, {self.building_time}s building overhead), "
+                f"stopped by {self.stop_reason.name}")
+
+
+class Simulation:
+    """
+    Simulation of the Petri net (or the workflow net, if constraint formula is given) usable as a library.
+    Simulations are run one after another in the same process on the shared warm workers pool,
+    so process startup and imports are paid once per pool, not once per simulation.
+    Simulation is stopped by timeout (None for no timeout), deadlock, events budget or predicate on the marking.
+    If checkpoint path is given, marking, trace and handlers states are saved periodically and at the stop,
+    and with resume the simulation is continued from the saved checkpoint.
+    Mode selection is the policy of choosing the binding in colored nets (see modes_finder).
+    With step semantics sets of non-conflicting transitions are fired per round (not supported for workflow nets
+    and checkpoints)
+    With constraint monitor constraints of the workflow net are checked incrementally on the coordinator
+    If sampler output (file or "unix:<socket path>") is given, live samples are streamed there every sampler interval
+    If delays of transitions are given (see timed_proposed_algorithm.build_delays), the net is simulated
+    as the generalized stochastic Petri net until the simulated time limit (not supported for workflow nets,
+    step semantics, checkpoints and sampler)
+    With speculation idle workers calculate likely next movements ahead of time (regular Petri nets only)
+    With affinity routing calculations of transitions are routed to home workers of their clusters (see affinity)
+    With net reduction ordinary nets are reduced before simulation and fired macro transitions are expanded back
+    in the trace and statistics (see net_reduction, not supported for step semantics and timed simulation)
+    With pruning dead transitions and never marked places are removed before simulation and reported in the result
+    (see structural_analysis, not used by step semantics and timed simulation)
+    If the number of cases is given, cases of the workflow net are simulated concurrently, each with its own marking
+    and trace, arriving at once or one by one with the arrival interval (see multicase_workflow_algorithm,
+    stopped by completion of all cases, timeout or events budget only)
+    """
+
+    def __init__(self, net, formula=None, workers=WORKERS_NUM, timeout=SIMULATION_TIMEOUT, max_events=None,
+                 stop_predicate=None, checkpoint_path=None, checkpoint_interval=CHECKPOINT_INTERVAL, resume=False,
+                 mode_selection=MODE_SELECTION_POLICY, step_semantics=False,
+                 constraint_monitor=IS_CONSTRAINT_MONITOR, sampler_output=None, sampler_interval=SAMPLER_INTERVAL,
+                 delays=None, time_limit=None, speculative=IS_SPECULATIVE, affinity_routing=IS_AFFINITY_ROUTING,
+                 reduce_net=IS_REDUCING_NET, prune_dead=IS_PRUNING_DEAD_TRANSITIONS, cases=None,
+                 arrival_interval=None):
+        if step_semantics and (formula is not None or checkpoint_path is not None):
+            raise ValueError("Step semantics is supported for regular Petri nets without checkpoints only")
+        if delays is not None and (formula is not None or step_semantics or checkpoint_path is not None
+                                   or sampler_output is not None):
+            raise ValueError("Timed simulation is supported for regular Petri nets "
+                             "without checkpoints and sampler only")
+        if speculative and (formula is not None or step_semantics or delays is not None):
+            raise ValueError("Speculation is supported for regular Petri nets only")
+        if reduce_net and (step_semantics or delays is not None):
+            raise ValueError("Net reduction is not supported for step semantics and timed simulation")
+        if cases is not None and (step_semantics or delays is not None or speculative or reduce_net
+                                  or checkpoint_path is not None or stop_predicate is not None
+                                  or sampler_output is not None):
+            raise ValueError("Multi-case simulation is supported without step semantics, delays, speculation, "
+                             "net reduction, checkpoints, stop predicate and sampler only")
+        self.net = net
+        self.formula = formula
+        self.workers = workers
+        self.timeout = timeout
+        self.max_events = max_events
+        self.stop_predicate = stop_predicate
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        self.mode_selection = mode_selection
+        self.step_semantics = step_semantics
+        self.constraint_monitor = constraint_monitor
+        self.sampler_output = sampler_output
+        self.sampler_interval = sampler_interval
+        self.delays = delays
+        self.time_limit = time_limit
+        self.speculative = speculative
+        self.affinity_routing = affinity_routing
+        self.reduce_net = reduce_net
+        self.prune_dead = prune_dead
+        self.cases = cases
+        self.arrival_interval = arrival_interval
+
+    def run(self):
+        workers_manager = get_workers_manager(self.formula is not None or self.cases is not None, self.workers)
+        workers_manager.broadcast(WorkerCommand(set_selection_policy, self.mode_selection))
+        stop_kwargs = dict(timeout=self.timeout, max_events=self.max_events, stop_predicate=self.stop_predicate,
+                           checkpoint_path=self.checkpoint_path, checkpoint_interval=self.checkpoint_interval,
+                           resume=self.resume, sampler_output=self.sampler_output,
+                           sampler_interval=self.sampler_interval, is_affinity_routing=self.affinity_routing,
+                           is_reducing=self.reduce_net, is_pruning=self.prune_dead)
+        if self.cases is not None:
+            manager = multicase_workflow_algorithm.run_simulation(workers_manager, self.net, self.formula, self.cases,
+                                                                  self.timeout, self.max_events, self.arrival_interval,
+                                                                  is_pruning=self.prune_dead)
+        elif self.delays is not None:
+            manager = timed_proposed_algorithm.run_simulation(workers_manager, self.net, self.delays, self.timeout,
+                                                              self.max_events, self.time_limit, self.stop_predicate)
+        elif self.step_semantics:
+            manager = step_proposed_algorithm.run_simulation(workers_manager, self.net, self.timeout, self.max_events,
+                                                             self.stop_predicate, self.sampler_output,
+                                                             self.sampler_interval)
+        elif self.formula is None:
+            manager = base_proposed_algorithm.run_simulation(workers_manager, self.net,
+                                                             is_speculative=self.speculative, **stop_kwargs)
+        else:
+            manager = workflow_proposed_algorithm.run_simulation(workers_manager, self.net, self.formula,
+                                                                 is_constraint_monitor=self.constraint_monitor,
+                                                                 **stop_kwargs)
+        return SimulationResult(manager)
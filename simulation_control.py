@@ -0,0 +1,104 @@
+import enum
+import json
+import os
+
+import gevent
+
+from live_sampler import LiveSampler
+
+from snakes.nets import *   # noqa
+
+
+class StopReasons(enum.Enum):
+    TIMEOUT = 1
+    EVENTS_BUDGET = 2
+    # every handler is stale, nothing can be activated anymore
+    DEADLOCK = 3
+    PREDICATE = 4
+    # simulated time of timed nets is over
+    TIME_LIMIT = 5
+    # every case of the multi-case simulation is completed
+    CASES_COMPLETED = 6
+
+
+def save_checkpoint(manager, filename):
+    """
+    Saves marking, trace, handlers states and statistics of the simulation, file is replaced atomically,
+    so a crash during saving leaves the previous checkpoint intact
+    """
+    checkpoint = {
+        "marking": repr(manager.current_marking),
+        "trace": getattr(manager, 'trace', None),
+        "handlers_states": {handler.name: handler.state.name for handler in manager.transition_handlers},
+        "events_count": manager.events_count,
+        "events_distribution": dict(manager.events_distribution),
+        "simulation_time": manager.get_simulation_time(),
+        "net_hash": manager.net_hash,
+        "preprocessing": manager.preprocessing,
+    }
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_filename, filename)
+
+
+def load_checkpoint(filename):
+    with open(filename, 'r') as f:
+        checkpoint = json.load(f)
+    checkpoint["marking"] = eval(checkpoint["marking"])
+    return checkpoint
+
+
+def check_checkpoint(checkpoint, manager):
+    """
+    Raises ValueError, if the checkpoint was saved by the simulation of another net or with other pruning or reduction
+    settings, as its handlers states do not match transitions of the simulated net then
+    """
+    saved_preprocessing = checkpoint.get("preprocessing")
+    if saved_preprocessing != manager.preprocessing:
+        raise ValueError(f"Checkpoint was saved with preprocessing {saved_preprocessing}, "
+                         f"but the simulation uses {manager.preprocessing}")
+    if checkpoint.get("net_hash") != manager.net_hash:
+        raise ValueError("Checkpoint was saved by the simulation of another net")
+
+
+def _save_checkpoints_periodically(manager, filename, interval):
+    while True:
+        gevent.sleep(interval)
+        save_checkpoint(manager, filename)
+
+
+def run_until_stopped(manager, transition_handlers, timeout=None, checkpoint_path=None, checkpoint_interval=None,
+                      sampler_output=None, sampler_interval=None):
+    """
+    Runs the simulation until timeout, deadlock or stop condition of the manager (events budget, predicate),
+    the manager is stopped gracefully, with calculations in flight drained
+    If sampler output is given, live samples of the simulation are streamed there every sampler interval
+    """
+    # checkpoints coroutine is not in handlers group, otherwise the group would never become empty on deadlock
+    checkpoints_coroutine = None
+    if checkpoint_path is not None and checkpoint_interval is not None:
+        checkpoints_coroutine = gevent.spawn(_save_checkpoints_periodically, manager, checkpoint_path,
+                                             checkpoint_interval)
+    sampler = sampler_coroutine = None
+    if sampler_output is not None:
+        sampler = LiveSampler(manager, sampler_output, sampler_interval)
+        sampler_coroutine = sampler.start()
+    gevent_timeout = gevent.Timeout(timeout)
+    gevent_timeout.start()
+    try:
+        manager.startup(transition_handlers)
+    except gevent.Timeout as exc:
+        if exc is not gevent_timeout:
+            raise
+        manager.request_stop(StopReasons.TIMEOUT)
+    finally:
+        gevent_timeout.cancel()
+        if checkpoints_coroutine is not None:
+            checkpoints_coroutine.kill()
+        if sampler is not None:
+            sampler.stop(sampler_coroutine)
+    manager.drain()
+    if checkpoint_path is not None:
+        save_checkpoint(manager, checkpoint_path)
+    return manager
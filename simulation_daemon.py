@@ -0,0 +1,249 @@
+import ast
+import json
+import os
+import socket
+import sys
+
+import gevent.lock
+import gevent.server
+import gevent.socket
+
+import base_proposed_algorithm
+from config import DAEMON_SOCKET_PATH, DAEMON_NETS_CACHE_SIZE, WORKERS_NUM
+from ipc_utilities import WorkerCommand, AnnotatedMovement
+from logging_manager import logger
+from nets_cache import NetsCache, get_net_hash
+from simulation import Simulation, get_workers_manager
+
+from snakes.nets import *   # noqa
+
+
+def _is_call(node, name):
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name \
+        and len(node.args) == 1 and not node.keywords
+
+
+def _parse_token(node):
+    if isinstance(node, ast.Name) and node.id == "dot":
+        return dot
+    if isinstance(node, ast.Tuple):
+        return tuple(_parse_token(element) for element in node.elts)
+    # raises ValueError for anything, which is not a literal
+    return ast.literal_eval(node)
+
+
+def parse_marking(marking_repr):
+    """
+    Parses repr of the marking sent by the client without eval: tokens are literals, tuples of them or dot
+    """
+    node = ast.parse(marking_repr.strip(), mode='eval').body
+    if not _is_call(node, "Marking") or not isinstance(node.args[0], ast.Dict):
+        raise ValueError(f"Invalid marking {marking_repr!r}")
+    marking = Marking()
+    for place_node, tokens_node in zip(node.args[0].keys, node.args[0].values):
+        if place_node is None or not _is_call(tokens_node, "MultiSet") or not isinstance(tokens_node.args[0], ast.List):
+            raise ValueError(f"Invalid marking {marking_repr!r}")
+        tokens = MultiSet(_parse_token(token_node) for token_node in tokens_node.args[0].elts)
+        if tokens:
+            marking[str(ast.literal_eval(place_node))] = tokens
+    return marking
+
+
+class DaemonSession:
+    """
+    Session of one client connection. Nets loaded by the session are kept referenced by it,
+    so they are usable until the session is closed, even if they are evicted from the cache of the daemon
+    """
+
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self.nets = {}
+
+    def get_net(self, net_hash):
+        net = self.nets.get(net_hash) or self.daemon.nets.get(net_hash)
+        if net is None:
+            raise KeyError(f"Net {net_hash} is not loaded")
+        self.nets[net_hash] = net
+        return net
+
+    def use_net(self, net_hash):
+        """
+        Makes the cached net usable by the session, so the client does not send it
+        """
+        is_cached = net_hash in self.nets or net_hash in self.daemon.nets
+        if is_cached:
+            self.get_net(net_hash)
+        return {"cached": is_cached}
+
+    def load_net(self, pnml):
+        net_hash = get_net_hash(pnml)
+        if net_hash not in self.daemon.nets:
+            self.daemon.nets.put(net_hash, loads(pnml))
+        self.get_net(net_hash)
+        return {"net_hash": net_hash}
+
+    def calculate(self, net_hash, transition, marking):
+        net = self.get_net(net_hash)
+        workers_manager = get_workers_manager(False, self.daemon.workers)
+        # workers eval the marking, so the one of the client is parsed and sent as the repr of the parsed marking
+        command = WorkerCommand(base_proposed_algorithm.calculate_movement_of_cached_net, net_hash, repr(transition),
+                                repr(parse_marking(marking)))
+        movements = workers_manager.execute(command)
+        if movements is None:
+            # the net is not cached by the worker yet (or it was evicted), it is cached by all workers at once
+            workers_manager.broadcast(WorkerCommand(base_proposed_algorithm.cache_net, net_hash, dumps(net)))
+            movements = workers_manager.execute(command)
+        movements, = movements
+        return {"movement": list(movements[0]) if movements else None}
+
+    def simulate(self, net_hash, **options):
+        net = self.get_net(net_hash)
+        # simulations share the warm workers pools, so they are run one by one, calculations are not blocked
+        with self.daemon.simulation_lock:
+            result = Simulation(net, workers=self.daemon.workers, **options).run()
+        return {
+            "events_count": result.events_count,
+            "events_per_second": result.events_per_second,
+            "simulation_time": result.simulation_time,
+            "building_time": result.building_time,
+            "stop_reason": result.stop_reason.name,
+            "final_marking": repr(result.final_marking),
+            "trace": result.trace,
+        }
+
+    def handle(self, request):
+        commands = {
+            "use_net": self.use_net,
+            "load_net": self.load_net,
+            "calculate": self.calculate,
+            "simulate": self.simulate,
+        }
+        command = request.pop("command", None)
+        if command not in commands:
+            return {"ok": False, "error": f"Unknown command {command}"}
+        try:
+            response = commands[command](**request)
+        except Exception as exc:
+            return {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        response["ok"] = True
+        return response
+
+
+class SimulationDaemon:
+    """
+    Daemon with warm workers pools listening on the local Unix socket, so many short simulations of job runners
+    share already started processes and already loaded nets. Nets are cached by content hash (LRU) in the daemon
+    and in every worker. Every connection is a session, requests and responses are JSON lines:
+    {"command": "use_net" | "load_net" | "calculate" | "simulate", ...} -> {"ok": true, ...}
+    Clients are trusted: PNML of loaded nets contains expressions evaluated by SNAKES, so the socket is accessible
+    by the owner of the daemon only (0600 in the private directory), markings are parsed without eval
+    """
+
+    def __init__(self, socket_path=DAEMON_SOCKET_PATH, workers=WORKERS_NUM, nets_cache_size=DAEMON_NETS_CACHE_SIZE):
+        self.socket_path = socket_path
+        self.workers = workers
+        self.nets = NetsCache(nets_cache_size)
+        self.simulation_lock = gevent.lock.Semaphore()
+        self.server = None
+
+    def _handle_connection(self, connection, address):
+        session = DaemonSession(self)
+        reader = connection.makefile('r')
+        writer = connection.makefile('w')
+        try:
+            for line in reader:
+                if not line.strip():
+                    continue
+                try:
+                    response = session.handle(json.loads(line))
+                except ValueError as exc:
+                    response = {"ok": False, "error": f"Invalid request: {exc}"}
+                writer.write(json.dumps(response) + '\n')
+                writer.flush()
+        finally:
+            reader.close()
+            writer.close()
+            connection.close()
+
+    def start(self):
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if os.stat(directory).st_uid != os.getuid():
+            raise PermissionError(f"Directory {directory} of the socket is owned by another user")
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        listener = gevent.socket.socket(gevent.socket.AF_UNIX, gevent.socket.SOCK_STREAM)
+        # the socket is created with 0600, so it is not accessible by other users even for a moment
+        previous_umask = os.umask(0o177)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(previous_umask)
+        listener.listen()
+        self.server = gevent.server.StreamServer(listener, self._handle_connection)
+        self.server.start()
+        logger.info(f"Simulation daemon is listening on {self.socket_path}")
+
+    def serve_forever(self):
+        if self.server is None:
+            self.start()
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.stop()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class DaemonClient:
+    """
+    Client of the simulation daemon, uses blocking sockets, so job runners do not depend on gevent
+    """
+
+    def __init__(self, socket_path=DAEMON_SOCKET_PATH):
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(socket_path)
+        self.reader = self.connection.makefile('r')
+        self.writer = self.connection.makefile('w')
+
+    def _request(self, command, **kwargs):
+        self.writer.write(json.dumps(dict(command=command, **kwargs)) + '\n')
+        self.writer.flush()
+        response = json.loads(self.reader.readline())
+        if not response.pop("ok"):
+            raise RuntimeError(response["error"])
+        return response
+
+    def load_net(self, net):
+        """
+        Loads the net into the session, the net is sent only if the daemon does not have it cached
+        """
+        pnml = dumps(net)
+        net_hash = get_net_hash(pnml)
+        if self._request("use_net", net_hash=net_hash)["cached"]:
+            return net_hash
+        return self._request("load_net", pnml=pnml)["net_hash"]
+
+    def calculate(self, net_hash, transition_name, marking):
+        movement = self._request("calculate", net_hash=net_hash, transition=transition_name,
+                                 marking=repr(marking))["movement"]
+        return AnnotatedMovement(eval(movement[0]), eval(movement[1])) if movement is not None else None
+
+    def simulate(self, net_hash, **options):
+        """
+        Runs the simulation of the loaded net, options are the ones of the Simulation (formula, timeout, etc.)
+        """
+        return self._request("simulate", net_hash=net_hash, **options)
+
+    def close(self):
+        self.reader.close()
+        self.writer.close()
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    daemon = SimulationDaemon(sys.argv[1] if len(sys.argv) > 1 else DAEMON_SOCKET_PATH)
+    try:
+        daemon.serve_forever()
+    finally:
+        daemon.stop()
@@ -0,0 +1,186 @@
+import collections
+import time
+
+import gevent
+import numpy.random as random
+
+from base_proposed_algorithm import use_net, calculate_movement
+from benchmark_utilities.nets_generator import load_from_file
+from config import SIMULATION_TIMEOUT, WORKERS_NUM, IS_BENCHMARKING, SAMPLER_INTERVAL
+from ipc_utilities import AnnotatedMovement, request_base_movement_calculation, WorkersManager, \
+    serialize_base_movements, deserialize_base_movements
+from live_sampler import LiveSampler
+from logging_manager import logger
+from nets_cache import load_net_into_workers
+from net_structure import build_transitions_relations
+from simulation_control import StopReasons
+
+from snakes.nets import *   # noqa
+
+
+class StepSimulationManager:
+    """
+    Simulation manager with step semantics: every round movements of possibly enabled transitions are calculated
+    in parallel on workers, then a maximal set of non-conflicting ones is fired with one atomic marking update
+    """
+
+    def __init__(self, calculation_manager, net_, max_events=None, stop_predicate=None):
+        self.net = net_
+        self.current_marking = net_.get_marking()
+        self.calculation_manager = calculation_manager
+
+        self.concurrent_transitions = {}
+        self.affected_transitions = {}
+        # movements of enabled transitions, which input places were not changed since calculation
+        self.enabled_movements = {}
+
+        self.max_events = max_events
+        self.stop_predicate = stop_predicate
+        self.stop_reason = None
+
+        # Statistics info
+        self.events_count = 0
+        self.rounds_count = 0
+        self.events_distribution = collections.defaultdict(int)
+        self.building_start = time.time()
+        self.simulation_start = None
+        self.simulation_end = None
+
+    def build(self):
+        consuming, concurrent = build_transitions_relations(self.net)
+        self.concurrent_transitions = concurrent
+        # transitions, which input places are changed by the firing of the transition
+        self.affected_transitions = {name: consuming[name] | concurrent[name] for name in consuming}
+        return list(consuming.keys())
+
+    def _calculate_movements(self, transitions_names):
+        """
+        Calculates movements of the transitions on the current marking in parallel on workers
+        """
+        transitions_names = list(transitions_names)
+        marking = self.current_marking
+        calculations = [gevent.spawn(request_base_movement_calculation, self.calculation_manager, name, marking)
+                        for name in transitions_names]
+        gevent.joinall(calculations)
+        for transition_name, calculation in zip(transitions_names, calculations):
+            movement: AnnotatedMovement = calculation.value
+            if movement is None:
+                self.enabled_movements.pop(transition_name, None)
+            else:
+                self.enabled_movements[transition_name] = movement
+
+    def _select_step(self):
+        """
+        Selects maximal set of enabled transitions with disjoint presets, transitions sharing input places
+        are added only if the remaining marking is sufficient for them
+        """
+        candidates = list(self.enabled_movements.keys())
+        random.shuffle(candidates)
+        step = []
+        selected = set()
+        remaining_marking = self.current_marking
+        for transition_name in candidates:
+            movement = self.enabled_movements[transition_name]
+            if selected.isdisjoint(self.concurrent_transitions[transition_name]):
+                is_available = True
+            else:
+                is_available = movement.start_places <= remaining_marking
+            if is_available:
+                step.append(transition_name)
+                selected.add(transition_name)
+                remaining_marking = remaining_marking - movement.start_places
+        return step
+
+    def _perform_step(self, step):
+        consumed = Marking()
+        produced = Marking()
+        for transition_name in step:
+            movement = self.enabled_movements[transition_name]
+            consumed = consumed + movement.start_places
+            produced = produced + movement.end_places
+            self.events_distribution[transition_name] += 1
+        # all movements of the step are applied atomically
+        self.current_marking = self.current_marking - consumed + produced
+        self.events_count += len(step)
+        self.rounds_count += 1
+
+    def _is_stopped(self, timeout):
+        if timeout is not None and time.time() - self.simulation_start >= timeout:
+            self.stop_reason = StopReasons.TIMEOUT
+        elif self.max_events is not None and self.events_count >= self.max_events:
+            self.stop_reason = StopReasons.EVENTS_BUDGET
+        elif self.stop_predicate is not None and self.stop_predicate(self.current_marking):
+            self.stop_reason = StopReasons.PREDICATE
+        return self.stop_reason is not None
+
+    def startup(self, transitions_names, timeout=None):
+        # stop conditions are checked between rounds, round itself is not interrupted
+        self.simulation_start = time.time()
+        transitions_to_calculate = set(transitions_names)
+        while not self._is_stopped(timeout):
+            self._calculate_movements(transitions_to_calculate)
+            step = self._select_step()
+            if not step:
+                self.stop_reason = StopReasons.DEADLOCK
+                break
+            self._perform_step(step)
+
+            transitions_to_calculate = set()
+            for transition_name in step:
+                transitions_to_calculate |= self.affected_transitions[transition_name]
+            for transition_name in transitions_to_calculate:
+                # movements calculated on the changed input places are outdated
+                self.enabled_movements.pop(transition_name, None)
+        self.simulation_end = time.time()
+
+    def get_simulation_time(self):
+        return (self.simulation_end or time.time()) - self.simulation_start
+
+    def print_stats(self):
+        simulation_time = self.get_simulation_time()
+        building_time = self.simulation_start - self.building_start
+        logger.info(f"{building_time}s building overhead, "
+                    f"{self.events_count} / {simulation_time} = {self.events_count / simulation_time} events per second, "
+                    f"{self.events_count / max(self.rounds_count, 1)} events per step")
+        logger.info(f"Transition handlers distribution: {self.events_distribution}")
+
+    def print_stats_for_benchmarks(self):
+        simulation_time = self.get_simulation_time()
+        logger.info(f"{self.events_count / simulation_time}")
+        return self.events_count / simulation_time
+
+
+def run_simulation(workers_manager_, net_, timeout=None, max_events=None, stop_predicate=None, sampler_output=None,
+                   sampler_interval=SAMPLER_INTERVAL):
+    """
+    Runs one simulation of the net with step semantics on the (possibly warm) workers of the base algorithm
+    """
+    load_net_into_workers(workers_manager_, use_net, net_)
+    manager = StepSimulationManager(workers_manager_, net_, max_events, stop_predicate)
+    transitions_names = manager.build()
+    sampler = sampler_coroutine = None
+    if sampler_output is not None:
+        sampler = LiveSampler(manager, sampler_output, sampler_interval)
+        sampler_coroutine = sampler.start()
+    try:
+        manager.startup(transitions_names, timeout)
+    finally:
+        if sampler is not None:
+            sampler.stop(sampler_coroutine)
+    return manager
+
+
+if __name__ == "__main__":
+    simulated_net = load_from_file('nets.pnml')
+    workers_manager = WorkersManager(calculate_movement_fun=calculate_movement,
+                                     serialization_fun=serialize_base_movements,
+                                     deserialization_fun=deserialize_base_movements)
+    workers_manager.create_pool(WORKERS_NUM)
+    try:
+        manager = run_simulation(workers_manager, simulated_net, SIMULATION_TIMEOUT)
+        if IS_BENCHMARKING:
+            manager.print_stats_for_benchmarks()
+        else:
+            manager.print_stats()
+    finally:
+        workers_manager.destroy_pool()
@@ -0,0 +1,220 @@
+from config import MINIMAL_SIPHONS_MAX_PLACES
+from constraints_evaluation import AND_OPERATION, OR_OPERATION, PRECEDES, constraint_parser, flatten_constraint_tree
+from logging_manager import logger
+
+from snakes.nets import *   # noqa
+
+# Transitions, which can never fire, are found before simulation, so they get no handlers and are never calculated:
+# places, which can ever get tokens, are found by the fixpoint from initially marked places through transitions
+# with all required input places markable, other places form the maximal unmarked siphon (every producer of its
+# place consumes from it, so it stays empty forever) and their consumers are dead.
+# Inhibitor and flush arcs do not require tokens, so their places are not required for the firing
+
+
+class PruningReport:
+    """
+    Dead transitions and never marked places of the net, minimal unmarked siphons (connected parts of the maximal
+    unmarked siphon too large for the search of minimal ones are reported as they are) and transitions, which are
+    never allowed by the constraint formula
+    """
+
+    def __init__(self, net_name, dead_transitions, unmarked_places, siphons, never_allowed_transitions):
+        self.net_name = net_name
+        self.dead_transitions = dead_transitions
+        self.unmarked_places = unmarked_places
+        self.siphons = siphons
+        self.never_allowed_transitions = never_allowed_transitions
+
+    def __str__(self):
+        return (f"Net {self.net_name}: {len(self.dead_transitions)} dead transitions {self.dead_transitions}, "
+                f"{len(self.unmarked_places)} never marked places in {len(self.siphons)} unmarked siphons "
+                f"{self.siphons}, "
+                f"never allowed by constraints: {self.never_allowed_transitions}")
+
+
+def scan_requirements(net):
+    """
+    Places required for the firing of every transition (with tokens on input arcs), output places of every transition
+    and initially marked places
+    """
+    required_places = {}
+    output_places = {}
+    for transition in net.transition():
+        required_places[transition.name] = {place.name for place, label in transition.input()
+                                            if not isinstance(label, (Inhibitor, Flush))}
+        output_places[transition.name] = set(transition.post)
+    marked_places = {place.name for place in net.place() if place.tokens}
+    return required_places, output_places, marked_places
+
+
+def get_markable_places(required_places, output_places, marked_places):
+    """
+    Returns places, which can get tokens, and transitions, which can fire, in time linear in the number of arcs
+    """
+    missing_counts = {transition_name: len(places) for transition_name, places in required_places.items()}
+    consumers = {}
+    for transition_name, places in required_places.items():
+        for place in places:
+            consumers.setdefault(place, []).append(transition_name)
+    markable_places = set(marked_places)
+    places_queue = list(marked_places)
+    alive_transitions = set()
+    transitions_queue = [transition_name for transition_name, count in missing_counts.items() if count == 0]
+    while places_queue or transitions_queue:
+        while transitions_queue:
+            transition_name = transitions_queue.pop()
+            alive_transitions.add(transition_name)
+            for place in output_places[transition_name]:
+                if place not in markable_places:
+                    markable_places.add(place)
+                    places_queue.append(place)
+        if places_queue:
+            for transition_name in consumers.get(places_queue.pop(), ()):
+                missing_counts[transition_name] -= 1
+                if missing_counts[transition_name] == 0:
+                    transitions_queue.append(transition_name)
+    return markable_places, alive_transitions
+
+
+def get_maximal_siphon(places, producers, required_places):
+    # the largest siphon inside places: places with a producer not consuming from the rest are removed until fixpoint
+    siphon = set(places)
+    is_changed = True
+    while is_changed:
+        is_changed = False
+        for place in list(siphon):
+            if any(not required_places[transition_name] & siphon for transition_name in producers.get(place, ())):
+                siphon.discard(place)
+                is_changed = True
+    return siphon
+
+
+def get_minimal_siphons(siphon, producers, required_places, max_places=MINIMAL_SIPHONS_MAX_PLACES):
+    """
+    Splits the unmarked siphon into connected parts (each is a siphon) and finds minimal siphons inside parts
+    not larger than max places by removing places one by one, while the rest keeps a siphon with the seed place
+    """
+    # places of the siphon are connected, if one of them is consumed by a producer of the other
+    neighbours = {place: set() for place in siphon}
+    for place in siphon:
+        for transition_name in producers.get(place, ()):
+            for required_place in required_places[transition_name] & neighbours.keys():
+                neighbours[place].add(required_place)
+                neighbours[required_place].add(place)
+    parts = []
+    unvisited = set(siphon)
+    while unvisited:
+        part = {unvisited.pop()}
+        places_stack = list(part)
+        while places_stack:
+            for neighbour in neighbours[places_stack.pop()] & unvisited:
+                unvisited.discard(neighbour)
+                part.add(neighbour)
+                places_stack.append(neighbour)
+        parts.append(part)
+
+    siphons = []
+    for part in parts:
+        if len(part) > max_places:
+            siphons.append(part)
+            continue
+        part_siphons = set()
+        for seed in sorted(part):
+            seed_siphon = set(part)
+            for place in sorted(part - {seed}):
+                if place in seed_siphon:
+                    candidate = get_maximal_siphon(seed_siphon - {place}, producers, required_places)
+                    if seed in candidate:
+                        seed_siphon = candidate
+            part_siphons.add(frozenset(seed_siphon))
+        # the smallest siphon with the seed may contain a smaller siphon without it
+        siphons.extend(part_siphon for part_siphon in part_siphons
+                       if not any(other_siphon < part_siphon for other_siphon in part_siphons))
+    return sorted(sorted(siphon) for siphon in siphons)
+
+
+def get_never_allowed_transitions(constraint_formula, dead_transitions):
+    """
+    Alive transitions of the formula, for which the formula is false for every trace without dead transitions
+    (three-valued evaluation: atoms with alive preceding transitions are unknown)
+    """
+    root = flatten_constraint_tree(constraint_parser.parse(constraint_formula))
+    if root is None:
+        return []
+    constrained_transitions = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node[0] in (AND_OPERATION, OR_OPERATION):
+            stack.extend(node[1])
+        else:
+            constrained_transitions.add(node[2])
+
+    never_allowed_transitions = []
+    for transition_name in sorted(constrained_transitions - set(dead_transitions)):
+        # post-order evaluation, values are True, False or None (unknown)
+        values = {}
+        stack = [(root, False)]
+        while stack:
+            node, is_visited = stack.pop()
+            if node[0] not in (AND_OPERATION, OR_OPERATION):
+                kind, preceding, succeeding = node
+                if succeeding != transition_name:
+                    values[id(node)] = True
+                elif preceding in dead_transitions:
+                    values[id(node)] = kind != PRECEDES
+                else:
+                    values[id(node)] = None
+            elif not is_visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node[1])
+            else:
+                children_values = [values.pop(id(child)) for child in node[1]]
+                decisive_value = node[0] != AND_OPERATION
+                if decisive_value in children_values:
+                    values[id(node)] = decisive_value
+                elif None in children_values:
+                    values[id(node)] = None
+                else:
+                    values[id(node)] = not decisive_value
+        if values[id(root)] is False:
+            never_allowed_transitions.append(transition_name)
+    return never_allowed_transitions
+
+
+def analyze_net(net, constraint_formula=None):
+    """
+    Finds dead transitions, never marked places with their siphons and transitions never allowed by the formula
+    """
+    required_places, output_places, marked_places = scan_requirements(net)
+    markable_places, alive_transitions = get_markable_places(required_places, output_places, marked_places)
+    dead_transitions = sorted(set(required_places) - alive_transitions)
+    unmarked_places = sorted({place.name for place in net.place()} - markable_places)
+    producers = {}
+    for transition_name, places in output_places.items():
+        for place in places:
+            producers.setdefault(place, []).append(transition_name)
+    siphons = get_minimal_siphons(unmarked_places, producers, required_places)
+    never_allowed_transitions = get_never_allowed_transitions(constraint_formula, set(dead_transitions)) \
+        if constraint_formula else []
+    return PruningReport(net.name, dead_transitions, unmarked_places, siphons, never_allowed_transitions)
+
+
+def prune_net(net, constraint_formula=None):
+    """
+    Returns the copy of the net without dead transitions and never marked places (or the net itself, if nothing
+    is pruned) and the report of the analysis
+    """
+    report = analyze_net(net, constraint_formula)
+    if report.never_allowed_transitions:
+        logger.warning(f"Transitions never allowed by constraints: {report.never_allowed_transitions}")
+    if not report.dead_transitions and not report.unmarked_places:
+        return net, report
+    logger.info(f"Pruned {report}")
+    pruned_net = net.copy()
+    for transition_name in report.dead_transitions:
+        pruned_net.remove_transition(transition_name)
+    # producers of never marked places are dead, so the places are not connected to transitions anymore
+    for place in report.unmarked_places:
+        pruned_net.remove_place(place)
+    return pruned_net, report
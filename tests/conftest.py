@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+from snakes.nets import PetriNet, Place, Transition, Value, dot
+
+# modules of the project are in the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# logs and benchmark data are written relative to the working directory (see config), so tests run in a temporary one
+os.chdir(tempfile.mkdtemp(prefix="simulation_tests_"))
+os.makedirs("benchs/data")
+
+
+def build_net(name, transitions, marking):
+    """
+    Ordinary net by transitions given as (name, input places, output places) and tokens counts of marked places
+    """
+    net = PetriNet(name)
+    places = dict.fromkeys(marking)
+    for _, input_places, output_places in transitions:
+        places.update(dict.fromkeys(input_places + output_places))
+    for place in places:
+        net.add_place(Place(place, [dot] * marking.get(place, 0)))
+    for transition_name, input_places, output_places in transitions:
+        net.add_transition(Transition(transition_name))
+        for place in input_places:
+            net.add_input(place, transition_name, Value(dot))
+        for place in output_places:
+            net.add_output(place, transition_name, Value(dot))
+    return net
+
+
+def build_cycle_net(names=("a", "b"), is_dead=True):
+    # transitions cycle the token between two places, dead consumes from the place, which is never marked
+    first, second = names
+    transitions = [(first, ["p0"], ["p1"]), (second, ["p1"], ["p0"])]
+    if is_dead:
+        transitions.append(("dead", ["never_marked"], ["p1"]))
+    return build_net("cycle", transitions, {"p0": 1})
+
+
+def build_workflow_net():
+    # register, then check or skip, then pay, dead consumes from the place, which is never marked
+    return build_net("workflow", [("register", ["start"], ["registered"]), ("check", ["registered"], ["checked"]),
+                                  ("skip", ["registered"], ["checked"]), ("pay", ["checked"], ["end"]),
+                                  ("dead", ["never_marked"], ["registered"])], {"start": 1})
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from benchmark_utilities.constraint_generator import generate_formula
+from constraint_monitor import ConstraintMonitor
+from constraints_evaluation import CheckActivationValidity, constraint_parser
+
+# few names, so atoms of random formulas share transitions and the monitor changes often
+TRANSITIONS_NAMES = [f"t{i}" for i in range(4)]
+# transitions named in formulas, which are absent in the net, never fire
+MISSING_NAMES = ["m0"]
+
+
+def is_valid(tree, trace, transition_name):
+    return CheckActivationValidity(set(trace), transition_name).transform(tree)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_monitor_agrees_with_transformer(seed):
+    random.seed(seed)
+    formula = generate_formula(TRANSITIONS_NAMES + MISSING_NAMES, random.choice([2, 4, 6, 10]))
+    tree = constraint_parser.parse(formula)
+    monitor = ConstraintMonitor(formula, TRANSITIONS_NAMES)
+    trace = []
+    for _ in range(10):
+        allowed = {name for name in TRANSITIONS_NAMES if is_valid(tree, trace, name)}
+        assert {name for name in TRANSITIONS_NAMES if monitor.is_allowed(name)} == allowed, formula
+        transition_name = random.choice(TRANSITIONS_NAMES + MISSING_NAMES)
+        newly_allowed, newly_forbidden = monitor.fire(transition_name)
+        if transition_name in TRANSITIONS_NAMES:
+            trace.append(transition_name)
+        now_allowed = {name for name in TRANSITIONS_NAMES if is_valid(tree, trace, name)}
+        assert set(newly_allowed) == now_allowed - allowed, formula
+        assert set(newly_forbidden) == allowed - now_allowed, formula
+
+    restored_monitor = ConstraintMonitor(formula, TRANSITIONS_NAMES)
+    restored_monitor.restore(trace)
+    assert restored_monitor.forbidden == monitor.forbidden
@@ -0,0 +1,65 @@
+from expressions_compiler import compile_net
+from modes_finder import IndexedModesFinder
+
+from snakes.nets import PetriNet, Place, Transition, Value, Variable, Expression, Tuple, MultiArc, tInteger
+
+
+def build_colored_net():
+    net = PetriNet("colored")
+    net.globals["limit"] = 3
+    net.add_place(Place("numbers", [0, 1, 2, 3, 4]))
+    net.add_place(Place("pairs", [(1, "a"), (2, "b"), (3, "c"), (4, "d")]))
+    net.add_place(Place("integers", [], tInteger))
+    net.add_place(Place("out"))
+
+    # tuple arc joined with the variable arc, guard with the global
+    net.add_transition(Transition("join", Expression("x < limit")))
+    net.add_input("numbers", "join", Variable("x"))
+    net.add_input("pairs", "join", Tuple([Variable("x"), Variable("y")]))
+    net.add_output("out", "join", Expression("(x, y)"))
+
+    # multi-arc of two variables, typed output place allows only integers
+    net.add_transition(Transition("multi", Expression("x != z")))
+    net.add_input("numbers", "multi", MultiArc([Variable("x"), Variable("z")]))
+    net.add_output("integers", "multi", Expression("x + z if x < 2 else str(x)"))
+
+    # variable shadows the global of the net
+    net.add_transition(Transition("shadowing", Expression("limit > 1")))
+    net.add_input("numbers", "shadowing", Variable("limit"))
+    net.add_output("out", "shadowing", Expression("limit * 2"))
+
+    # guard raising for one of bindings
+    net.add_transition(Transition("raising", Expression("1 / (x - 2) > 0")))
+    net.add_input("numbers", "raising", Variable("x"))
+    net.add_output("out", "raising", Value(0))
+    return net
+
+
+def get_outcome(function):
+    try:
+        return function()
+    except Exception as error:
+        return type(error)
+
+
+def get_transition_outcomes(transition):
+    modes = get_outcome(lambda: sorted(str(mode) for mode in transition.modes()))
+    indexed_modes = get_outcome(lambda: sorted(str(mode) for mode in IndexedModesFinder(transition).iter_modes()))
+    flows = None
+    if isinstance(modes, list):
+        flows = sorted(str(transition.flow(mode)) for mode in transition.modes())
+    return modes, indexed_modes, flows
+
+
+def test_compiled_net_has_the_same_modes_and_flows():
+    generic_net = build_colored_net()
+    compiled_net = build_colored_net()
+    assert compile_net(compiled_net) > 0
+    for transition in generic_net.transition():
+        generic_outcomes = get_transition_outcomes(transition)
+        compiled_outcomes = get_transition_outcomes(compiled_net.transition(transition.name))
+        assert generic_outcomes == compiled_outcomes, transition.name
+    # bindings are found for every transition, except the raising one
+    assert get_transition_outcomes(compiled_net.transition("raising"))[0] is ZeroDivisionError
+    for transition_name in ("join", "multi", "shadowing"):
+        assert get_transition_outcomes(compiled_net.transition(transition_name))[0]
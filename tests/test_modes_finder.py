@@ -0,0 +1,29 @@
+from modes_finder import IndexedModesFinder
+
+from snakes.nets import PetriNet, Place, Transition, Variable, Expression, Tuple
+
+from conftest import build_net
+
+
+def get_modes(transition):
+    return sorted(str(mode) for mode in IndexedModesFinder(transition).iter_modes())
+
+
+def test_source_transition_has_no_modes():
+    transition = build_net("source", [("source", [], ["p"])], {}).transition("source")
+    assert transition.modes() == []
+    assert get_modes(transition) == []
+
+
+def test_modes_are_the_same_as_snakes_modes():
+    net = PetriNet("colored")
+    net.add_place(Place("numbers", [1, 2, 3, 4]))
+    net.add_place(Place("pairs", [(1, "a"), (2, "b"), (4, "c")]))
+    net.add_place(Place("out"))
+    net.add_transition(Transition("join", Expression("x != 4")))
+    net.add_input("numbers", "join", Variable("x"))
+    net.add_input("pairs", "join", Tuple([Variable("x"), Variable("y")]))
+    net.add_output("out", "join", Variable("y"))
+    transition = net.transition("join")
+    assert get_modes(transition) == sorted(str(mode) for mode in transition.modes())
+    assert len(get_modes(transition)) == 2
@@ -0,0 +1,32 @@
+import pytest
+
+from simulation import Simulation
+from simulation_control import StopReasons
+
+from conftest import build_workflow_net
+
+CASES_AMOUNT = 20
+
+
+@pytest.mark.parametrize("formula", [None, "check ◁ pay"])
+def test_every_case_is_completed(formula):
+    result = Simulation(build_workflow_net(), formula, workers=1, cases=CASES_AMOUNT).run()
+    assert result.stop_reason == StopReasons.CASES_COMPLETED
+    assert sorted(result.cases_latencies) == list(range(CASES_AMOUNT))
+    assert all(latency >= 0 for latency in result.cases_latencies.values())
+    assert result.events_distribution["register"] == CASES_AMOUNT
+    if formula is None:
+        assert result.events_count == 3 * CASES_AMOUNT
+    else:
+        # cases, which skipped the check, are not allowed to pay
+        assert result.events_distribution.get("pay", 0) == result.events_distribution.get("check", 0)
+
+
+def test_formula_naming_dead_transition():
+    # firings of register possibly enable dead, which is pruned before simulation
+    result = Simulation(build_workflow_net(), "(register ◁ dead) ∧ (register ◁ pay)", workers=1,
+                        cases=CASES_AMOUNT, prune_dead=True).run()
+    assert result.pruning_report.dead_transitions == ["dead"]
+    assert result.stop_reason == StopReasons.CASES_COMPLETED
+    assert len(result.cases_latencies) == CASES_AMOUNT
+    assert result.events_count == 3 * CASES_AMOUNT
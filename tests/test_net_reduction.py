@@ -0,0 +1,78 @@
+import pytest
+
+from net_reduction import reduce_net
+
+from conftest import build_net
+
+
+def get_tokens(marking):
+    return frozenset((place, len(marking(place))) for place in marking if len(marking(place)))
+
+
+def explore(net):
+    """
+    Reachable markings (as tokens counts) and deadlocks of the bounded net by firing transitions with SNAKES
+    """
+    initial_marking = net.get_marking()
+    markings = {get_tokens(initial_marking): initial_marking}
+    deadlocks = set()
+    queue = [initial_marking]
+    while queue:
+        marking = queue.pop()
+        is_deadlock = True
+        for transition in net.transition():
+            net.set_marking(marking)
+            modes = transition.modes()
+            if not modes:
+                continue
+            is_deadlock = False
+            transition.fire(modes[0])
+            next_marking = net.get_marking()
+            if get_tokens(next_marking) not in markings:
+                markings[get_tokens(next_marking)] = next_marking
+                queue.append(next_marking)
+        if is_deadlock:
+            deadlocks.add(get_tokens(marking))
+    net.set_marking(initial_marking)
+    return markings, deadlocks
+
+
+@pytest.mark.parametrize("net, rules", [
+    # a - b - c is fused into one transition
+    (build_net("chain", [("a", ["p0"], ["p1"]), ("b", ["p1"], ["p2"]), ("c", ["p2"], ["p3"])], {"p0": 1}),
+     {"series_transitions": 2}),
+    # q2 has more tokens than q1, so it is removed and restored from q1 with the difference
+    (build_net("parallel_places", [("a", ["p0"], ["q1", "q2"]), ("b", ["q1", "q2"], ["p0"])],
+               {"p0": 1, "q1": 1, "q2": 2}),
+     {"parallel_places": 1}),
+    # a2 duplicates a, then the kept one is fused with b
+    (build_net("duplicates", [("a", ["p0"], ["p1"]), ("a2", ["p0"], ["p1"]), ("b", ["p1"], ["p2"])], {"p0": 2}),
+     {"parallel_transitions": 1, "series_transitions": 1}),
+])
+def test_reduced_net_has_the_same_markings_and_deadlocks(net, rules):
+    reduction = reduce_net(net)
+    assert +reduction.rules_counts == rules
+    markings, deadlocks = explore(net)
+    reduced_markings, reduced_deadlocks = explore(reduction.net)
+    expanded_markings = {get_tokens(reduction.expand_marking(marking)) for marking in reduced_markings.values()}
+    # markings with tokens in places of fused transitions are passed by macro transitions at once
+    fused_places = {place for place, kept_place, _ in reduction.removed_places if kept_place is None}
+    assert expanded_markings == {tokens for tokens in markings if not any(place in fused_places
+                                                                          for place, _ in tokens)}
+    assert {get_tokens(reduction.expand_marking(reduced_markings[tokens])) for tokens in reduced_deadlocks} \
+        == deadlocks
+
+
+def test_expanded_trace_is_fireable_in_original_net():
+    net = build_net("duplicates", [("a", ["p0"], ["p1"]), ("a2", ["p0"], ["p1"]), ("b", ["p1"], ["p2"])], {"p0": 2})
+    reduction = reduce_net(net)
+    trace = [transition.name for transition in reduction.net.transition()] * 2
+    for transition_name in trace:
+        transition = reduction.net.transition(transition_name)
+        transition.fire(transition.modes()[0])
+    expanded_trace = reduction.expand_trace(trace)
+    assert len(expanded_trace) == 4 and expanded_trace[1::2] == ["b", "b"]
+    for transition_name in expanded_trace:
+        transition = net.transition(transition_name)
+        transition.fire(transition.modes()[0])
+    assert get_tokens(net.get_marking()) == get_tokens(reduction.expand_marking(reduction.net.get_marking()))
@@ -0,0 +1,41 @@
+import functools
+
+import net_structure
+from base_proposed_algorithm import calculate_relations_chunk, use_net
+from benchmark_utilities.nets_generator import NetsGenerator
+from ipc_utilities import WorkerCommand
+from net_structure import build_transitions_adjacency
+from nets_cache import NetsCache, load_net_into_workers
+from simulation import get_workers_manager
+
+
+def build_net():
+    nets_generator = NetsGenerator(tokens=5, length=10, edge_density=0.3, nets_amount=5)
+    nets_generator.build()
+    return nets_generator.nets
+
+
+def test_parallel_build_equals_serial_build(monkeypatch):
+    net = build_net()
+    serial_adjacency = build_transitions_adjacency(net)
+    workers_manager = get_workers_manager(False, 1)
+    load_net_into_workers(workers_manager, use_net, net)
+    monkeypatch.setattr(net_structure, "PARALLEL_BUILD_MIN_TRANSITIONS", 0)
+    parallel_adjacency = build_transitions_adjacency(net, workers_manager,
+                                                     functools.partial(WorkerCommand, calculate_relations_chunk))
+    assert parallel_adjacency.names == serial_adjacency.names
+    for index in range(len(serial_adjacency.names)):
+        assert list(parallel_adjacency.get_consuming(index)) == list(serial_adjacency.get_consuming(index))
+        assert list(parallel_adjacency.get_concurrent(index)) == list(serial_adjacency.get_concurrent(index))
+
+
+def test_arcs_are_scanned_once_per_cached_net(monkeypatch):
+    scans = []
+    monkeypatch.setattr("nets_cache.scan_arcs", lambda net: scans.append(net) or net_structure.scan_arcs(net))
+    nets_cache = NetsCache(1)
+    nets_cache.put("first", build_net())
+    assert nets_cache.get_arcs_scan("first") is nets_cache.get_arcs_scan("first")
+    nets_cache.put("second", build_net())
+    assert "first" not in nets_cache.arcs_scans
+    nets_cache.get_arcs_scan("second")
+    assert len(scans) == 2
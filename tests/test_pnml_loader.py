@@ -0,0 +1,83 @@
+import pytest
+
+import pnml_loader
+from pnml_loader import load_net, load_compact_net, load_pnml
+
+from snakes.nets import PetriNet, Place, Transition, Value, Variable, Expression, Tuple, MultiArc, dot, dumps, \
+    loads, tInteger
+
+from conftest import build_net
+
+
+def build_colored_net():
+    net = PetriNet("colored")
+    net.declare("import math")
+    net.globals["limit"] = 3
+    net.add_place(Place("numbers", [1, 2, 3], tInteger))
+    net.add_place(Place("pairs", [(1, "a"), (2, "b")]))
+    net.add_place(Place("black", [dot, dot]))
+    net.add_place(Place("out"))
+    # names are not in the sorted order, so the order of transitions is checked
+    for name in ("t10", "t2", "t1"):
+        net.add_transition(Transition(name, Expression("math.sqrt(x) < limit")))
+        net.add_input("numbers", name, Variable("x"))
+    net.add_input("pairs", "t10", Tuple([Variable("x"), Variable("y")]))
+    net.add_input("black", "t2", MultiArc([Value(dot), Value(dot)]))
+    net.add_output("out", "t1", Expression("x * 2"))
+    net.add_output("black", "t1", Value(dot))
+    return net
+
+
+def describe(net):
+    return {
+        "name": net.name,
+        "places": [(place.name, sorted(map(repr, place.tokens)), repr(place._check)) for place in net.place()],
+        "transitions": [(transition.name, str(transition.guard),
+                         sorted((place.name, repr(label)) for place, label in transition.input()),
+                         sorted((place.name, repr(label)) for place, label in transition.output()))
+                        for transition in net.transition()],
+        "globals": sorted((name, repr(value)) for name, value in net.globals if name != "__builtins__"),
+    }
+
+
+def to_pages(pnml_string):
+    # nodes of the net are moved into the page, arcs are kept on the net level
+    head, _, rest = pnml_string.partition('  <place')
+    return head + '<page id="page">\n  <place' + rest.replace('  <arc', '</page>\n  <arc', 1)
+
+
+@pytest.mark.parametrize("build", [build_colored_net, lambda: build_net("ordinary", [
+    ("a", ["p0", "p3"], ["p1"]), ("b", ["p1"], ["p0", "p2"])], {"p0": 2})])
+def test_streaming_loader_loads_the_same_net_as_snakes(build):
+    pnml_string = dumps(build())
+    expected = describe(loads(pnml_string))
+    assert describe(load_net(pnml_string)) == expected
+    assert describe(load_net(to_pages(pnml_string))) == expected
+
+
+def test_pnml_with_plugins_is_loaded_by_snakes(tmp_path):
+    # SNAKES writes the list of plugins used by the net in the <snakes> element
+    plugins = '<snakes version="0.9"><plugins><object type="tuple"/></plugins></snakes>'
+    pnml_string = dumps(build_colored_net()).replace('<net id="colored">', plugins + '\n<net id="colored">')
+    with pytest.raises(pnml_loader.UnsupportedPnmlError):
+        load_net(pnml_string)
+    filename = tmp_path / "net.pnml"
+    filename.write_text(pnml_string)
+    assert describe(load_pnml(str(filename))) == describe(loads(pnml_string))
+
+
+def test_compact_net():
+    net = build_net("ordinary", [("a", ["p0"], ["p1", "p2"]), ("b", ["p1", "p2"], ["p0"])], {"p0": 2})
+    net.add_input("p0", "b", MultiArc([Value(dot)] * 3))
+    compact_net = load_compact_net(dumps(net))
+    assert compact_net.places_names == ["p0", "p1", "p2"]
+    assert list(compact_net.tokens) == [2, 0, 0]
+    assert compact_net.transitions_names == ["a", "b"]
+    b = compact_net.transitions_names.index("b")
+    assert sorted(zip(compact_net.get_input_places(b), compact_net.input_weights[compact_net.input_offsets[b]:
+                                                                               compact_net.input_offsets[b + 1]])) \
+        == [(0, 3), (1, 1), (2, 1)]
+    adjacency = compact_net.to_adjacency()
+    assert [adjacency.names[index] for index in adjacency.get_consuming(0)] == ["b"]
+    with pytest.raises(ValueError):
+        load_compact_net(dumps(build_colored_net()))
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from reachability import ReachabilityExplorer
+from simulation import get_workers_manager
+
+from snakes.nets import Marking, MultiSet, dot   # noqa: F401 (deadlocks are evaluated from their repr)
+
+from conftest import build_net
+
+
+def build_choice_net():
+    # a or c consumes the token of p0, b moves the token of q0 concurrently: 3 * 2 markings, 7 edges
+    return build_net("choice", [("a", ["p0"], ["p1"]), ("c", ["p0"], ["p2"]), ("b", ["q0"], ["q1"])],
+                     {"p0": 1, "q0": 1})
+
+
+def get_deadlocks(result):
+    return sorted(sorted(eval(deadlock)) for deadlock in result.deadlocks)
+
+
+@pytest.mark.parametrize("is_depth_first", [False, True])
+def test_state_space_of_choice_net(is_depth_first):
+    result = ReachabilityExplorer(get_workers_manager(False, 1), build_choice_net(), is_depth_first).explore()
+    assert (result.states_count, result.edges_count, result.deadlocks_count) == (6, 7, 2)
+    assert get_deadlocks(result) == [["p1", "q1"], ["p2", "q1"]]
+    assert result.is_complete and result.bound == 1
+
+
+def test_stubborn_sets_preserve_deadlocks():
+    result = ReachabilityExplorer(get_workers_manager(False, 1), build_choice_net(), is_stubborn=True).explore()
+    assert result.states_count < 6
+    assert get_deadlocks(result) == [["p1", "q1"], ["p2", "q1"]]
+
+
+@pytest.mark.parametrize("is_depth_first", [False, True])
+def test_spilled_frontier_gives_the_same_state_space(tmp_path, is_depth_first):
+    result = ReachabilityExplorer(get_workers_manager(False, 1), build_choice_net(), is_depth_first,
+                                  spill_directory=str(tmp_path), batch_size=1, spill_threshold=1).explore()
+    assert (result.states_count, result.edges_count, result.deadlocks_count) == (6, 7, 2)
+    assert not os.listdir(tmp_path)
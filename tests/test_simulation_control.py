@@ -0,0 +1,57 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from simulation import Simulation
+from simulation_control import StopReasons, run_until_stopped
+
+from conftest import build_cycle_net
+
+
+def run(net, checkpoint_path, prune_dead=False):
+    return Simulation(net, workers=1, max_events=4, checkpoint_path=str(checkpoint_path), resume=True,
+                      prune_dead=prune_dead).run()
+
+
+def test_checkpoint_is_resumed(tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    assert run(build_cycle_net(), checkpoint_path).events_count == 4
+    first_time = json.loads(checkpoint_path.read_text())["simulation_time"]
+    result = run(build_cycle_net(), checkpoint_path)
+    # events are counted from the restored ones, so the budget is spent before the first firing
+    assert result.stop_reason == StopReasons.EVENTS_BUDGET
+    assert result.events_count == 4
+    # throughput is counted over the simulation time of both runs
+    assert result.simulation_time >= first_time
+
+
+def test_checkpoint_with_other_preprocessing_is_not_resumed(tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    run(build_cycle_net(), checkpoint_path)
+    with pytest.raises(ValueError, match="preprocessing"):
+        run(build_cycle_net(), checkpoint_path, prune_dead=True)
+
+
+def test_checkpoint_of_other_net_is_not_resumed(tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    run(build_cycle_net(), checkpoint_path)
+    with pytest.raises(ValueError, match="another net"):
+        run(build_cycle_net(("c", "d")), checkpoint_path)
+
+
+class FailingManager:
+    # manager, which startup fails, with the statistics read by the sampler
+    events_count = 0
+    calculation_manager = SimpleNamespace(busy_time=0, procs_with_pipes=[])
+
+    def startup(self, transition_handlers):
+        raise RuntimeError("startup failed")
+
+
+def test_sampler_is_stopped_when_startup_fails(tmp_path):
+    samples_path = tmp_path / "samples.jsonl"
+    with pytest.raises(RuntimeError):
+        run_until_stopped(FailingManager(), [], sampler_output=str(samples_path), sampler_interval=10)
+    # the last sample is written and the stream is closed on the failure too
+    assert json.loads(samples_path.read_text())["events_count"] == 0
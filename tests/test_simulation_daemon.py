@@ -0,0 +1,29 @@
+import os
+import stat
+
+import pytest
+
+from simulation_daemon import SimulationDaemon, parse_marking
+
+from snakes.nets import Marking, MultiSet, dot
+
+
+def test_marking_is_parsed_without_eval():
+    marking = Marking({"p0": MultiSet([dot, dot]), "p1": MultiSet([1, -2.5, "a", (1, ("b", dot))])})
+    assert parse_marking(repr(marking)) == marking
+    assert parse_marking("Marking({})") == Marking()
+    for marking_repr in ["__import__('os').getcwd()", "Marking({'p0': MultiSet([__import__('os').getcwd()])})",
+                         "Marking({'p0': MultiSet([dot], **{})})", "Marking(**{'p0': MultiSet([dot])})"]:
+        with pytest.raises(ValueError):
+            parse_marking(marking_repr)
+
+
+def test_socket_is_accessible_by_owner_only(tmp_path):
+    socket_path = tmp_path / "daemon" / "daemon.sock"
+    daemon = SimulationDaemon(str(socket_path), workers=1)
+    daemon.start()
+    try:
+        assert stat.S_IMODE(os.stat(socket_path.parent).st_mode) == 0o700
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    finally:
+        daemon.stop()
@@ -0,0 +1,21 @@
+from simulation import Simulation
+from simulation_control import StopReasons
+from structural_analysis import prune_net
+
+from conftest import build_cycle_net
+
+
+def test_prune_net_removes_dead_transition():
+    pruned_net, report = prune_net(build_cycle_net())
+    assert report.dead_transitions == ["dead"]
+    assert report.unmarked_places == ["never_marked"]
+    assert not pruned_net.has_transition("dead")
+
+
+def test_workflow_simulation_with_formula_naming_dead_transition():
+    # firings of a possibly enable dead, which is not in the pruned net, and b, so the simulation goes on
+    result = Simulation(build_cycle_net(), "(a ◁ dead) ∧ (a ◁ b)", workers=1, max_events=10,
+                        prune_dead=True).run()
+    assert result.pruning_report.dead_transitions == ["dead"]
+    assert result.stop_reason == StopReasons.EVENTS_BUDGET
+    assert result.trace == ["a", "b"] * 5
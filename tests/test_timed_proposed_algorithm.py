@@ -0,0 +1,16 @@
+from simulation import Simulation
+
+from conftest import build_cycle_net
+
+
+def run(net, delay):
+    delays = {"a": ("deterministic", delay), "b": ("deterministic", delay)}
+    return Simulation(net, workers=1, max_events=4, delays=delays).run()
+
+
+def test_delays_do_not_change_the_net():
+    net = build_cycle_net(is_dead=False)
+    assert run(net, 1).simulated_time == 4
+    assert not any(hasattr(transition, 'delay') for transition in net.transition())
+    # the same net is simulated again with other delays
+    assert run(net, 2).simulated_time == 8
@@ -0,0 +1,262 @@
+import collections
+import heapq
+import itertools
+import time
+
+import gevent
+import numpy.random as random
+
+from base_proposed_algorithm import use_net, calculate_movement
+from benchmark_utilities.nets_generator import load_from_file
+from config import SIMULATION_TIMEOUT, WORKERS_NUM, IS_BENCHMARKING
+from ipc_utilities import AnnotatedMovement, request_base_movement_calculation, WorkersManager, \
+    serialize_base_movements, deserialize_base_movements
+from logging_manager import logger
+from nets_cache import load_net_into_workers
+from net_structure import build_transitions_adjacency
+from simulation_control import StopReasons
+
+from snakes.nets import *   # noqa
+
+
+class Exponential:
+    def __init__(self, rate):
+        self.rate = rate
+
+    def sample(self):
+        return random.exponential(1 / self.rate)
+
+
+class Deterministic:
+    """
+    Fixed delay, zero delay makes the transition immediate
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def sample(self):
+        return self.delay
+
+
+class Empirical:
+    """
+    Delay chosen from observed values (with optional weights)
+    """
+
+    def __init__(self, values, weights=None):
+        self.values = list(values)
+        self.probabilities = None
+        if weights is not None:
+            total = sum(weights)
+            self.probabilities = [weight / total for weight in weights]
+
+    def sample(self):
+        return self.values[random.choice(len(self.values), p=self.probabilities)]
+
+
+DISTRIBUTIONS = {
+    "exponential": Exponential,
+    "deterministic": Deterministic,
+    "empirical": Empirical,
+}
+
+
+def build_delays(net_, delays, default_delay=None):
+    """
+    Returns delay distributions of transitions of the net by their names, delays are given by transitions names either
+    as distributions or as specifications, e.g. ("exponential", 2.0), ("empirical", [1, 2, 5])
+    Transitions without delay get the default one (exponential with rate 1, if it is not given)
+    The net itself is not changed, so it can be simulated again with other delays or without them
+    """
+    default_delay = default_delay or Exponential(1)
+    delays_by_names = {}
+    for transition in net_.transition():
+        delay = delays.get(transition.name, default_delay)
+        if isinstance(delay, (tuple, list)):
+            delay = DISTRIBUTIONS[delay[0]](*delay[1:])
+        delays_by_names[transition.name] = delay
+    return delays_by_names
+
+
+class TimedSimulationManager:
+    """
+    Generalized stochastic Petri net simulation: every enabled transition is scheduled to fire after the delay
+    sampled from its distribution, the earliest one fires (race policy with enabling memory).
+    Scheduled firings are kept in the heap, after the firing only transitions sharing places with the fired one
+    are recalculated on workers in parallel: newly enabled ones are sampled and scheduled, disabled ones are dropped,
+    still enabled ones keep their firing time
+    """
+
+    def __init__(self, calculation_manager, net_, delays_by_names, max_events=None, time_limit=None,
+                 stop_predicate=None):
+        self.net = net_
+        self.current_marking = net_.get_marking()
+        self.calculation_manager = calculation_manager
+        self.adjacency = None
+        # delay distributions by transitions names (see build_delays) and by transitions ids after the build
+        self.delays_by_names = delays_by_names
+        self.delays = []
+
+        # heap of (firing time, sequence number, transition id), entries of rescheduled transitions are
+        # left in the heap and skipped, the actual firing time of the transition is in scheduled_times
+        self.events_heap = []
+        self.sequence = itertools.count()
+        self.scheduled_times = {}
+        self.movements = {}
+        self.simulated_time = 0.0
+
+        self.max_events = max_events
+        self.time_limit = time_limit
+        self.stop_predicate = stop_predicate
+        self.stop_reason = None
+
+        # Statistics info, occupancy of places is integrated over simulated time
+        self.events_count = 0
+        self.events_distribution = collections.defaultdict(int)
+        self.places_tokens_time = collections.defaultdict(float)
+        self.places_last_change = collections.defaultdict(float)
+        self.building_start = time.time()
+        self.simulation_start = None
+        self.simulation_end = None
+
+    def build(self):
+        self.adjacency = build_transitions_adjacency(self.net)
+        self.delays = [self.delays_by_names[name] for name in self.adjacency.names]
+        return range(len(self.adjacency.names))
+
+    def _calculate_movements(self, transitions_ids):
+        transitions_ids = list(transitions_ids)
+        calculations = [gevent.spawn(request_base_movement_calculation, self.calculation_manager,
+                                     self.adjacency.names[transition_id], self.current_marking)
+                        for transition_id in transitions_ids]
+        gevent.joinall(calculations)
+        return zip(transitions_ids, (calculation.value for calculation in calculations))
+
+    def _schedule(self, transitions_ids):
+        for transition_id, movement in self._calculate_movements(transitions_ids):
+            if movement is None:
+                self.movements.pop(transition_id, None)
+                self.scheduled_times.pop(transition_id, None)
+                continue
+            self.movements[transition_id] = movement
+            if transition_id not in self.scheduled_times:
+                firing_time = self.simulated_time + self.delays[transition_id].sample()
+                self.scheduled_times[transition_id] = firing_time
+                heapq.heappush(self.events_heap, (firing_time, next(self.sequence), transition_id))
+
+    def _pop_next_event(self):
+        while self.events_heap:
+            firing_time, _, transition_id = heapq.heappop(self.events_heap)
+            if self.scheduled_times.get(transition_id) == firing_time:
+                del self.scheduled_times[transition_id]
+                return firing_time, transition_id
+        return None, None
+
+    def _update_occupancy(self, places):
+        for place in places:
+            self.places_tokens_time[place] += len(self.current_marking.get(place, ())) * \
+                (self.simulated_time - self.places_last_change[place])
+            self.places_last_change[place] = self.simulated_time
+
+    def _fire(self, transition_id, firing_time):
+        movement: AnnotatedMovement = self.movements.pop(transition_id)
+        self.simulated_time = firing_time
+        self._update_occupancy(set(movement.start_places) | set(movement.end_places))
+        self.current_marking = self.current_marking - movement.start_places + movement.end_places
+        self.events_count += 1
+        self.events_distribution[self.adjacency.names[transition_id]] += 1
+
+    def _is_stopped(self, timeout):
+        if timeout is not None and time.time() - self.simulation_start >= timeout:
+            self.stop_reason = StopReasons.TIMEOUT
+        elif self.max_events is not None and self.events_count >= self.max_events:
+            self.stop_reason = StopReasons.EVENTS_BUDGET
+        elif self.stop_predicate is not None and self.stop_predicate(self.current_marking):
+            self.stop_reason = StopReasons.PREDICATE
+        return self.stop_reason is not None
+
+    def startup(self, transitions_ids, timeout=None):
+        self.simulation_start = time.time()
+        self._schedule(transitions_ids)
+        while not self._is_stopped(timeout):
+            firing_time, transition_id = self._pop_next_event()
+            if transition_id is None:
+                self.stop_reason = StopReasons.DEADLOCK
+                break
+            if self.time_limit is not None and firing_time > self.time_limit:
+                self.simulated_time = self.time_limit
+                self.stop_reason = StopReasons.TIME_LIMIT
+                break
+            self._fire(transition_id, firing_time)
+            # fired transition is sampled again if it is still enabled
+            affected = {transition_id}
+            affected.update(self.adjacency.get_consuming(transition_id))
+            affected.update(self.adjacency.get_concurrent(transition_id))
+            self._schedule(affected)
+        self._update_occupancy(place.name for place in self.net.place())
+        self.simulation_end = time.time()
+
+    def get_simulation_time(self):
+        return (self.simulation_end or time.time()) - self.simulation_start
+
+    def get_places_occupancy(self):
+        """
+        Mean number of tokens in places over the simulated time
+        """
+        if self.simulated_time == 0:
+            return {place.name: len(self.current_marking.get(place.name, ())) for place in self.net.place()}
+        return {place.name: self.places_tokens_time[place.name] / self.simulated_time for place in self.net.place()}
+
+    def get_transitions_throughput(self):
+        """
+        Firings of transitions per unit of the simulated time
+        """
+        if self.simulated_time == 0:
+            return {}
+        return {name: count / self.simulated_time for name, count in self.events_distribution.items()}
+
+    def print_stats(self):
+        simulation_time = self.get_simulation_time()
+        building_time = self.simulation_start - self.building_start
+        logger.info(f"{building_time}s building overhead, "
+                    f"{self.events_count} / {simulation_time} = {self.events_count / simulation_time} "
+                    f"events per second, "
+                    f"{self.simulated_time} of simulated time")
+        logger.info(f"Places occupancy: {self.get_places_occupancy()}")
+        logger.info(f"Transitions throughput: {self.get_transitions_throughput()}")
+
+    def print_stats_for_benchmarks(self):
+        simulation_time = self.get_simulation_time()
+        logger.info(f"{self.events_count / simulation_time}")
+        return self.events_count / simulation_time
+
+
+def run_simulation(workers_manager_, net_, delays=None, timeout=None, max_events=None, time_limit=None,
+                   stop_predicate=None):
+    """
+    Runs one stochastic timed simulation of the net on the (possibly warm) workers of the base algorithm,
+    delays are given by transitions names (see build_delays), transitions without them get the default delay
+    """
+    delays_by_names = build_delays(net_, delays or {})
+    load_net_into_workers(workers_manager_, use_net, net_)
+    manager = TimedSimulationManager(workers_manager_, net_, delays_by_names, max_events, time_limit, stop_predicate)
+    transitions_ids = manager.build()
+    manager.startup(transitions_ids, timeout)
+    return manager
+
+
+if __name__ == "__main__":
+    simulated_net = load_from_file('nets.pnml')
+    workers_manager = WorkersManager(calculate_movement_fun=calculate_movement,
+                                     serialization_fun=serialize_base_movements,
+                                     deserialization_fun=deserialize_base_movements)
+    workers_manager.create_pool(WORKERS_NUM)
+    try:
+        manager = run_simulation(workers_manager, simulated_net, timeout=SIMULATION_TIMEOUT)
+        if IS_BENCHMARKING:
+            manager.print_stats_for_benchmarks()
+        else:
+            manager.print_stats()
+    finally:
+        workers_manager.destroy_pool()
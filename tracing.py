@@ -0,0 +1,58 @@
+import json
+import os
+import time
+
+import gevent
+
+from config import IS_TRACING
+
+
+class Tracer:
+    """
+    Tracer collecting spans of the simulation in Chrome trace-event format (chrome://tracing, Perfetto).
+    Hooks are expected to be guarded by `tracer.enabled` at call site, so disabled tracing costs one attribute lookup
+    and no arguments (names, markings) are formatted at all
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+
+    @staticmethod
+    def now():
+        # Microseconds of monotonic clock, which is shared by coordinator and forked workers on Linux
+        return time.perf_counter_ns() // 1000
+
+    @staticmethod
+    def _current_greenlet_id():
+        # minimal_ident is a small integer reused after greenlet death, so timeline rows do not explode in number
+        return getattr(gevent.getcurrent(), 'minimal_ident', 0)
+
+    def span(self, name, category, start, **args):
+        self.events.append({"name": name, "cat": category, "ph": "X", "ts": start, "dur": self.now() - start,
+                            "pid": os.getpid(), "tid": self._current_greenlet_id(), "args": args})
+
+    def worker_span(self, name, pid, start, end, **args):
+        self.events.append({"name": name, "cat": "worker", "ph": "X", "ts": start, "dur": end - start,
+                            "pid": pid, "tid": pid, "args": args})
+
+    def instant(self, name, category, **args):
+        self.events.append({"name": name, "cat": category, "ph": "i", "s": "t", "ts": self.now(),
+                            "pid": os.getpid(), "tid": self._current_greenlet_id(), "args": args})
+
+    def clear(self):
+        self.events = []
+
+    def export(self, filename):
+        coordinator_pid = os.getpid()
+        metadata = [{"name": "process_name", "ph": "M", "pid": coordinator_pid, "tid": 0,
+                     "args": {"name": "coordinator"}}]
+        workers_pids = set(event["pid"] for event in self.events if event["pid"] != coordinator_pid)
+        for pid in workers_pids:
+            metadata.append({"name": "process_name", "ph": "M", "pid": pid, "tid": pid,
+                             "args": {"name": f"worker {pid}"}})
+        with open(filename, 'w') as f:
+            json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f)
+
+
+tracer = Tracer(IS_TRACING)
@@ -1,5 +1,7 @@
 import collections
 import enum
+import functools
+import os
 import sys
 import time
 
@@ -9,38 +11,82 @@ import gevent.pool
 import gevent.queue
 import numpy.random as random
 
-from config import SIMULATION_TIMEOUT, IS_COMPARING_WITH_BASELINE_ALGORITHM, WORKERS_NUM, IS_DEBUG, IS_BENCHMARKING
-from constraints_evaluation import CheckActivationValidity, constraint_parser
+from config import SIMULATION_TIMEOUT, IS_COMPARING_WITH_BASELINE_ALGORITHM, WORKERS_NUM, IS_DEBUG, IS_BENCHMARKING, \
+    IS_TRACING, TRACE_FILE_PATH, IS_INCREMENTAL_BASELINE, SAMPLER_INTERVAL, WORKER_NETS_CACHE_SIZE, \
+    IS_CONSTRAINT_MONITOR, IS_AFFINITY_ROUTING, IS_REDUCING_NET, IS_PRUNING_DEAD_TRANSITIONS
+from affinity import build_affinity
+from constraint_monitor import ConstraintMonitor
+from constraints_evaluation import compile_constraint, get_constraint_transitions
 from ipc_utilities import AnnotatedMovement, \
-    request_workflow_movement_calculation, serialize_workflow_movements, deserialize_workflow_movements, WorkersManager
+    request_workflow_movement_calculation, serialize_workflow_movements, deserialize_workflow_movements, WorkersManager, \
+    WorkerCommand
 from logging_manager import logger
+from modes_finder import select_mode
+from nets_cache import NetsCache, load_net, load_net_into_workers
+from net_reduction import reduce_net
+from net_structure import build_transitions_adjacency, build_relations_from_arcs
+from simulation_control import StopReasons, run_until_stopped, load_checkpoint, check_checkpoint
+from structural_analysis import prune_net
+from tracing import tracer
 from benchmark_utilities.nets_generator import load_from_file
 from benchmark_utilities.constraint_generator import generate_formula
 
 from snakes.nets import *   # noqa
 
 from baseline_algorithms.workflow_baseline_algorithm import run_baseline_simulation
+from baseline_algorithms.incremental_baseline_algorithm import run_baseline_simulation as \
+    run_incremental_baseline_simulation
 
-# net is loaded globally to make it available for all processes, and it costs to load it on every calculation
-net = load_from_file('nets.pnml')
+# net is kept globally in every worker process, as it costs to load it on every calculation
+# nets are cached by content hash and switched by use_net command, so warm workers can be reused for many simulations
+net = None
+# hash of the current net in the cache
+current_net_hash = None
+nets_cache = NetsCache(WORKER_NETS_CACHE_SIZE)
+
+
+def use_net(net_hash, pnml_string=None):
+    """
+    Makes the cached net current, the net is loaded from pnml if it is not cached yet,
+    returns False if it is not cached and pnml is not given
+    """
+    global net, current_net_hash
+    cached_net = nets_cache.get(net_hash)
+    if cached_net is None:
+        if pnml_string is None:
+            return False
+        cached_net = load_net(pnml_string)
+        nets_cache.put(net_hash, cached_net)
+    net = cached_net
+    current_net_hash = net_hash
+    return True
+
+
+def calculate_relations_chunk(start, end):
+    # arcs are scanned once per cached net, not once per chunk
+    _, input_places, output_places, places_consumers = nets_cache.get_arcs_scan(current_net_hash)
+    return build_relations_from_arcs(input_places, output_places, places_consumers, start, end)
 
 
 def calculate_movement_in_workflow_net(transition_repr, marking_repr, trace, constraint_formula_):
     net.set_marking(eval(marking_repr))
     t = net.transition(eval(transition_repr))
-    # Running more lightweight check first
-    movements = [AnnotatedMovement(*t.flow(m)) for m in t.modes()]
-    if not movements:
+    # Running more lightweight check first, only the selected mode is computed, modes are enumerated lazily
+    mode = select_mode(t)
+    if mode is None:
         return [], [], []
+    if constraint_formula_ is None:
+        # constraints are checked by the monitor of the coordinator
+        return [AnnotatedMovement(*t.flow(mode))], [], []
 
+    # formula is parsed once per worker, not on every calculation
+    constraint = compile_constraint(constraint_formula_)
     # We need to check only for occurrence of specific names in the trace, can use set for O(1) search
-    validator = CheckActivationValidity(set(trace), t.name)
-    tree = constraint_parser.parse(constraint_formula_)
-    is_valid_to_fire = validator.transform(tree)
-    if not is_valid_to_fire:
+    if not constraint.is_valid(set(trace), t.name):
         return [], [], []
 
-    return movements, validator.possibly_enabled_transitions, validator.possibly_disabled_transitions
+    return [AnnotatedMovement(*t.flow(mode))], constraint.get_possibly_enabled_transitions(t.name), \
+        constraint.get_possibly_disabled_transitions(t.name)
 
 
 class HandlerStates(enum.Enum):
@@ -48,6 +94,8 @@ class HandlerStates(enum.Enum):
     ENQUEUED = 2
     POSSIBLY_ENABLED = 3
     POSSIBLY_DISABLED = 4
+    # tokens were added to input places, retry is decided by places versions, flag is kept for statistics
+    TO_RETRY = 5
 
 
 class SimulationManager:
@@ -55,164 +103,353 @@ class SimulationManager:
     Simulation manager starts simulation and keeps all the common data for transitions handlers
     """
 
-    def __init__(self, calculation_manager, net_, constraint_formula_):
+    def __init__(self, calculation_manager, net_, constraint_formula_, max_events=None, stop_predicate=None,
+                 is_constraint_monitor=False):
+        self.net = net_
         self.current_marking = net_.get_marking()
         self.calculation_manager = calculation_manager
         self.constraint_formula = constraint_formula_
+        # with the monitor constraints are checked on the coordinator, workers calculate movements only
+        self.is_constraint_monitor = is_constraint_monitor
+        self.constraint_monitor = None
+
+        # all handlers coroutines are spawned in this group, it becomes empty when there is nothing to activate
+        self.handlers_coroutines = gevent.pool.Group()
+        # handlers table indexed by transition ids, relations between transitions are kept in adjacency arrays
+        self.transition_handlers = []
+        self.adjacency = None
+
+        # Stop conditions besides timeout, predicate is called with the marking after every movement
+        self.max_events = max_events
+        self.stop_predicate = stop_predicate
+        self.is_stopped = False
+        self.stop_reason = None
 
-        # mapping transition names to their handlers, added this logic for passing possibly_enabled/disabled
-        self.transitions_mapping = {}
         self.trace = []
 
+        # Version of the place is bumped on every change of its tokens, so handlers validate movements
+        # by comparing versions of their input places instead of the multisets of the marking,
+        # production version is bumped only when tokens are added, so only these changes cause retries
+        self.places_versions = collections.defaultdict(int)
+        self.places_production_versions = collections.defaultdict(int)
+
         # Statistics info
         self.events_count = 0
         self.events_distribution = collections.defaultdict(int)
+        self.validations_by_versions = 0
+        self.validations_by_marking = 0
+        self.retries_count = 0
+        # retries, which would be done by pessimistic TO_RETRY flag, but no tokens were added to input places
+        self.avoided_retries_count = 0
+        # report of pruning of dead transitions before simulation (see structural_analysis)
+        self.pruning_report = None
+        # content hash of the simulated net and preprocessing settings, checkpoints are resumed only if they match
+        self.net_hash = None
+        self.preprocessing = None
         self.building_start = time.time()
+        self.build_time = None
         self.simulation_start = None
+        self.simulation_end = None
+        # simulation time saved in the resumed checkpoint, restored events are counted over it
+        self.restored_simulation_time = 0
 
     def build(self):
-        self.transitions_mapping = {t.name: TransitionHandler(t.name, self, self.calculation_manager) for t in
-                                    net.transition()}
-
-        for transition_name, transition in self.transitions_mapping.items():
-            place_consuming_handlers = set(trans for place in net.post(transition_name) for trans in net.post(place))
-            for handler in place_consuming_handlers:
-                transition.consuming_handlers.add(handler)
-
-        # net.post(place.name) is a set itself and is not hashable, that is why frozenset
-        grouped_by_place_transitions = set(frozenset(net.post(place.name)) for place in net.place())
-        for place_transitions in grouped_by_place_transitions:
-            transitions_handlers = [t for t in place_transitions]
-            for cur_handler in transitions_handlers:
-                self.transitions_mapping[cur_handler].concurrent_handlers.update(transitions_handlers)
-
-        for transition_handler in self.transitions_mapping.values():
-            logger.debug(f"{transition_handler} <-- concurrent_handlers: "
-                         f"{', '.join(str(p) for p in transition_handler.concurrent_handlers)}")
-            logger.debug(f"{transition_handler} --> consuming_handlers: "
-                         f"{', '.join(str(p) for p in transition_handler.consuming_handlers)}")
-        return self.transitions_mapping.values()
+        build_start = time.time()
+        # workers have the net loaded, so relations of large nets are built there in parallel
+        self.adjacency = build_transitions_adjacency(self.net, self.calculation_manager,
+                                                     functools.partial(WorkerCommand, calculate_relations_chunk))
+        self.transition_handlers = [TransitionHandler(index, name, self, self.calculation_manager)
+                                    for index, name in enumerate(self.adjacency.names)]
+        for transition_handler in self.transition_handlers:
+            transition_handler.input_places = self.adjacency.input_places[transition_handler.index]
+        if self.is_constraint_monitor:
+            self.constraint_monitor = ConstraintMonitor(self.constraint_formula, self.adjacency.names)
+
+        if IS_DEBUG:
+            names = self.adjacency.names
+            for transition_handler in self.transition_handlers:
+                concurrent = self.adjacency.get_concurrent(transition_handler.index)
+                consuming = self.adjacency.get_consuming(transition_handler.index)
+                logger.debug(f"{transition_handler} <-- concurrent_handlers: {', '.join(names[i] for i in concurrent)}")
+                logger.debug(f"{transition_handler} --> consuming_handlers: {', '.join(names[i] for i in consuming)}")
+        self.build_time = time.time() - build_start
+        return self.transition_handlers
 
     def startup(self, transitions):
         self.simulation_start = time.time()
+        if self.max_events is not None and self.events_count >= self.max_events:
+            # the budget was spent already by the resumed simulation
+            self.request_stop(StopReasons.EVENTS_BUDGET)
+            return
 
-        handlers_coroutines = gevent.pool.Group()
         shuffled_transitions = list(transitions)
         random.shuffle(shuffled_transitions)
         for t in shuffled_transitions:
             t.state = HandlerStates.ENQUEUED
-            g = gevent.spawn(t.activate_transition)
-            handlers_coroutines.add(g)
-        handlers_coroutines.join()
+            self.handlers_coroutines.spawn(t.activate_transition)
+        self.handlers_coroutines.join()
+        # the group becomes empty without stop only when every handler is stale
+        self.request_stop(StopReasons.DEADLOCK)
+
+    def request_stop(self, reason):
+        """
+        Stops the simulation without killing coroutines: new calculations are not requested anymore
+        """
+        if not self.is_stopped:
+            self.is_stopped = True
+            self.stop_reason = reason
+            self.simulation_end = time.time()
+
+    def drain(self):
+        """
+        Awaits calculations in flight after the stop, so workers pipes are left consistent for the next simulation
+        """
+        self.handlers_coroutines.join()
+
+    def restore(self, checkpoint):
+        """
+        Restores the simulation state from the checkpoint, returns handlers, which are to be activated on startup
+        """
+        self.current_marking = checkpoint["marking"]
+        self.trace = checkpoint["trace"]
+        self.events_count = checkpoint["events_count"]
+        self.events_distribution.update(checkpoint["events_distribution"])
+        self.restored_simulation_time = checkpoint.get("simulation_time", 0)
+        if self.constraint_monitor is not None:
+            self.constraint_monitor.restore(self.trace)
+        handlers_to_activate = []
+        for handler in self.transition_handlers:
+            handler.state = HandlerStates[checkpoint["handlers_states"][handler.name]]
+            if handler.state != HandlerStates.STALE:
+                handlers_to_activate.append(handler)
+        return handlers_to_activate
+
+    def get_simulation_time(self):
+        return self.restored_simulation_time + (self.simulation_end or time.time()) - self.simulation_start
 
     def print_stats(self):
-        simulation_time = time.time() - self.simulation_start
+        simulation_time = self.get_simulation_time()
         building_time = self.simulation_start - self.building_start
+        logger.info(f"{self.build_time}s building of handlers and relations")
         logger.info(f"Constraint formula: {self.constraint_formula}")
         logger.info(f"Simulation trace: {self.trace}")
         logger.info(f"{building_time}s building overhead, "
                     f"{self.events_count} / {simulation_time} = {self.events_count / simulation_time} events per second")
         logger.info(f"Transition handlers distribution: {self.events_distribution}")
+        logger.info(f"Validations by places versions: {self.validations_by_versions}, "
+                    f"by marking: {self.validations_by_marking}, retries: {self.retries_count}, "
+                    f"avoided retries: {self.avoided_retries_count}")
         return self.events_count / simulation_time
 
     def print_stats_for_benchmarks(self):
-        simulation_time = time.time() - self.simulation_start
+        simulation_time = self.get_simulation_time()
         logger.info(f"{self.events_count / simulation_time}")
         return self.events_count / simulation_time
 
+    def get_places_versions(self, places):
+        return [self.places_versions[place] for place in places], \
+            [self.places_production_versions[place] for place in places]
+
+    def is_allowed(self, transition_name):
+        return self.constraint_monitor is None or self.constraint_monitor.is_allowed(transition_name)
+
     def perform_movement(self, transition_name, movement: AnnotatedMovement):
-        new_marking = self.current_marking - movement.start_places + movement.end_places
-        logger.debug(f"[perform_movement] {transition_name} \n"
-                     f"\t before: {self.current_marking} \n"
-                     f"\t after: {new_marking}")
-        self.current_marking = new_marking
+        """
+        Fires the movement, with the constraint monitor returns transitions allowed by this firing
+        """
+        if tracer.enabled:
+            firing_start = tracer.now()
+        self.current_marking = self.current_marking - movement.start_places + movement.end_places
+        for place in movement.start_places:
+            self.places_versions[place] += 1
+        for place in movement.end_places:
+            self.places_versions[place] += 1
+            self.places_production_versions[place] += 1
         self.trace.append(transition_name)
+        newly_allowed = []
+        if self.constraint_monitor is not None:
+            newly_allowed, _ = self.constraint_monitor.fire(transition_name)
 
         # Statistics updating
         self.events_count += 1
         self.events_distribution[transition_name] += 1
 
+        if self.max_events is not None and self.events_count >= self.max_events:
+            self.request_stop(StopReasons.EVENTS_BUDGET)
+        elif self.stop_predicate is not None and self.stop_predicate(self.current_marking):
+            self.request_stop(StopReasons.PREDICATE)
+        if tracer.enabled:
+            tracer.span("firing", "coordinator", firing_start, transition=transition_name)
+        return newly_allowed
+
 
 class TransitionHandler:
     """
     Transition handlers, executed on couroutines (greenlets), each handler is assigned to a different transition
+    Handlers are slotted and refer to other handlers by transition ids, as nets may have tens of thousands of them
     """
 
-    def __init__(self, name, simulation_manager, calculation_manager):
+    __slots__ = ('index', 'name', 'calculation_manager', 'simulation_manager', 'input_places', 'state')
+
+    def __init__(self, index, name, simulation_manager, calculation_manager):
+        self.index = index
         self.name = name
         self.calculation_manager = calculation_manager
         self.simulation_manager = simulation_manager
 
-        self.consuming_handlers = set()
-        self.concurrent_handlers = set()
+        self.input_places = ()
         self.state = HandlerStates.STALE
 
     def __str__(self):
         return f"transition {self.name} handler"
 
-    def _check_movement(self, movement: AnnotatedMovement):
+    def _check_movement(self, movement: AnnotatedMovement, is_preset_changed):
         if movement is None:
             return False
+        if not is_preset_changed:
+            # tokens of input places are the same as the worker has seen, so movement is still valid
+            self.simulation_manager.validations_by_versions += 1
+            return True
+        self.simulation_manager.validations_by_marking += 1
         if movement.start_places <= self.simulation_manager.current_marking:
             return True
         return False
 
     def activate_transition(self):
+        # Tracing hooks are guarded explicitly, so nothing is formatted or recorded on the hot path by default
+        if self.simulation_manager.is_stopped:
+            return
+        if not self.simulation_manager.is_allowed(self.name):
+            # forbidden by constraints, the handler is enqueued again by the firing, which allows it
+            self.state = HandlerStates.STALE
+            return
+        if tracer.enabled:
+            activation_start = tracer.now()
         self.state = HandlerStates.ENQUEUED
-        logger.debug(f"{self}: CALCULATING MOVEMENT")
-
-        calculated_movement, possibly_enabled, possible_disabled = request_workflow_movement_calculation(self.calculation_manager,
-                                                                             self.name,
-                                                                             self.simulation_manager.current_marking,
-                                                                             self.simulation_manager.trace,
-                                                                             self.simulation_manager.constraint_formula)
-        can_perform_movement = self._check_movement(calculated_movement)
-        logger.debug(f"{self}: marking {self.simulation_manager.current_marking} \n"
-                     f"\t calculated movement: {calculated_movement}\n"
-                     f"\t it is available: {can_perform_movement}")
+
+        read_versions, read_production_versions = self.simulation_manager.get_places_versions(self.input_places)
+        if self.simulation_manager.constraint_monitor is None:
+            calculated_movement, possibly_enabled, possible_disabled = request_workflow_movement_calculation(
+                self.calculation_manager, self.name, self.simulation_manager.current_marking,
+                self.simulation_manager.trace, self.simulation_manager.constraint_formula)
+        else:
+            # neither the trace nor the formula are sent to workers
+            calculated_movement, possibly_enabled, possible_disabled = request_workflow_movement_calculation(
+                self.calculation_manager, self.name, self.simulation_manager.current_marking, [], None)
+        if self.simulation_manager.is_stopped:
+            # calculation in flight is drained, but not applied after the stop, handler is left enqueued
+            return
+        if not self.simulation_manager.is_allowed(self.name):
+            # transitions fired during the calculation forbid this one
+            calculated_movement = None
+        if tracer.enabled:
+            validation_start = tracer.now()
+        current_versions, current_production_versions = \
+            self.simulation_manager.get_places_versions(self.input_places)
+        can_perform_movement = self._check_movement(calculated_movement, read_versions != current_versions)
+        if tracer.enabled:
+            tracer.span("validation", "handler", validation_start, transition=self.name,
+                        is_available=can_perform_movement)
         if ((self.state == HandlerStates.POSSIBLY_DISABLED) or
-                (not can_perform_movement and self.state == HandlerStates.POSSIBLY_ENABLED)):
-            logger.debug(f"{self}: possibly disabled, retrying")
-            cor = gevent.spawn(self.activate_transition)
-            coroutines_to_enqueue.put(cor)
+                (not can_perform_movement and (self.state == HandlerStates.POSSIBLY_ENABLED or
+                                               read_production_versions != current_production_versions))):
+            if tracer.enabled:
+                tracer.instant("retry", "handler", transition=self.name)
+            self.simulation_manager.retries_count += 1
+            self.simulation_manager.handlers_coroutines.spawn(self.activate_transition)
         elif not can_perform_movement:
-            logger.debug(f"{self}: stale")
+            if tracer.enabled:
+                tracer.instant("stale", "handler", transition=self.name)
+            if self.state == HandlerStates.TO_RETRY:
+                self.simulation_manager.avoided_retries_count += 1
             self.state = HandlerStates.STALE
         else:
-            self.simulation_manager.perform_movement(self.name, calculated_movement)
+            newly_allowed = self.simulation_manager.perform_movement(self.name, calculated_movement)
+            if newly_allowed:
+                possibly_enabled = list(possibly_enabled) + newly_allowed
 
-            coroutines_to_enqueue.put(gevent.spawn(self.activate_transition))
+            self.simulation_manager.handlers_coroutines.spawn(self.activate_transition)
 
             # shuffle for purposes of fairness
             # Python set can not be shuffled and also is not purely random shuffled itself
-            other_handlers = list(self.consuming_handlers | set(possibly_enabled))
+            # constraints refer to transitions by names
+            adjacency = self.simulation_manager.adjacency
+            possibly_enabled = set(adjacency.get_indices(possibly_enabled))
+            other_handlers = list(possibly_enabled.union(adjacency.get_consuming(self.index)))
             random.shuffle(other_handlers)
-            for handler_name in other_handlers:
-                handler = self.simulation_manager.transitions_mapping[handler_name]
+            transition_handlers = self.simulation_manager.transition_handlers
+            for handler_index in other_handlers:
+                handler = transition_handlers[handler_index]
                 if handler.state == HandlerStates.STALE:
-                    logger.debug(f"{self} => enqueue {handler.name}")
                     handler.state = HandlerStates.ENQUEUED
-                    cor = gevent.spawn(handler.activate_transition)
-                    coroutines_to_enqueue.put(cor)
-                elif handler.state == HandlerStates.ENQUEUED:
-                    logger.debug(f"{self} => possibly enabled {handler.name}")
-                    handler.state = HandlerStates.POSSIBLY_ENABLED
+                    self.simulation_manager.handlers_coroutines.spawn(handler.activate_transition)
+                elif handler.state in (HandlerStates.ENQUEUED, HandlerStates.TO_RETRY):
+                    # consumers are retried by input places versions, flag is set only for the constraints
+                    if handler_index in possibly_enabled:
+                        handler.state = HandlerStates.POSSIBLY_ENABLED
+                    else:
+                        handler.state = HandlerStates.TO_RETRY
 
             # this separate cycle does not affect fairness, as it does not queue coroutines
-            for handler_name in possible_disabled:
-                handler = self.simulation_manager.transitions_mapping[handler_name]
-                if handler.state == HandlerStates.ENQUEUED:
-                    logger.debug(f"{self} => possibly disabled {handler.name}")
+            for handler_index in adjacency.get_indices(possible_disabled):
+                handler = transition_handlers[handler_index]
+                if handler.state in (HandlerStates.ENQUEUED, HandlerStates.TO_RETRY):
                     handler.state = HandlerStates.POSSIBLY_DISABLED
 
-        gevent.joinall(coroutines_to_enqueue)
+        if tracer.enabled:
+            tracer.span("activation", "handler", activation_start, transition=self.name,
+                        is_fired=can_perform_movement)
+
+
+def run_simulation(workers_manager_, net_, constraint_formula_, timeout=None, max_events=None, stop_predicate=None,
+                   checkpoint_path=None, checkpoint_interval=None, resume=False,
+                   sampler_output=None, sampler_interval=SAMPLER_INTERVAL,
+                   is_constraint_monitor=IS_CONSTRAINT_MONITOR, is_affinity_routing=IS_AFFINITY_ROUTING,
+                   is_reducing=IS_REDUCING_NET, is_pruning=IS_PRUNING_DEAD_TRANSITIONS):
+    """
+    Runs one simulation of the workflow net on the (possibly warm) workers, returns manager with statistics
+    If resume is set, simulation is continued from the checkpoint, if it exists
+    If sampler output is given, live samples are streamed there (see live_sampler)
+    With the constraint monitor constraints are checked on the coordinator instead of workers
+    With affinity routing calculations of transitions are routed to their home workers (see affinity)
+    With reduction the reduced net is simulated and the trace and statistics are expanded back (see net_reduction),
+    transitions mentioned in the formula are kept as they are
+    With pruning dead transitions and never marked places are removed before simulation (see structural_analysis)
+    """
+    pruning_report = None
+    if is_pruning:
+        net_, pruning_report = prune_net(net_, constraint_formula_)
+    reduction = reduce_net(net_, get_constraint_transitions(constraint_formula_)) if is_reducing else None
+    if reduction is not None:
+        net_ = reduction.net
+        stop_predicate = reduction.expand_predicate(stop_predicate)
+    net_hash = load_net_into_workers(workers_manager_, use_net, net_)
+    manager = SimulationManager(workers_manager_, net_, constraint_formula_, max_events, stop_predicate,
+                                is_constraint_monitor)
+    manager.pruning_report = pruning_report
+    manager.net_hash = net_hash
+    manager.preprocessing = {"is_pruning": is_pruning, "is_reducing": is_reducing}
+    transition_handlers = manager.build()
+    if is_affinity_routing:
+        workers_manager_.affinity = build_affinity(manager.adjacency, len(workers_manager_.procs_with_pipes))
+    if resume and checkpoint_path is not None and os.path.exists(checkpoint_path):
+        checkpoint = load_checkpoint(checkpoint_path)
+        check_checkpoint(checkpoint, manager)
+        transition_handlers = manager.restore(checkpoint)
+    if IS_DEBUG:
+        logger.debug("start simulation for %r" % net_.name)
+    manager = run_until_stopped(manager, transition_handlers, timeout, checkpoint_path, checkpoint_interval,
+                                sampler_output, sampler_interval)
+    if reduction is not None:
+        reduction.expand_manager(manager)
+    return manager
 
 
 if __name__ == "__main__":
     compare_with_baseline_algorithm = IS_COMPARING_WITH_BASELINE_ALGORITHM
-    coroutines_to_enqueue = gevent.queue.UnboundQueue()
+    simulated_net = load_from_file('nets.pnml')
 
-    variables = [t for t in net.transition()]
+    variables = [t for t in simulated_net.transition()]
     length = int(sys.argv[1])
     constraint_formula = generate_formula(variables, length)
 
@@ -220,26 +457,18 @@ if __name__ == "__main__":
                                      serialization_fun=serialize_workflow_movements,
                                      deserialization_fun=deserialize_workflow_movements)
     workers_manager.create_pool(WORKERS_NUM)
-    manager = SimulationManager(workers_manager, net, constraint_formula)
-    gevent_timeout = gevent.Timeout(SIMULATION_TIMEOUT)
-    gevent_timeout.start()
     try:
-        transition_handlers = manager.build()
-        logger.debug("start simulation for %r" % net.name)
-        manager.startup(transition_handlers)
-    finally:
+        manager = run_simulation(workers_manager, simulated_net, constraint_formula, SIMULATION_TIMEOUT)
         if IS_BENCHMARKING:
             manager.print_stats_for_benchmarks()
         else:
             manager.print_stats()
-
-        class DevNull:
-            def write(self, msg):
-                pass
-
-        # Suppressing errors from interrupted threads, because they can interpret stopping as OSError
-        sys.stderr = DevNull()
+    finally:
         workers_manager.destroy_pool()
+        if IS_TRACING:
+            tracer.export(TRACE_FILE_PATH)
 
-        if compare_with_baseline_algorithm:
-            run_baseline_simulation(constraint_formula=constraint_formula, timeout=SIMULATION_TIMEOUT)
+    if compare_with_baseline_algorithm and IS_INCREMENTAL_BASELINE:
+        run_incremental_baseline_simulation(constraint_formula=constraint_formula, timeout=SIMULATION_TIMEOUT)
+    elif compare_with_baseline_algorithm:
+        run_baseline_simulation(constraint_formula=constraint_formula, timeout=SIMULATION_TIMEOUT)